@@ -6,4 +6,4 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'CENTRO-WEB-2025')
 
 # Importar las rutas al final para evitar importaciones circulares
-from app import routes
\ No newline at end of file
+from app import routes, commands
\ No newline at end of file
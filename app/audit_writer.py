@@ -0,0 +1,168 @@
+"""
+Módulo de Escritura de Auditoría
+--------------------------------
+Cola en memoria para los eventos de `auditoria_accesos`. Las rutas solo
+encolan el evento; un hilo en segundo plano los agrupa y los guarda con un
+INSERT de varias filas cuando se junta `tamano_lote` o pasa `intervalo`
+segundos, lo que ocurra primero.
+
+La cola es acotada: si se llena, quien encola espera como máximo
+`espera_max` segundos (contrapresión) y, si sigue llena, el evento se
+descarta y se cuenta. Al terminar el proceso se vacía lo pendiente.
+"""
+
+# --- Importaciones ---
+import atexit
+import os
+import queue
+import threading
+import time
+
+
+class EscritorAuditoria:
+    """
+    `escribir_lote` recibe una lista de tuplas y las inserta en una sola
+    operación; si lanza una excepción, el lote se reintenta `reintentos` veces.
+    """
+
+    def __init__(self, escribir_lote, tamano_cola=10000, tamano_lote=200,
+                 intervalo=1.0, espera_max=0.05, reintentos=2):
+        self.escribir_lote = escribir_lote
+        self.tamano_lote = max(1, int(tamano_lote))
+        self.intervalo = float(intervalo)
+        self.espera_max = float(espera_max)
+        self.reintentos = int(reintentos)
+
+        self._cola = queue.Queue(maxsize=max(1, int(tamano_cola)))
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._pid = None
+        self._cerrado = False
+
+        # Métricas acumuladas
+        self._encolados = 0
+        self._escritos = 0
+        self._descartados = 0
+        self._fallidos = 0
+        self._lotes = 0
+        self._ultimo_error = None
+
+    # --- API principal ---
+    def registrar(self, fila):
+        """Encola un evento. Devuelve False si se descartó por cola llena."""
+        if self._cerrado:
+            # Ya no hay hilo que vacíe la cola: se escribe directamente
+            self._escribir([fila])
+            return True
+        self._asegurar_hilo()
+        try:
+            self._cola.put(fila, timeout=self.espera_max)
+        except queue.Full:
+            with self._lock:
+                self._descartados += 1
+            return False
+        with self._lock:
+            self._encolados += 1
+        return True
+
+    def vaciar(self, timeout=5.0):
+        """Espera a que se escriba todo lo encolado hasta ahora."""
+        if not self._hilo or not self._hilo.is_alive():
+            return True
+        listo = threading.Event()
+        try:
+            self._cola.put(listo, timeout=timeout)
+        except queue.Full:
+            return False
+        return listo.wait(timeout)
+
+    def cerrar(self, timeout=5.0):
+        """Vacía la cola y detiene el hilo (registrado con atexit)."""
+        self.vaciar(timeout)
+        self._cerrado = True
+        if self._hilo and self._hilo.is_alive():
+            try:
+                self._cola.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._hilo.join(timeout)
+
+    def registrar_cierre(self):
+        """Programa `cerrar()` al salir del intérprete. Devuelve self."""
+        atexit.register(self.cerrar)
+        return self
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "pendientes": self._cola.qsize(),
+                "capacidad": self._cola.maxsize,
+                "encolados": self._encolados,
+                "escritos": self._escritos,
+                "descartados": self._descartados,
+                "fallidos": self._fallidos,
+                "lotes": self._lotes,
+                "ultimo_error": self._ultimo_error,
+            }
+
+    # --- Hilo de escritura ---
+    def _asegurar_hilo(self):
+        # Tras un fork (workers de gunicorn) el hilo del padre no existe en el hijo
+        if self._hilo and self._hilo.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._hilo and self._hilo.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._trabajar, name="auditoria", daemon=True)
+            self._hilo.start()
+
+    def _trabajar(self):
+        while True:
+            primero = self._cola.get()
+            if primero is None:
+                return
+            lote = [primero]
+            limite = time.monotonic() + self.intervalo
+            detener = False
+            while len(lote) < self.tamano_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    siguiente = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if siguiente is None:
+                    detener = True
+                    break
+                lote.append(siguiente)
+                if isinstance(siguiente, threading.Event):
+                    # Alguien espera un vaciado: no seguir acumulando
+                    break
+
+            filas = [x for x in lote if not isinstance(x, threading.Event)]
+            if filas:
+                self._escribir(filas)
+            for x in lote:
+                if isinstance(x, threading.Event):
+                    x.set()
+            if detener:
+                return
+
+    def _escribir(self, filas):
+        for intento in range(self.reintentos + 1):
+            try:
+                self.escribir_lote(filas)
+                with self._lock:
+                    self._escritos += len(filas)
+                    self._lotes += 1
+                return
+            except Exception as e:
+                with self._lock:
+                    self._ultimo_error = str(e)
+                if intento < self.reintentos:
+                    time.sleep(0.5 * (2 ** intento))
+        print(f"ERROR CRÍTICO AL REGISTRAR AUDITORÍA: se perdieron {len(filas)} eventos ({self._ultimo_error})")
+        with self._lock:
+            self._fallidos += len(filas)
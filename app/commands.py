@@ -0,0 +1,156 @@
+"""
+Comandos de Mantenimiento (Flask CLI)
+-------------------------------------
+Tareas administrativas que se ejecutan desde la terminal, por ejemplo:
+    flask --app run reconstruir-resumen
+"""
+
+# --- Importaciones ---
+import os
+import subprocess
+import sys
+import click
+from app import app
+from app import database_manager as db
+from app import migrations
+
+
+@app.cli.command("reconstruir-resumen")
+def reconstruir_resumen():
+    """Recalcula desde cero el resumen diario de ingresos del dashboard."""
+    filas = db.reconstruir_resumen_ingresos()
+    click.echo(f"Resumen de ingresos reconstruido: {filas} filas (día/especialidad).")
+
+
+@app.cli.command("migrar")
+def migrar():
+    """Aplica las migraciones pendientes de la carpeta migrations/."""
+    aplicadas = migrations.aplicar_migraciones()
+    if aplicadas:
+        click.echo("Migraciones aplicadas: " + ", ".join(aplicadas))
+    else:
+        click.echo("El esquema ya está al día.")
+
+
+@app.cli.command("verificar-indices")
+@click.option("--estricto", is_flag=True, help="Tampoco acepta los casos de migrations.PERMITIDOS.")
+def verificar_indices(estricto):
+    """Ejecuta EXPLAIN en las consultas críticas y falla si alguna recorre toda la tabla u ordena en memoria."""
+    problemas = migrations.verificar_indices(estricto=estricto)
+    for problema in problemas:
+        click.echo(f"✗ {problema}", err=True)
+    if problemas:
+        raise SystemExit(1)
+    click.echo("✓ Todas las consultas críticas usan índices.")
+
+
+@app.cli.command("medir-sheets")
+@click.option("--seccion", type=click.Choice(["certificados", "diplomados"]), default="certificados")
+@click.option("--filas", default=5000, show_default=True, help="Filas de la hoja simulada.")
+@click.option("--repeticiones", default=20, show_default=True, help="Peticiones por escenario.")
+@click.option("--latencia", default="0.2", show_default=True, help="Segundos por llamada a la API (o rango 'min,max').")
+@click.option("--tasa-errores", default=0.0, show_default=True, help="Probabilidad de un 503 por llamada.")
+@click.option("--cuota", default=0, show_default=True, help="Llamadas por minuto antes de responder 429 (0 = sin límite).")
+def medir_sheets(seccion, filas, repeticiones, latencia, tasa_errores, cuota):
+    """Mide la latencia de certificados/diplomados contra un Google Sheets simulado."""
+    from app import sheets_benchmark
+    valores = [float(x) for x in latencia.split(",")]
+    resultados = sheets_benchmark.medir(
+        filas=filas, repeticiones=repeticiones,
+        latencia=tuple(valores) if len(valores) > 1 else valores[0],
+        tasa_errores=tasa_errores, cuota_por_minuto=cuota or None, seccion=seccion,
+    )
+    click.echo(f"{'escenario':<12}{'p50 ms':>10}{'p95 ms':>10}{'máx ms':>10}{'llamadas':>10}{'errores':>9}{'fallidas':>10}")
+    for r in resultados:
+        click.echo(
+            f"{r['escenario']:<12}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['max_ms']:>10}"
+            f"{r['llamadas_api']:>10}{r['errores_api']:>9}{r['respuestas_fallidas']:>10}"
+        )
+
+
+def _perfil_importacion():
+    """
+    Importa la app en un intérprete nuevo con `-X importtime` (como al
+    arrancar un worker) y devuelve [(modulo, propio_us, acumulado_us, nivel)].
+    """
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=raiz, capture_output=True, text=True, check=True,
+    )
+    modulos = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        nivel = (len(nombre) - len(nombre.lstrip())) // 2
+        modulos.append((nombre.strip(), int(propio), int(acumulado), nivel))
+    return modulos
+
+
+@app.cli.command("perfil-arranque")
+@click.option("--top", default=15, show_default=True, help="Cantidad de módulos a listar.")
+@click.option("--limite-ms", default=0, show_default=True, help="Falla si importar la app tarda más (0 = sin límite).")
+def perfil_arranque(top, limite_ms):
+    """Mide cuánto tarda en importarse la app (arranque en frío de un worker)."""
+    modulos = _perfil_importacion()
+    # En la salida de importtime cada módulo aparece después de lo que importó
+    fin = max(i for i, m in enumerate(modulos) if m[0] == "app" and m[3] == 0)
+    inicio = fin
+    while inicio > 0 and modulos[inicio - 1][3] > 0:
+        inicio -= 1
+    total_ms = modulos[fin][2] / 1000
+    # Importaciones de la app y de sus módulos (las que se pueden diferir)
+    directas = [m for m in modulos[inicio:fin] if m[3] <= 2]
+    click.echo(f"Importar la app: {total_ms:.0f} ms ({fin - inicio + 1} módulos)")
+    click.echo(f"{'módulo':<40}{'acumulado ms':>14}{'propio ms':>11}")
+    for nombre, propio, acumulado, nivel in sorted(directas, key=lambda m: -m[2])[:top]:
+        click.echo(f"{'  ' * (nivel - 1) + nombre:<40}{acumulado / 1000:>14.1f}{propio / 1000:>11.1f}")
+    if limite_ms and total_ms > limite_ms:
+        click.echo(f"✗ El arranque supera el límite de {limite_ms} ms.", err=True)
+        raise SystemExit(1)
+
+
+@app.cli.command("importar-leads")
+@click.argument("archivo", type=click.Path(exists=True, dir_okay=False))
+@click.option("--asesor", required=True, help="Asesor asignado a los leads y a sus oportunidades.")
+@click.option("--reporte", type=click.Path(dir_okay=False), help="Guarda el reporte por fila en este CSV.")
+def importar_leads(archivo, asesor, reporte):
+    """Registra como leads las filas de un CSV/XLSX (igual que en /registrar_interesado)."""
+    import csv
+    import time
+    from app import importacion
+
+    inicio = time.perf_counter()
+    with open(archivo, "rb") as f:
+        try:
+            filas = importacion.leer_filas(f, os.path.basename(archivo))
+        except ValueError as e:
+            click.echo(f"✗ {e}", err=True)
+            raise SystemExit(1)
+        resultado = db.importar_leads(filas, asesor)
+    click.echo(
+        f"{resultado['total']} filas en {time.perf_counter() - inicio:.1f} s: {resultado['creados']} creadas, "
+        f"{resultado['duplicados']} duplicadas, {resultado['invalidos']} inválidas."
+    )
+    if reporte:
+        with open(reporte, "w", newline="", encoding="utf-8") as f:
+            escritor = csv.DictWriter(f, fieldnames=["fila", "estado", "motivo", "cliente_id"])
+            escritor.writeheader()
+            escritor.writerows(resultado["filas"])
+        click.echo(f"Reporte guardado en {reporte}")
+    if resultado["error"]:
+        click.echo(f"✗ La lectura se detuvo antes del final: {resultado['error']}", err=True)
+        raise SystemExit(1)
+
+
+@app.cli.command("detectar-duplicados")
+@click.option("--umbral", default=None, type=float, help="Puntaje mínimo de un par (por defecto el de duplicados.py).")
+def detectar_duplicados(umbral):
+    """Busca clientes que probablemente son la misma persona y los deja para revisión en /crm/duplicados."""
+    import time
+    from app import duplicados
+
+    inicio = time.perf_counter()
+    total = db.detectar_duplicados(umbral if umbral is not None else duplicados.UMBRAL)
+    click.echo(f"{total} posibles duplicados en {time.perf_counter() - inicio:.1f} s.")
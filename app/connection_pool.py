@@ -0,0 +1,231 @@
+"""
+Módulo de Pool de Conexiones
+----------------------------
+Mantiene un conjunto acotado de conexiones MySQL reutilizables para que cada
+petición no pague un handshake TCP + autenticación por consulta.
+
+`database_manager.get_connection()` entrega conexiones de este pool. El objeto
+devuelto se comporta como una conexión normal, pero `close()` la devuelve al
+pool en lugar de cerrarla, así que las funciones CRUD existentes no cambian.
+"""
+
+# --- Importaciones ---
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+
+class ConexionPooled:
+    """
+    Envoltorio sobre una conexión real. Delega todo en la conexión original
+    salvo `close()`, que la devuelve al pool (una sola vez).
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._liberada = False
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+    def close(self):
+        if not self._liberada:
+            self._liberada = True
+            self._pool._devolver(self._conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Red de seguridad: si una función olvida cerrar (p. ej. por una
+        # excepción), la conexión vuelve al pool al recolectarse el objeto.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones con tamaño máximo, tiempo de espera al pedir una
+    conexión, verificación (ping) al prestarla y reciclaje de conexiones viejas.
+    """
+
+    def __init__(self, config, tamano=10, timeout=10.0, reciclar_segundos=1800,
+                 ping_al_prestar=True):
+        self.config = dict(config)
+        self.tamano = max(1, int(tamano))
+        self.timeout = float(timeout)
+        self.reciclar_segundos = float(reciclar_segundos)
+        self.ping_al_prestar = ping_al_prestar
+
+        self._lock = threading.Condition()
+        # Conexiones libres listas para prestar (FIFO)
+        self._libres = deque()
+        self._creada_en = {}
+        self._abiertas = 0
+        self._en_uso = 0
+        self._esperando = 0
+
+        # Métricas acumuladas
+        self._prestamos = 0
+        self._timeouts = 0
+        self._recicladas = 0
+        self._descartadas = 0
+        self._latencia_total = 0.0
+        self._latencia_max = 0.0
+
+    # --- Ciclo de vida de conexiones ---
+    def _crear(self):
+        conn = mysql.connector.connect(**self.config)
+        self._creada_en[id(conn)] = time.monotonic()
+        return conn
+
+    def _cerrar_real(self, conn):
+        self._creada_en.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _es_vieja(self, conn):
+        creada = self._creada_en.get(id(conn), 0)
+        return self.reciclar_segundos > 0 and time.monotonic() - creada > self.reciclar_segundos
+
+    def _esta_sana(self, conn):
+        if not self.ping_al_prestar:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    # --- API principal ---
+    def obtener(self):
+        """
+        Presta una conexión. Espera hasta `timeout` segundos si el pool está
+        lleno y lanza `PoolError` si no se libera ninguna a tiempo.
+        """
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        conn = None
+        with self._lock:
+            if not self._libres and self._abiertas >= self.tamano:
+                self._esperando += 1
+                try:
+                    while not self._libres and self._abiertas >= self.tamano:
+                        restante = limite - time.monotonic()
+                        if restante <= 0:
+                            self._timeouts += 1
+                            raise PoolError(
+                                f"No hay conexiones libres en el pool tras {self.timeout}s "
+                                f"(en uso: {self._en_uso}/{self.tamano})"
+                            )
+                        self._lock.wait(restante)
+                finally:
+                    self._esperando -= 1
+
+            if self._libres:
+                conn = self._libres.popleft()
+            else:
+                self._abiertas += 1
+            self._en_uso += 1
+
+        # La E/S de red (conectar, ping) se hace fuera del candado.
+        try:
+            if conn is None:
+                conn = self._crear()
+            elif self._es_vieja(conn):
+                self._cerrar_real(conn)
+                conn = self._crear()
+                with self._lock:
+                    self._recicladas += 1
+            elif not self._esta_sana(conn):
+                self._cerrar_real(conn)
+                with self._lock:
+                    self._descartadas += 1
+                conn = self._crear()
+        except Exception:
+            with self._lock:
+                self._abiertas -= 1
+                self._en_uso -= 1
+                self._lock.notify()
+            raise
+
+        latencia = time.monotonic() - inicio
+        with self._lock:
+            self._prestamos += 1
+            self._latencia_total += latencia
+            self._latencia_max = max(self._latencia_max, latencia)
+        return ConexionPooled(self, conn)
+
+    def _devolver(self, conn):
+        """Limpia la sesión y deja la conexión disponible para otro préstamo."""
+        reutilizable = True
+        try:
+            if not conn.is_connected():
+                reutilizable = False
+            else:
+                if conn.unread_result:
+                    conn.consume_results()
+                if conn.in_transaction:
+                    conn.rollback()
+        except Exception:
+            reutilizable = False
+
+        with self._lock:
+            self._en_uso -= 1
+            if reutilizable:
+                self._libres.append(conn)
+            else:
+                self._abiertas -= 1
+                self._descartadas += 1
+            self._lock.notify()
+        if not reutilizable:
+            self._cerrar_real(conn)
+
+    @contextmanager
+    def conexion(self):
+        """Uso: `with pool.conexion() as conn:` — siempre devuelve la conexión."""
+        conn = self.obtener()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def cerrar_todas(self):
+        """Cierra las conexiones libres (las prestadas se cierran al devolverse)."""
+        with self._lock:
+            libres = list(self._libres)
+            self._libres.clear()
+            self._abiertas -= len(libres)
+        for conn in libres:
+            self._cerrar_real(conn)
+
+    def estadisticas(self):
+        """Devuelve el estado actual del pool y la latencia de préstamo."""
+        with self._lock:
+            promedio = self._latencia_total / self._prestamos if self._prestamos else 0.0
+            return {
+                "tamano": self.tamano,
+                "abiertas": self._abiertas,
+                "en_uso": self._en_uso,
+                "libres": len(self._libres),
+                "esperando": self._esperando,
+                "prestamos": self._prestamos,
+                "timeouts": self._timeouts,
+                "recicladas": self._recicladas,
+                "descartadas": self._descartadas,
+                "latencia_promedio_ms": round(promedio * 1000, 3),
+                "latencia_max_ms": round(self._latencia_max * 1000, 3),
+            }
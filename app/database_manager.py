@@ -7,15 +7,21 @@ reportes y el registro de auditoría.
 """
 
 # --- Importaciones ---
-import io
-from datetime import datetime
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from decimal import Decimal
 import pytz
-import mysql.connector
-from mysql.connector import Error
-import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from mysql.connector import Error, IntegrityError
 import os
+from app.connection_pool import PoolConexiones
+from app.search_index import IndiceClientes
+from app import exportacion
+from app import duplicados
+from app.audit_writer import EscritorAuditoria
 
 # --- Configuración ---
 DB_CONFIG = {
@@ -25,13 +31,39 @@ DB_CONFIG = {
     "password": os.environ.get("DB_PASSWORD", "------------------------"),
 }
 
+# Parámetros del pool (ver connection_pool.py)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = float(os.environ.get("DB_POOL_RECYCLE", "1800"))
+
+POOL = PoolConexiones(
+    DB_CONFIG,
+    tamano=DB_POOL_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    reciclar_segundos=DB_POOL_RECYCLE,
+)
+
 
 # --- Manejo de Conexión ---
 def get_connection():
     """
-    Establece y devuelve una nueva conexión a la base de datos.
+    Presta una conexión del pool. Llamar a `close()` la devuelve al pool.
+    """
+    return POOL.obtener()
+
+
+def conexion():
+    """
+    Context manager para usar una conexión del pool:
+        with conexion() as conn:
+            ...
     """
-    return mysql.connector.connect(**DB_CONFIG)
+    return POOL.conexion()
+
+
+def estadisticas_pool():
+    """Devuelve las métricas del pool (en uso, esperando, latencia de préstamo)."""
+    return POOL.estadisticas()
 
 
 # --- Funciones de Estadísticas para el Dashboard ---
@@ -98,56 +130,48 @@ def obtener_estadisticas_dashboard():
         },
     }
 
+    # Rangos de fechas que necesita el dashboard
+    inicio_semana_movil = hoy_peru - timedelta(days=7)
+    inicio_semana_iso = hoy_peru - timedelta(days=hoy_peru.weekday())
+    fin_semana_iso = inicio_semana_iso + timedelta(days=6)
+    desde = min(inicio_semana_movil, inicio_semana_iso, inicio_mes)
+
     try:
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
 
-        # 1. Ingresos Hoy
-        cursor.execute(
-            "SELECT SUM(cuota) as total FROM pagos WHERE DATE(fecha) = %s", (hoy_peru,)
-        )
-        res_hoy = cursor.fetchone()
-        stats["ingresos_hoy"] = float(res_hoy["total"] or 0.0)
-
-        # 2. Ingresos Semana
-        cursor.execute(
-            "SELECT SUM(cuota) as total FROM pagos WHERE fecha >= DATE_SUB(%s, INTERVAL 7 DAY)",
-            (hoy_peru,),
-        )
-        stats["ingresos_semana"] = float(cursor.fetchone()["total"] or 0.0)
-
-        # 3. Ingresos Mes
+        # 1-3 y 5. Ingresos por día desde el resumen (una fila por día del rango)
         cursor.execute(
-            "SELECT SUM(cuota) as total FROM pagos WHERE fecha >= %s", (inicio_mes,)
+            """
+            SELECT fecha, SUM(total) as total
+            FROM resumen_ingresos_diarios
+            WHERE fecha >= %s
+            GROUP BY fecha
+        """,
+            (desde,),
         )
-        stats["ingresos_mes"] = float(cursor.fetchone()["total"] or 0.0)
+        for row in cursor.fetchall():
+            fecha, total = row["fecha"], float(row["total"] or 0.0)
+            if fecha == hoy_peru:
+                stats["ingresos_hoy"] += total
+            if fecha >= inicio_semana_movil:
+                stats["ingresos_semana"] += total
+            if fecha >= inicio_mes:
+                stats["ingresos_mes"] += total
+            if inicio_semana_iso <= fecha <= fin_semana_iso:
+                stats["grafico_semanal"]["data"][fecha.weekday()] += total
 
         # 4. Datos para Gráfico de Especialidades
         cursor.execute("""
-            SELECT especialidad, COUNT(*) as cantidad 
-            FROM pagos 
-            WHERE especialidad IS NOT NULL AND especialidad != ''
+            SELECT especialidad, SUM(cantidad) as cantidad 
+            FROM resumen_ingresos_diarios 
+            WHERE especialidad != ''
             GROUP BY especialidad 
             ORDER BY cantidad DESC LIMIT 5
         """)
         for row in cursor.fetchall():
             stats["grafico_especialidades"]["labels"].append(row["especialidad"])
-            stats["grafico_especialidades"]["data"].append(row["cantidad"])
-
-        # 5. Datos para Gráfico Semanal
-        cursor.execute(
-            """
-            SELECT DAYOFWEEK(fecha) as dia, SUM(cuota) as total 
-            FROM pagos 
-            WHERE YEARWEEK(fecha, 1) = YEARWEEK(%s, 1)
-            GROUP BY dia
-        """,
-            (hoy_peru,),
-        )
-
-        for row in cursor.fetchall():
-            idx = (row["dia"] + 5) % 7
-            stats["grafico_semanal"]["data"][idx] = float(row["total"])
+            stats["grafico_especialidades"]["data"].append(int(row["cantidad"]))
 
         return stats
     except Exception as e:
@@ -158,34 +182,216 @@ def obtener_estadisticas_dashboard():
             conn.close()
 
 
-# Función para obtener los últimos pagos realizados, mostrando información relevante del cliente y el pago, ordenados por fecha descendente.
-def obtener_ultimos_pagos(limit=5):
+# --- Resumen Diario de Ingresos (rollup) ---
+# `resumen_ingresos_diarios` guarda, por día y especialidad, la suma de cuotas
+# y la cantidad de pagos. Se actualiza en la misma transacción que escribe en
+# `pagos`, así el dashboard no necesita recorrer toda la tabla.
+
+
+def _ajustar_resumen(cursor, fecha, especialidad, cuota, cantidad):
     """
-    Obtiene los últimos registros de pago para mostrar en el dashboard.
+    Suma (o resta, con valores negativos) un pago al resumen del día.
+    Debe llamarse dentro de la transacción que modifica `pagos`.
     """
-    conn = None
-    cursor = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        sql = """
-            SELECT p.id, p.fecha, c.nombre, c.celular, p.especialidad, p.modalidad,
-                   p.cuota, p.tipo_de_cuota, p.banco, p.destino, p.numero_operacion,
-                   c.dni, c.correo, c.genero, p.asesor
-            FROM pagos p JOIN clientes c ON p.cliente_id = c.id
-            ORDER BY p.id DESC
-            LIMIT %s
+    if not fecha:
+        return
+    cursor.execute(
         """
-        cursor.execute(sql, (limit,))
-        return cursor.fetchall()
-    except Error as e:
-        print(f"ERROR EN BD (obtener_ultimos_pagos): {e}")
-        return []
+        INSERT INTO resumen_ingresos_diarios (fecha, especialidad, total, cantidad)
+        VALUES (DATE(%s), %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            total = total + VALUES(total),
+            cantidad = cantidad + VALUES(cantidad)
+    """,
+        (fecha, especialidad or "", Decimal(str(cuota or 0)), cantidad),
+    )
+
+
+def reconstruir_resumen_ingresos():
+    """
+    Recalcula `resumen_ingresos_diarios` desde cero a partir de `pagos`.
+    Devuelve la cantidad de filas generadas.
+    """
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            cursor.execute("DELETE FROM resumen_ingresos_diarios")
+            cursor.execute("""
+                INSERT INTO resumen_ingresos_diarios (fecha, especialidad, total, cantidad)
+                SELECT DATE(fecha), COALESCE(especialidad, ''), SUM(cuota), COUNT(*)
+                FROM pagos
+                GROUP BY DATE(fecha), COALESCE(especialidad, '')
+            """)
+            filas = cursor.rowcount
+            conn.commit()
+            return filas
+        except Error as e:
+            print(f"ERROR EN BD (reconstruir_resumen_ingresos): {e}")
+            conn.rollback()
+            raise e
+        finally:
+            cursor.close()
+
+
+# --- Feed de Últimos Pagos (dashboard) ---
+# Buffer circular en memoria con los pagos más recientes de clientes activos.
+# `crear_pago` empuja el pago nuevo y las ediciones/eliminaciones lo invalidan,
+# así la visita normal al dashboard no toca la base de datos. El TTL acota el
+# desfase entre workers que no comparten este buffer.
+ULTIMOS_PAGOS_TAMANO = 20
+ULTIMOS_PAGOS_TTL_SEGUNDOS = 30
+ULTIMOS_PAGOS_CACHE = {
+    "filas": deque(maxlen=ULTIMOS_PAGOS_TAMANO),
+    "timestamp": 0,
+    "valido": False,
+}
+_ULTIMOS_PAGOS_LOCK = threading.Lock()
+
+
+def _estado_dinamico(numero_cuota, proxima_fecha_pago, hoy):
+    """Misma lógica que el CASE de la consulta de pagos, calculada en Python."""
+    if numero_cuota == 0:
+        return "FINALIZADO"
+    if proxima_fecha_pago is not None and proxima_fecha_pago < hoy:
+        return "DEUDA"
+    if proxima_fecha_pago == hoy:
+        return "POR VENCER"
+    return "AL DIA"
+
+
+def invalidar_ultimos_pagos():
+    """Marca el buffer como inválido; la próxima lectura lo recarga."""
+    with _ULTIMOS_PAGOS_LOCK:
+        ULTIMOS_PAGOS_CACHE["valido"] = False
+
+
+def _registrar_en_ultimos_pagos(conn, pago_id):
+    """Añade un pago recién creado al inicio del buffer (si está vigente)."""
+    if not ULTIMOS_PAGOS_CACHE["valido"]:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""SELECT {_COLUMNAS_CONSULTA}
+                FROM pagos p JOIN clientes c ON p.cliente_id = c.id
+                WHERE p.id = %s AND c.estado = 'activo'""",
+            (pago_id,),
+        )
+        fila = cursor.fetchone()
     finally:
-        if cursor:
+        cursor.close()
+    with _ULTIMOS_PAGOS_LOCK:
+        if fila and ULTIMOS_PAGOS_CACHE["valido"]:
+            ULTIMOS_PAGOS_CACHE["filas"].appendleft(fila)
+
+
+def obtener_ultimos_pagos(limit=5):
+    """
+    Obtiene los últimos `limit` pagos (21 columnas, como `consultar_pagos`)
+    para el dashboard. Lee del buffer en memoria; si está vacío, inválido o
+    vencido, recarga solo las `ULTIMOS_PAGOS_TAMANO` filas más nuevas por PK.
+    """
+    limit = min(limit, ULTIMOS_PAGOS_TAMANO)
+    ahora = time.time()
+    with _ULTIMOS_PAGOS_LOCK:
+        vigente = (
+            ULTIMOS_PAGOS_CACHE["valido"]
+            and ahora - ULTIMOS_PAGOS_CACHE["timestamp"] < ULTIMOS_PAGOS_TTL_SEGUNDOS
+        )
+        filas = list(ULTIMOS_PAGOS_CACHE["filas"]) if vigente else None
+
+    if filas is None:
+        try:
+            with conexion() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(
+                        f"""SELECT {_COLUMNAS_CONSULTA}
+                            FROM pagos p JOIN clientes c ON p.cliente_id = c.id
+                            WHERE c.estado = 'activo'
+                            ORDER BY p.id DESC
+                            LIMIT %s""",
+                        (ULTIMOS_PAGOS_TAMANO,),
+                    )
+                    filas = cursor.fetchall()
+                finally:
+                    cursor.close()
+        except Error as e:
+            print(f"ERROR EN BD (obtener_ultimos_pagos): {e}")
+            return []
+        with _ULTIMOS_PAGOS_LOCK:
+            ULTIMOS_PAGOS_CACHE["filas"] = deque(filas, maxlen=ULTIMOS_PAGOS_TAMANO)
+            ULTIMOS_PAGOS_CACHE["timestamp"] = ahora
+            ULTIMOS_PAGOS_CACHE["valido"] = True
+
+    # El estado depende del día actual: se recalcula al leer
+    hoy = datetime.now(pytz.timezone("America/Lima")).date()
+    return [
+        tuple(fila[:20]) + (_estado_dinamico(fila[18], fila[19], hoy),)
+        for fila in filas[:limit]
+    ]
+
+
+# --- Búsqueda de Clientes (índice de trigramas, ver search_index.py) ---
+
+
+def _cargar_clientes_busqueda():
+    """Filas (id, nombre, dni, correo, celular, estado) para construir el índice."""
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id, nombre, dni, correo, celular, estado FROM clientes")
+            return cursor.fetchall()
+        finally:
             cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
+
+
+# Retroceso al pedir cambios: una transacción que tomó su `actualizado_en`
+# antes de la marca pero confirmó después igual se vuelve a leer.
+MARGEN_CAMBIOS_SEGUNDOS = 5
+
+
+def _cargar_cambios_busqueda(marca):
+    """Clientes modificados desde `marca` (hora de la BD) y la nueva marca."""
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT NOW(6)")
+            ahora = cursor.fetchone()[0]
+            if marca is None:
+                return [], ahora
+            cursor.execute(
+                "SELECT id, nombre, dni, correo, celular, estado FROM clientes WHERE actualizado_en >= %s",
+                (marca - timedelta(seconds=MARGEN_CAMBIOS_SEGUNDOS),),
+            )
+            return cursor.fetchall(), ahora
+        finally:
+            cursor.close()
+
+
+INDICE_CLIENTES = IndiceClientes(
+    _cargar_clientes_busqueda,
+    ttl_segundos=int(os.environ.get("SEARCH_INDEX_TTL", "300")),
+    cargador_cambios=_cargar_cambios_busqueda,
+)
+
+
+def _filtro_busqueda_clientes(query, estados=None, columnas=("nombre", "dni"), alias="c"):
+    """
+    Condición SQL para buscar clientes por texto. Devuelve (sql, params, ids):
+    - con el índice listo: `alias.id IN (...)` e `ids` en orden de relevancia;
+    - mientras el índice se construye: el LIKE de siempre sobre `columnas`.
+    """
+    prefijo = f"{alias}." if alias else ""
+    ids = INDICE_CLIENTES.buscar(query, estados=estados)
+    if ids is None:
+        condicion = " OR ".join(f"{prefijo}{col} LIKE %s" for col in columnas)
+        return f"({condicion})", [f"%{query}%"] * len(columnas), None
+    if not ids:
+        return "1 = 0", [], ids
+    marcadores = ", ".join(["%s"] * len(ids))
+    return f"{prefijo}id IN ({marcadores})", list(ids), ids
 
 
 # --- Gestión de Clientes y Pagos (CRUD) ---
@@ -230,6 +436,17 @@ def buscar_o_crear_cliente(data):
                 )
                 update_cursor.execute(sql_actualizar, datos_actualizar)
                 conn.commit()
+                _invalidar_conteos()
+                invalidar_ultimos_pagos()
+                invalidar_perfil(cliente_id)
+                INDICE_CLIENTES.actualizar(
+                    cliente_id, data.get("cliente"), data.get("dni"),
+                    data.get("correo"), data.get("celular"), "activo",
+                )
+                _detectar_duplicados_de(
+                    conn, cliente_id, data.get("cliente"), data.get("dni"),
+                    data.get("correo"), data.get("celular"),
+                )
             return cliente_id
         else:
             # Si el cliente no existe, se crea directamente como 'activo'
@@ -244,7 +461,10 @@ def buscar_o_crear_cliente(data):
             )
             cursor.execute(sql_crear, cliente_tuple)
             conn.commit()
-            return cursor.lastrowid
+            nuevo_id = cursor.lastrowid
+            INDICE_CLIENTES.actualizar(nuevo_id, *cliente_tuple[:4], "activo")
+            _detectar_duplicados_de(conn, nuevo_id, *cliente_tuple[:4])
+            return nuevo_id
 
     except Error as e:
         print(f"ERROR EN BD (buscar_o_crear_cliente): {e}")
@@ -299,16 +519,24 @@ def crear_pago(cliente_id, data):
 
         # 4. Ejecución (Cambiado 'sql' por 'sql_pago')
         cursor.execute(sql_pago, pago_tuple)
+        nuevo_pago_id = cursor.lastrowid
+        _ajustar_resumen(cursor, data.get("fecha"), data.get("especialidad"), data.get("cuota"), 1)
 
         # --- LÓGICA DE ESTADO AUTOMÁTICA ---
         # 0 en numero_cuota significa pago completo
         nuevo_estado = "FINALIZADO" if nro_cuota == 0 else "AL DIA"
 
-        sql_update_cliente = "UPDATE clientes SET estado_pago = %s WHERE id = %s"
+        sql_update_cliente = "UPDATE clientes SET estado_pago = %s, actualizado_en = CURRENT_TIMESTAMP(6) WHERE id = %s"
         cursor.execute(sql_update_cliente, (nuevo_estado, cliente_id))
 
         conn.commit()
-        return cursor.lastrowid
+        _invalidar_conteos()
+        invalidar_perfil(cliente_id)
+        try:
+            _registrar_en_ultimos_pagos(conn, nuevo_pago_id)
+        except Error:
+            invalidar_ultimos_pagos()
+        return nuevo_pago_id
 
     except Exception as e:
         print(f"ERROR EN BD (crear_pago): {e}")
@@ -345,17 +573,17 @@ def buscar_pagos_completos(query="", fecha_vence=None, especialidad=None, solo_i
                 END AS estado_dinamico
             FROM clientes c
             LEFT JOIN pagos p ON c.id = p.cliente_id
-            WHERE (c.nombre LIKE %s OR c.dni LIKE %s)
         """
         
-        # Parámetros iniciales para el LIKE
-        params = [f"%{query}%", f"%{query}%"]
-
         # 2. Filtros adicionales dinámicos
-        if solo_inactivos:
-            sql += " AND c.estado = 'inactivo'"
-        else:
-            sql += " AND c.estado = 'activo'"
+        estado = "inactivo" if solo_inactivos else "activo"
+        sql += " WHERE c.estado = %s"
+        params = [estado]
+
+        if query:
+            condicion, params_busqueda, _ = _filtro_busqueda_clientes(query, estados=[estado])
+            sql += f" AND {condicion}"
+            params.extend(params_busqueda)
 
         if especialidad:
             sql += " AND p.especialidad = %s"
@@ -456,18 +684,33 @@ def actualizar_pago(pago_id, form_data):
         if not data.get("proxima_fecha_pago"):
             data["proxima_fecha_pago"] = None
 
+        # Valores previos para descontarlos del resumen diario
+        cursor.execute(
+            "SELECT fecha, especialidad, cuota FROM pagos WHERE id = %s FOR UPDATE",
+            (pago_id,),
+        )
+        anterior = cursor.fetchone()
+
         # 3. Construcción dinámica de la consulta SQL
         set_clause = ", ".join([f"{campo} = %s" for campo in campos_pago])
         sql = f"UPDATE pagos SET {set_clause} WHERE id = %s"
 
         valores = [data.get(campo) for campo in campos_pago] + [pago_id]
         cursor.execute(sql, tuple(valores))
+        filas_afectadas = cursor.rowcount
 
         # 4. LÓGICA DE ESTADO: Actualizar automáticamente al cliente según la cuota editada
         # Obtenemos el cliente_id asociado a este pago para actualizar su estado general
-        cursor.execute("SELECT cliente_id FROM pagos WHERE id = %s", (pago_id,))
+        cursor.execute(
+            "SELECT cliente_id, fecha, especialidad, cuota FROM pagos WHERE id = %s",
+            (pago_id,),
+        )
         resultado = cursor.fetchone()
 
+        if anterior and resultado:
+            _ajustar_resumen(cursor, anterior[0], anterior[1], -(anterior[2] or 0), -1)
+            _ajustar_resumen(cursor, resultado[1], resultado[2], resultado[3], 1)
+
         if resultado:
             cliente_id = resultado[0]
             # Si el usuario editó la cuota a "0" (Pago Completo), el cliente queda FINALIZADO
@@ -479,12 +722,16 @@ def actualizar_pago(pago_id, form_data):
             )
 
             cursor.execute(
-                "UPDATE clientes SET estado_pago = %s WHERE id = %s",
+                "UPDATE clientes SET estado_pago = %s, actualizado_en = CURRENT_TIMESTAMP(6) WHERE id = %s",
                 (nuevo_estado, cliente_id),
             )
 
         conn.commit()
-        return cursor.rowcount
+        _invalidar_conteos()
+        invalidar_ultimos_pagos()
+        if resultado:
+            invalidar_perfil(resultado[0])
+        return filas_afectadas
 
     except Error as e:
         print(f"ERROR EN BD (actualizar_pago): {e}")
@@ -504,19 +751,36 @@ def eliminar_pago(pago_id):
     (Función de Repo 1)
     """
     conn = None
+    cursor = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
+        cursor.execute(
+            "SELECT fecha, especialidad, cuota, cliente_id FROM pagos WHERE id = %s FOR UPDATE",
+            (pago_id,),
+        )
+        anterior = cursor.fetchone()
         sql = "DELETE FROM pagos WHERE id = %s"
         cursor.execute(sql, (pago_id,))
+        filas_afectadas = cursor.rowcount
+        if anterior and filas_afectadas:
+            _ajustar_resumen(cursor, anterior[0], anterior[1], -(anterior[2] or 0), -1)
+            _tocar_cliente(cursor, anterior[3])
         conn.commit()
-        return cursor.rowcount
+        _invalidar_conteos()
+        invalidar_ultimos_pagos()
+        if anterior:
+            invalidar_perfil(anterior[3])
+        return filas_afectadas
     except Error as e:
         print(f"ERROR EN BD (eliminar_pago): {e}")
+        if conn:
+            conn.rollback()
         raise e
     finally:
-        if conn and conn.is_connected():
+        if cursor:
             cursor.close()
+        if conn and conn.is_connected():
             conn.close()
 
 
@@ -556,87 +820,233 @@ def generar_reporte_asesores_db(start_date_str=None, end_date_str=None):
             conn.close()
 
 
-def generar_excel_dinamico(headers):
+# --- Exportación por lotes (ver exportacion.py) ---
+EXPORT_LOTE = int(os.environ.get("EXPORT_LOTE", "2000"))
+
+SQL_EXPORT_PAGOS = """
+    SELECT p.id, p.fecha, c.nombre, c.celular, p.especialidad, p.modalidad,
+           p.cuota, p.tipo_de_cuota, p.banco, p.destino, p.numero_operacion,
+           c.dni, c.correo, c.genero, p.asesor
+    FROM pagos p JOIN clientes c ON p.cliente_id = c.id
+    ORDER BY p.id ASC
+"""
+
+SQL_EXPORT_LEADS = """
+    SELECT nombre, celular, dni, correo, genero, estado, curso_interes, asesor_asignado, fecha_contacto
+    FROM clientes
+    WHERE estado = 'potencial' OR estado = 'inactivo'
+    ORDER BY fecha_contacto DESC
+"""
+
+# Tipos por columna para los formatos tipados (parquet), ver exportacion._tipo_arrow
+TIPOS_EXPORT_PAGOS = ["entero", "fecha_hora"] + ["texto"] * 4 + ["decimal(10,2)"] + ["texto"] * 8
+TIPOS_EXPORT_LEADS = ["texto"] * 8 + ["fecha_hora"]
+
+ENCABEZADOS_LEADS = [
+    "Nombre",
+    "Celular",
+    "DNI",
+    "Correo",
+    "Género",
+    "Estado",
+    "Curso de Interés",
+    "Asesor Asignado",
+    "Fecha de Contacto",
+]
+
+
+def leer_en_lotes(sql, params=(), tamano_lote=None):
     """
-    Crea un archivo Excel en memoria con todos los registros de pagos.
+    Ejecuta `sql` con un cursor sin búfer y devuelve un generador de lotes de
+    filas. La consulta se lanza aquí mismo (los errores de conexión o SQL se
+    propagan antes de empezar a responder); la conexión vuelve al pool cuando
+    el generador se agota o se cierra.
     """
-    conn = None
+    tamano_lote = tamano_lote or EXPORT_LOTE
+    conn = get_connection()
+    cursor = conn.cursor(buffered=False)
     try:
-        conn = get_connection()
-        sql = """
-            SELECT p.id, p.fecha, c.nombre, c.celular, p.especialidad, p.modalidad,
-                   p.cuota, p.tipo_de_cuota, p.banco, p.destino, p.numero_operacion,
-                   c.dni, c.correo, c.genero, p.asesor
-            FROM pagos p JOIN clientes c ON p.cliente_id = c.id
-            ORDER BY p.id ASC
-        """
-        df = pd.read_sql(sql, conn)
-        df.columns = ["ID"] + headers
-        df["FECHA"] = pd.to_datetime(df["FECHA"], errors="coerce").dt.strftime(
-            "%Y-%m-%d"
-        )
-        df.fillna("", inplace=True)
-
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name="Registros")
-        output.seek(0)
-        return output
-    except Error as e:
-        print(f"ERROR EN BD (generar_excel_dinamico): {e}")
-        return None
-    finally:
-        if conn and conn.is_connected():
+        cursor.execute(sql, params)
+    except Error:
+        cursor.close()
+        conn.close()
+        raise
+
+    def lotes():
+        try:
+            while True:
+                filas = cursor.fetchmany(tamano_lote)
+                if not filas:
+                    break
+                yield filas
+        except Error as e:
+            print(f"ERROR EN BD (leer_en_lotes): {e}")
+            raise
+        finally:
+            try:
+                cursor.close()
+            except Error:
+                # Descarga interrumpida: el pool descarta los resultados pendientes
+                pass
             conn.close()
 
+    return lotes()
 
-# --- Módulo de Auditoría ---
 
+def _filas(lotes, transformar=None):
+    for lote in lotes:
+        for fila in lote:
+            yield transformar(fila) if transformar else fila
 
-def registrar_auditoria(usuario, accion, ip, tabla=None, reg_id=None, detalles=None):
+
+def _fila_pago_excel(fila):
+    """Mismo formato que la exportación anterior: FECHA como texto y sin nulos."""
+    fecha = fila[1]
+    fecha = fecha.strftime("%Y-%m-%d") if fecha else ""
+    return (fila[0], fecha) + tuple("" if v is None else v for v in fila[2:])
+
+
+def _exportar(sql, nombre_hoja, encabezados, tipos, formato, transformar_excel=None):
+    exportacion.verificar_formato(formato)
+    lotes = leer_en_lotes(sql)
+    if formato == "csv":
+        return exportacion.csv_gzip_en_stream(encabezados, lotes)
+    if formato == "parquet":
+        return exportacion.parquet_en_stream(encabezados, tipos, lotes)
+    return exportacion.xlsx_en_stream(nombre_hoja, encabezados, _filas(lotes, transformar_excel))
+
+
+def generar_excel_dinamico(headers, formato="xlsx"):
     """
-    Inserta un nuevo registro en la tabla de auditoría.
+    Genera por bloques el archivo con todos los registros de pagos en el
+    `formato` pedido (xlsx, csv o parquet). Devuelve un generador de bytes
+    para una respuesta en streaming.
     """
-    conn = None
-    cursor = None
-    try:
-        conn = get_connection()
+    return _exportar(
+        SQL_EXPORT_PAGOS, "Registros", ["ID"] + headers, TIPOS_EXPORT_PAGOS, formato, _fila_pago_excel
+    )
+
+
+# --- Módulo de Auditoría ---
+
+
+def _insertar_auditoria(filas):
+    """Inserta un lote de eventos; executemany lo envía como un único INSERT multi-fila."""
+    with conexion() as conn:
         cursor = conn.cursor()
-        sql = """INSERT INTO auditoria_accesos 
-                (timestamp, usuario_app, accion, tabla_afectada, registro_id, detalles, ip_origen)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)"""
-        datos = (datetime.now(), usuario, accion, tabla, reg_id, detalles, ip)
-        cursor.execute(sql, datos)
-        conn.commit()
-    except Error as e:
-        print(f"ERROR CRÍTICO AL REGISTRAR AUDITORÍA: {e}")
-    finally:
-        if cursor:
+        try:
+            sql = """INSERT INTO auditoria_accesos 
+                    (timestamp, usuario_app, accion, tabla_afectada, registro_id, detalles, ip_origen)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)"""
+            cursor.executemany(sql, filas)
+            conn.commit()
+        finally:
             cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
 
 
-def leer_log_auditoria():
+ESCRITOR_AUDITORIA = EscritorAuditoria(
+    _insertar_auditoria,
+    tamano_cola=int(os.environ.get("AUDIT_QUEUE_SIZE", "10000")),
+    tamano_lote=int(os.environ.get("AUDIT_BATCH_SIZE", "200")),
+    intervalo=float(os.environ.get("AUDIT_FLUSH_SECONDS", "1.0")),
+).registrar_cierre()
+
+
+def registrar_auditoria(usuario, accion, ip, tabla=None, reg_id=None, detalles=None):
     """
-    Lee todos los registros de la tabla de auditoría ordenados por fecha.
+    Encola un registro para la tabla de auditoría. La hora se toma ahora; el
+    INSERT lo hace el escritor en segundo plano (ver audit_writer.py).
     """
-    conn = None
-    cursor = None
-    try:
-        conn = get_connection()
+    datos = (datetime.now(), usuario, accion, tabla, reg_id, detalles, ip)
+    if not ESCRITOR_AUDITORIA.registrar(datos):
+        print(f"AVISO: cola de auditoría llena, evento descartado ({accion})")
+
+
+def estadisticas_auditoria():
+    """Eventos pendientes, escritos y descartados del escritor de auditoría."""
+    return ESCRITOR_AUDITORIA.estadisticas()
+
+
+def _filtros_auditoria(usuario=None, accion=None, tabla=None, registro_id=None, desde=None, hasta=None):
+    """
+    Devuelve (where, params) para el visor de auditoría. Cada filtro de
+    igualdad tiene su índice compuesto con `timestamp` (migración 0005), así
+    que el ORDER BY timestamp DESC sale del índice sin ordenar en memoria.
+    """
+    where, params = [], []
+    if usuario:
+        where.append("usuario_app = %s")
+        params.append(usuario)
+    if accion:
+        where.append("accion = %s")
+        params.append(accion)
+    if tabla:
+        where.append("tabla_afectada = %s")
+        params.append(tabla)
+    if registro_id:
+        where.append("registro_id = %s")
+        params.append(int(registro_id))
+    if desde:
+        where.append("timestamp >= %s")
+        params.append(desde)
+    if hasta:
+        # Fecha inclusiva: hasta el final del día
+        where.append("timestamp < %s + INTERVAL 1 DAY")
+        params.append(hasta)
+    return where, params
+
+
+def consultar_auditoria(usuario=None, accion=None, tabla=None, registro_id=None, desde=None,
+                        hasta=None, cursor_token=None, hacia_atras=False, per_page=50):
+    """
+    Una página del log de auditoría, del más reciente al más antiguo, con
+    paginación por clave (timestamp, id). Devuelve un dict con `filas`,
+    `cursor_siguiente` y `cursor_anterior`, igual que `consultar_pagos`.
+
+    No espera a ESCRITOR_AUDITORIA: los eventos recién encolados aparecen
+    cuando el hilo escribe su lote (a lo sumo `intervalo` segundos después).
+    """
+    where, params = _filtros_auditoria(usuario, accion, tabla, registro_id, desde, hasta)
+    clave = _decodificar_cursor(cursor_token)
+    if clave is None:
+        hacia_atras = False
+    op, sentido = ("<", "DESC") if not hacia_atras else (">", "ASC")
+    if clave is not None:
+        where.append(f"(timestamp {op} %s OR (timestamp = %s AND id {op} %s))")
+        params.extend([clave[0], clave[0], clave[1]])
+
+    sql = "SELECT id, timestamp, usuario_app, accion, tabla_afectada, registro_id, detalles, ip_origen FROM auditoria_accesos"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY timestamp {sentido}, id {sentido} LIMIT %s"
+
+    with conexion() as conn:
         cursor = conn.cursor(dictionary=True)
-        sql = "SELECT * FROM auditoria_accesos ORDER BY timestamp DESC"
-        cursor.execute(sql)
-        return cursor.fetchall()
-    except Error as e:
-        print(f"ERROR EN BD (leer_log_auditoria): {e}")
-        return []
-    finally:
-        if cursor:
+        try:
+            cursor.execute(sql, tuple(params + [per_page + 1]))
+            filas = cursor.fetchall()
+        except Error as e:
+            print(f"ERROR EN BD (consultar_auditoria): {e}")
+            raise e
+        finally:
             cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
+
+    hay_mas = len(filas) > per_page
+    filas = filas[:per_page]
+    if hacia_atras:
+        filas.reverse()
+        hay_anterior, hay_siguiente = hay_mas, True
+    else:
+        hay_anterior, hay_siguiente = clave is not None, hay_mas
+
+    def _clave(fila):
+        return _codificar_cursor([fila["timestamp"], fila["id"]])
+
+    return {
+        "filas": filas,
+        "cursor_siguiente": _clave(filas[-1]) if filas and hay_siguiente else None,
+        "cursor_anterior": _clave(filas[0]) if filas and hay_anterior else None,
+    }
 
 
 # ====================================================================
@@ -655,9 +1065,13 @@ def cambiar_estado_cliente(cliente_id, nuevo_estado):
     try:
         conn = get_connection()
         cursor = conn.cursor()
-        sql = "UPDATE clientes SET estado = %s WHERE id = %s"
+        sql = "UPDATE clientes SET estado = %s, actualizado_en = CURRENT_TIMESTAMP(6) WHERE id = %s"
         cursor.execute(sql, (nuevo_estado, cliente_id))
         conn.commit()
+        _invalidar_conteos()
+        invalidar_ultimos_pagos()
+        INDICE_CLIENTES.cambiar_estado(cliente_id, nuevo_estado)
+        invalidar_perfil(cliente_id)
         return cursor.rowcount
     except Error as e:
         print(f"ERROR EN BD (cambiar_estado_cliente): {e}")
@@ -707,6 +1121,114 @@ def obtener_pagos_por_cliente(cliente_id):
             conn.close()
 
 
+# --- Perfil del Cliente ---
+# El perfil (cliente, pagos, seguimientos, etiquetas) se lee con las cuatro
+# consultas en un solo envío y queda en caché por cliente. Toda escritura que
+# toca el perfil marca `clientes.actualizado_en` en su transacción (ver
+# _tocar_cliente) y llama a `invalidar_perfil(cliente_id)` en este worker.
+# Los demás workers no comparten la caché: antes de usar una entrada
+# comparan su `actualizado_en` con el de la base (una lectura por clave
+# primaria en lugar de las cuatro consultas).
+PERFIL_CACHE = OrderedDict()  # cliente_id -> (perfil, timestamp)
+PERFIL_CACHE_SEGUNDOS = int(os.environ.get("PROFILE_CACHE_TTL", "60"))
+PERFIL_CACHE_MAX = 500
+_PERFIL_LOCK = threading.Lock()
+_PERFIL_GENERACION = 0  # sube con cada invalidación
+
+SQL_PERFIL_CLIENTE = """
+    SELECT * FROM clientes WHERE id = %s;
+    SELECT * FROM pagos WHERE cliente_id = %s ORDER BY fecha DESC;
+    SELECT * FROM seguimientos WHERE cliente_id = %s ORDER BY fecha_creacion DESC;
+    SELECT e.id, e.nombre FROM etiquetas e
+    JOIN cliente_etiquetas ce ON e.id = ce.etiqueta_id
+    WHERE ce.cliente_id = %s ORDER BY e.nombre
+"""
+
+
+def _tocar_cliente(cursor, cliente_id):
+    """
+    Marca al cliente como modificado dentro de la transacción en curso. El
+    ON UPDATE de la columna no alcanza: no se dispara si la fila de
+    `clientes` no cambia (pagos, seguimientos, etiquetas).
+    """
+    cursor.execute("UPDATE clientes SET actualizado_en = CURRENT_TIMESTAMP(6) WHERE id = %s", (cliente_id,))
+
+
+def _version_perfil(cliente_id):
+    """`actualizado_en` del cliente en la base (None si ya no existe)."""
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT actualizado_en FROM clientes WHERE id = %s", (cliente_id,))
+            fila = cursor.fetchone()
+            return fila[0] if fila else None
+        finally:
+            cursor.close()
+
+
+def invalidar_perfil(cliente_id=None):
+    """Descarta el perfil cacheado de un cliente (o todos, sin argumento)."""
+    global _PERFIL_GENERACION
+    with _PERFIL_LOCK:
+        _PERFIL_GENERACION += 1
+        if cliente_id is None:
+            PERFIL_CACHE.clear()
+        else:
+            PERFIL_CACHE.pop(int(cliente_id), None)
+
+
+def obtener_perfil_cliente(cliente_id):
+    """
+    Devuelve {"cliente", "pagos", "seguimientos", "etiquetas"} o None si el
+    cliente no existe. Una conexión, un envío con cuatro resultados.
+    """
+    cliente_id = int(cliente_id)
+    with _PERFIL_LOCK:
+        guardado = PERFIL_CACHE.get(cliente_id)
+        if guardado and time.time() - guardado[1] >= PERFIL_CACHE_SEGUNDOS:
+            guardado = None
+        generacion = _PERFIL_GENERACION
+    if guardado:
+        try:
+            vigente = guardado[0]["cliente"].get("actualizado_en") == _version_perfil(cliente_id)
+        except Error as e:
+            print(f"ERROR EN BD (obtener_perfil_cliente): {e}")
+            vigente = False
+        with _PERFIL_LOCK:
+            if PERFIL_CACHE.get(cliente_id) is guardado:
+                if vigente:
+                    PERFIL_CACHE.move_to_end(cliente_id)
+                    return guardado[0]
+                # Otro worker lo cambió: se descarta y se vuelve a leer
+                PERFIL_CACHE.pop(cliente_id)
+
+    with conexion() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(SQL_PERFIL_CLIENTE, (cliente_id,) * 4)
+            resultados = [cursor.fetchall()]
+            while cursor.nextset():
+                resultados.append(cursor.fetchall())
+        except Error as e:
+            print(f"ERROR EN BD (obtener_perfil_cliente): {e}")
+            raise e
+        finally:
+            cursor.close()
+
+    clientes, pagos, seguimientos, etiquetas = resultados
+    if not clientes:
+        return None
+    perfil = {"cliente": clientes[0], "pagos": pagos, "seguimientos": seguimientos, "etiquetas": etiquetas}
+    with _PERFIL_LOCK:
+        # Si hubo una escritura mientras se leía, esta lectura puede estar vieja: no se guarda
+        if generacion == _PERFIL_GENERACION:
+            PERFIL_CACHE[cliente_id] = (perfil, time.time())
+            PERFIL_CACHE.move_to_end(cliente_id)
+            while len(PERFIL_CACHE) > PERFIL_CACHE_MAX:
+                PERFIL_CACHE.popitem(last=False)
+    return perfil
+
+
 def registrar_potencial(data, asesor):
     """
     Crea un nuevo cliente con estado 'potencial' (un lead).
@@ -756,7 +1278,10 @@ def registrar_potencial(data, asesor):
         )
         cursor.execute(sql_crear, cliente_tuple)
         conn.commit()
-        return cursor.lastrowid
+        nuevo_id = cursor.lastrowid
+        INDICE_CLIENTES.actualizar(nuevo_id, *cliente_tuple[:4], "potencial")
+        _detectar_duplicados_de(conn, nuevo_id, *cliente_tuple[:4])
+        return nuevo_id
 
     except Error as e:
         print(f"ERROR EN BD (registrar_potencial): {e}")
@@ -768,6 +1293,170 @@ def registrar_potencial(data, asesor):
             conn.close()
 
 
+# --- Importación masiva de leads ---
+# Los leads de campañas llegan en archivos de miles de filas. Los DNI/correos
+# existentes se cargan una vez en sets para deduplicar en memoria (dentro del
+# archivo y contra la BD); las altas van en INSERT multi-fila por lotes, cada
+# lote con sus oportunidades en la misma transacción.
+LOTE_IMPORTACION = 1000
+
+
+def _claves_existentes(cursor):
+    """(dnis, correos) de todos los clientes, en minúsculas."""
+    dnis, correos = set(), set()
+    cursor.execute("SELECT dni, correo FROM clientes")
+    while True:
+        filas = cursor.fetchmany(10000)
+        if not filas:
+            break
+        for dni, correo in filas:
+            if dni:
+                dnis.add(dni.strip().lower())
+            if correo:
+                correos.add(correo.strip().lower())
+    return dnis, correos
+
+
+def _validar_lead(registro):
+    """Devuelve (tupla_cliente_sin_asesor, None) o (None, motivo)."""
+    nombre = (registro.get("cliente") or registro.get("nombre") or "").strip()
+    dni = "".join((registro.get("dni") or "").split()).replace(".", "")
+    correo = (registro.get("correo") or "").strip().lower() or None
+    celular = "".join(c for c in (registro.get("celular") or "") if c.isdigit()) or None
+    if not nombre:
+        return None, "Falta el nombre"
+    if not dni:
+        return None, "Falta el DNI"
+    if len(dni) > 15 or not dni.isalnum():
+        return None, f"DNI inválido: {dni}"
+    if correo and ("@" not in correo or len(correo) > 255):
+        return None, f"Correo inválido: {correo}"
+    return (nombre[:255], dni, correo, celular,
+            (registro.get("genero") or "").strip() or None,
+            (registro.get("curso_interes") or "").strip() or None), None
+
+
+def _insertar_lote_leads(conn, cursor, lote, asesor, ahora):
+    """
+    Inserta un lote [(fila, tupla_cliente)] con sus oportunidades y devuelve
+    {fila: cliente_id}. Si otro usuario registró alguno de esos DNI mientras
+    tanto, el lote se repite fila por fila para aislar al duplicado.
+    """
+    sql_cliente = """
+        INSERT INTO clientes
+        (nombre, dni, correo, celular, genero, estado, curso_interes, asesor_asignado, fecha_contacto)
+        VALUES (%s, %s, %s, %s, %s, 'potencial', %s, %s, %s)
+    """
+    sql_oportunidad = """
+        INSERT IGNORE INTO oportunidades
+        (cliente_id, asesor_asignado, curso_interes, estado_oportunidad, fecha_creacion, ultima_actualizacion)
+        VALUES (%s, %s, %s, 'Nuevo', %s, %s)
+    """
+    try:
+        cursor.executemany(sql_cliente, [datos + (asesor, ahora) for _, datos in lote])
+    except IntegrityError:
+        conn.rollback()
+        if len(lote) == 1:
+            return {}
+        ids = {}
+        for item in lote:
+            ids.update(_insertar_lote_leads(conn, cursor, [item], asesor, ahora))
+        return ids
+
+    # Con innodb_autoinc_lock_mode=2 los ids de un INSERT multi-fila no son
+    # necesariamente consecutivos: se recuperan por DNI (único).
+    cursor.execute(
+        f"SELECT id, dni FROM clientes WHERE dni IN ({', '.join(['%s'] * len(lote))})",
+        tuple(datos[1] for _, datos in lote),
+    )
+    id_por_dni = {dni.lower(): cliente_id for cliente_id, dni in cursor.fetchall()}
+    ids = {fila: id_por_dni[datos[1].lower()] for fila, datos in lote}
+    cursor.executemany(
+        sql_oportunidad, [(ids[fila], asesor, datos[5], ahora, ahora) for fila, datos in lote]
+    )
+    conn.commit()
+    return ids
+
+
+def importar_leads(filas, asesor, tamano_lote=LOTE_IMPORTACION):
+    """
+    Registra como 'potencial' cada fila (numero_fila, dict) de
+    `importacion.leer_filas` y crea su oportunidad 'Nuevo'. Se omiten las
+    filas inválidas y las duplicadas (mismo DNI o correo que un cliente
+    existente o que una fila anterior del archivo). Al terminar se corre
+    `detectar_duplicados` para proponer los casi-duplicados.
+
+    Devuelve {"total", "creados", "duplicados", "invalidos", "filas", "error"},
+    donde "filas" es el reporte [{"fila", "estado", "motivo", "cliente_id"}].
+    Si el archivo resulta ilegible a mitad de camino (ValueError de `filas`),
+    se guardan las filas leídas hasta ahí y "error" trae el motivo; los
+    lotes anteriores ya están confirmados, así que el reporte no se pierde.
+    """
+    reporte = []
+    error_lectura = None
+    ahora = datetime.now()
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            dnis, correos = _claves_existentes(cursor)
+            pendientes = []
+
+            def _volcar():
+                ids = _insertar_lote_leads(conn, cursor, pendientes, asesor, ahora)
+                for fila, datos in pendientes:
+                    cliente_id = ids.get(fila)
+                    if cliente_id:
+                        reporte.append({"fila": fila, "estado": "creado", "motivo": "", "cliente_id": cliente_id})
+                        INDICE_CLIENTES.actualizar(cliente_id, *datos[:4], "potencial")
+                    else:
+                        reporte.append({"fila": fila, "estado": "duplicado",
+                                        "motivo": "Registrado por otro usuario durante la importación",
+                                        "cliente_id": None})
+                pendientes.clear()
+
+            try:
+                for fila, registro in filas:
+                    datos, motivo = _validar_lead(registro)
+                    if motivo:
+                        reporte.append({"fila": fila, "estado": "invalido", "motivo": motivo, "cliente_id": None})
+                        continue
+                    dni, correo = datos[1].lower(), datos[2]
+                    if dni in dnis or (correo and correo in correos):
+                        motivo = f"DNI {datos[1]} ya registrado" if dni in dnis else f"Correo {correo} ya registrado"
+                        reporte.append({"fila": fila, "estado": "duplicado", "motivo": motivo, "cliente_id": None})
+                        continue
+                    dnis.add(dni)
+                    if correo:
+                        correos.add(correo)
+                    pendientes.append((fila, datos))
+                    if len(pendientes) >= tamano_lote:
+                        _volcar()
+            except ValueError as e:
+                error_lectura = str(e)
+            if pendientes:
+                _volcar()
+        except Error as e:
+            conn.rollback()
+            print(f"ERROR EN BD (importar_leads): {e}")
+            raise e
+        finally:
+            cursor.close()
+            _invalidar_conteos()
+
+    reporte.sort(key=lambda r: r["fila"])
+    conteo = {"creado": 0, "duplicado": 0, "invalido": 0}
+    for r in reporte:
+        conteo[r["estado"]] += 1
+    if conteo["creado"]:
+        # Una sola detección por lotes en vez de una búsqueda por cada lead
+        try:
+            detectar_duplicados()
+        except Error:
+            pass  # ya informado; la importación queda hecha
+    return {"total": len(reporte), "creados": conteo["creado"], "duplicados": conteo["duplicado"],
+            "invalidos": conteo["invalido"], "filas": reporte, "error": error_lectura}
+
+
 def buscar_leads(query):
     """Busca clientes que son potenciales o inactivos."""
     conn = None
@@ -779,12 +1468,21 @@ def buscar_leads(query):
             SELECT id, nombre, celular, dni, correo, genero, estado, curso_interes, asesor_asignado, fecha_contacto
             FROM clientes
             WHERE (estado = 'potencial' OR estado = 'inactivo') 
-              AND (nombre LIKE %s OR dni LIKE %s OR correo LIKE %s)
-            ORDER BY fecha_contacto DESC
         """
-        search_term = f"%{query}%"
-        cursor.execute(sql, (search_term, search_term, search_term))
-        return cursor.fetchall()
+        params, ids = [], None
+        if query:
+            condicion, params, ids = _filtro_busqueda_clientes(
+                query, estados=["potencial", "inactivo"], columnas=("nombre", "dni", "correo"), alias=""
+            )
+            sql += f" AND {condicion}"
+        sql += " ORDER BY fecha_contacto DESC"
+        cursor.execute(sql, tuple(params))
+        leads = cursor.fetchall()
+        if ids:
+            # Ordenar por relevancia del índice de búsqueda
+            posicion = {cliente_id: i for i, cliente_id in enumerate(ids)}
+            leads.sort(key=lambda lead: posicion.get(lead["id"], len(posicion)))
+        return leads
     except Error as e:
         print(f"ERROR EN BD (buscar_leads): {e}")
         return []
@@ -795,41 +1493,9 @@ def buscar_leads(query):
             conn.close()
 
 
-def generar_excel_leads():
-    """Crea un archivo Excel en memoria con todos los leads."""
-    conn = None
-    try:
-        conn = get_connection()
-        sql = """
-            SELECT nombre, celular, dni, correo, genero, estado, curso_interes, asesor_asignado, fecha_contacto
-            FROM clientes
-            WHERE estado = 'potencial' OR estado = 'inactivo'
-            ORDER BY fecha_contacto DESC
-        """
-        df = pd.read_sql(sql, conn)
-        df.columns = [
-            "Nombre",
-            "Celular",
-            "DNI",
-            "Correo",
-            "Género",
-            "Estado",
-            "Curso de Interés",
-            "Asesor Asignado",
-            "Fecha de Contacto",
-        ]
-
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name="Leads")
-        output.seek(0)
-        return output
-    except Error as e:
-        print(f"ERROR EN BD (generar_excel_leads): {e}")
-        return None
-    finally:
-        if conn and conn.is_connected():
-            conn.close()
+def generar_excel_leads(formato="xlsx"):
+    """Genera por bloques el archivo con todos los leads (generador de bytes)."""
+    return _exportar(SQL_EXPORT_LEADS, "Leads", ENCABEZADOS_LEADS, TIPOS_EXPORT_LEADS, formato)
 
 
 def eliminar_lead_por_id(cliente_id):
@@ -839,12 +1505,30 @@ def eliminar_lead_por_id(cliente_id):
     try:
         conn = get_connection()
         cursor = conn.cursor()
+        # Sus pagos se borran en cascada: los descontamos antes del resumen diario
+        cursor.execute(
+            """
+            SELECT DATE(fecha), especialidad, SUM(cuota), COUNT(*)
+            FROM pagos WHERE cliente_id = %s
+            GROUP BY DATE(fecha), especialidad
+        """,
+            (cliente_id,),
+        )
+        for fecha, especialidad, total, cantidad in cursor.fetchall():
+            _ajustar_resumen(cursor, fecha, especialidad, -(total or 0), -cantidad)
         sql = "DELETE FROM clientes WHERE id = %s"
         cursor.execute(sql, (cliente_id,))
+        filas_afectadas = cursor.rowcount
         conn.commit()
-        return cursor.rowcount
+        _invalidar_conteos()
+        invalidar_ultimos_pagos()
+        INDICE_CLIENTES.eliminar(cliente_id)
+        invalidar_perfil(cliente_id)
+        return filas_afectadas
     except Error as e:
         print(f"ERROR EN BD (eliminar_lead_por_id): {e}")
+        if conn:
+            conn.rollback()
         raise e
     finally:
         if cursor:
@@ -853,6 +1537,296 @@ def eliminar_lead_por_id(cliente_id):
             conn.close()
 
 
+# --- Clientes Duplicados (ver duplicados.py) ---
+# Los pares candidatos se guardan en `clientes_duplicados` para revisarlos en
+# /crm/duplicados. La detección completa (`detectar_duplicados`) se corre por
+# comando o desde esa página; además cada alta o cambio de datos de un
+# cliente busca sus candidatos por índice (`_detectar_duplicados_de`).
+DUPLICADOS_LOTE = 500
+
+
+def _guardar_pares_duplicados(cursor, pares):
+    """Inserta o actualiza pares pendientes; los ya descartados no se reabren."""
+    ahora = datetime.now()
+    sql = """
+        INSERT INTO clientes_duplicados (cliente_a, cliente_b, puntaje, motivos, detectado_en)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            puntaje = IF(estado = 'pendiente', VALUES(puntaje), puntaje),
+            motivos = IF(estado = 'pendiente', VALUES(motivos), motivos)
+    """
+    filas = [(a, b, valor, ", ".join(motivos)[:255], ahora) for a, b, valor, motivos in pares]
+    for i in range(0, len(filas), DUPLICADOS_LOTE):
+        cursor.executemany(sql, filas[i:i + DUPLICADOS_LOTE])
+
+
+def detectar_duplicados(umbral=duplicados.UMBRAL):
+    """
+    Recorre todos los clientes con claves de bloqueo y reemplaza la lista de
+    pares pendientes por la encontrada (los descartados se conservan).
+    Devuelve la cantidad de pares.
+    """
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id, nombre, dni, correo, celular FROM clientes")
+            pares = duplicados.pares_candidatos(cursor.fetchall(), umbral)
+            # El DELETE y los INSERT se confirman juntos: nunca se ve la lista vacía
+            cursor.execute("DELETE FROM clientes_duplicados WHERE estado = 'pendiente'")
+            _guardar_pares_duplicados(cursor, pares)
+            conn.commit()
+            return len(pares)
+        except Error as e:
+            conn.rollback()
+            print(f"ERROR EN BD (detectar_duplicados): {e}")
+            raise e
+        finally:
+            cursor.close()
+
+
+def _detectar_duplicados_de(conn, cliente_id, nombre, dni, correo, celular):
+    """
+    Detección al escribir: trae por índice a los clientes con el mismo
+    celular o correo o con un DNI a un dígito y guarda los pares que superan
+    el umbral. Se llama después del commit del alta; un error aquí solo se
+    informa, nunca deshace el registro.
+
+    Es una búsqueda de mejor esfuerzo: compara contra lo guardado tal cual,
+    así que solo encuentra el celular escrito como '987654321', '51...' o
+    '+51...' y el correo idéntico (sin quitar puntos ni '+etiqueta' de Gmail).
+    Lo que escapa aquí lo encuentra `detectar_duplicados`, que normaliza
+    todos los clientes en memoria.
+    """
+    condiciones, params = [], []
+    numero = duplicados.normalizar_celular(celular)
+    if numero:
+        condiciones.append("celular IN (%s, %s, %s)")
+        params += [numero, "51" + numero, "+51" + numero]
+    if correo and correo.strip():
+        condiciones.append("correo = %s")
+        params.append(correo.strip())
+    vecinos = duplicados.variantes_dni(dni)
+    if vecinos:
+        condiciones.append(f"dni IN ({', '.join(['%s'] * len(vecinos))})")
+        params += vecinos
+    if not condiciones:
+        return 0
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"SELECT id, nombre, dni, correo, celular FROM clientes WHERE id != %s AND ({' OR '.join(condiciones)})",
+            (cliente_id, *params),
+        )
+        pares = duplicados.candidatos_de((cliente_id, nombre, dni, correo, celular), cursor.fetchall())
+        if pares:
+            _guardar_pares_duplicados(cursor, pares)
+            conn.commit()
+        return len(pares)
+    except Error as e:
+        print(f"ERROR EN BD (_detectar_duplicados_de): {e}")
+        return 0
+    finally:
+        cursor.close()
+
+
+def listar_duplicados(estado="pendiente", limite=100):
+    """Pares a revisar, del más al menos probable, con los datos de ambos clientes."""
+    columnas = ", ".join(
+        f"{alias}.{col} AS {alias}_{col}"
+        for alias in ("a", "b")
+        for col in ("id", "nombre", "dni", "correo", "celular", "estado", "fecha_contacto")
+    )
+    with conexion() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(
+                f"""
+                SELECT d.id, d.puntaje, d.motivos, d.detectado_en, {columnas},
+                    (SELECT COUNT(*) FROM pagos WHERE cliente_id = a.id) AS a_pagos,
+                    (SELECT COUNT(*) FROM pagos WHERE cliente_id = b.id) AS b_pagos
+                FROM clientes_duplicados d
+                JOIN clientes a ON a.id = d.cliente_a
+                JOIN clientes b ON b.id = d.cliente_b
+                WHERE d.estado = %s
+                ORDER BY d.puntaje DESC, d.id
+                LIMIT %s
+            """,
+                (estado, limite),
+            )
+            return cursor.fetchall()
+        except Error as e:
+            print(f"ERROR EN BD (listar_duplicados): {e}")
+            raise e
+        finally:
+            cursor.close()
+
+
+def descartar_duplicado(par_id, usuario):
+    """Marca un par como 'no es la misma persona'; la detección no lo vuelve a proponer."""
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """UPDATE clientes_duplicados SET estado = 'descartado', revisado_por = %s, revisado_en = %s
+                   WHERE id = %s AND estado = 'pendiente'""",
+                (usuario, datetime.now(), par_id),
+            )
+            conn.commit()
+            return cursor.rowcount
+        except Error as e:
+            print(f"ERROR EN BD (descartar_duplicado): {e}")
+            raise e
+        finally:
+            cursor.close()
+
+
+def obtener_par_duplicado(par_id):
+    """(cliente_a, cliente_b) de un par pendiente, o None."""
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT cliente_a, cliente_b FROM clientes_duplicados WHERE id = %s AND estado = 'pendiente'",
+                (par_id,),
+            )
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+
+# Al fusionar, qué oportunidad se queda si los dos clientes tienen una: la
+# ganada, luego la más avanzada del embudo; una perdida solo si no hay otra.
+PRIORIDAD_OPORTUNIDAD_FUSION = ("Ganada", "Negociación", "Propuesta", "Contactado", "Nuevo", "Perdida")
+
+
+def _elegir_oportunidad(oportunidades):
+    """
+    (conservada, [descartadas]) entre filas (id, estado, ultima_actualizacion).
+    Normalmente son dos, una por cliente; si una instalación sin
+    uq_oportunidades_cliente (ver migración 0011) dejó más, sobran todas menos una.
+    """
+    def orden(op):
+        estado = op[1]
+        prioridad = (PRIORIDAD_OPORTUNIDAD_FUSION.index(estado)
+                     if estado in PRIORIDAD_OPORTUNIDAD_FUSION else len(PRIORIDAD_OPORTUNIDAD_FUSION))
+        return prioridad, -(op[2].timestamp() if op[2] else 0)
+
+    conservada, *descartadas = sorted(oportunidades, key=orden)
+    return conservada, descartadas
+
+
+def fusionar_clientes(conservar_id, eliminar_id):
+    """
+    Une dos registros de la misma persona en una transacción: pasa a
+    `conservar_id` los pagos, seguimientos y etiquetas de `eliminar_id`,
+    completa los datos que le falten y borra `eliminar_id`. Los pagos se
+    mueven, no se borran, así que el resumen diario no cambia; el
+    `estado_pago` del conservado se recalcula con su último pago.
+
+    `oportunidades` admite una por cliente: si los dos tienen, se queda la
+    de etapa más avanzada (PRIORIDAD_OPORTUNIDAD_FUSION; a igual etapa, la
+    más reciente) y la otra se borra.
+
+    Devuelve {"pagos", "seguimientos", "etiquetas"} movidos más
+    "oportunidad" (etapa que quedó) y "oportunidad_descartada" (etapa
+    borrada), o None si alguno de los dos clientes no existe.
+    """
+    conservar_id, eliminar_id = int(conservar_id), int(eliminar_id)
+    if conservar_id == eliminar_id:
+        return None
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            cursor.execute(
+                "SELECT id FROM clientes WHERE id IN (%s, %s) FOR UPDATE", (conservar_id, eliminar_id)
+            )
+            if len(cursor.fetchall()) != 2:
+                conn.rollback()
+                return None
+
+            movidos = {}
+            cursor.execute("UPDATE pagos SET cliente_id = %s WHERE cliente_id = %s", (conservar_id, eliminar_id))
+            movidos["pagos"] = cursor.rowcount
+            cursor.execute(
+                "UPDATE seguimientos SET cliente_id = %s WHERE cliente_id = %s", (conservar_id, eliminar_id)
+            )
+            movidos["seguimientos"] = cursor.rowcount
+            cursor.execute(
+                """INSERT IGNORE INTO cliente_etiquetas (cliente_id, etiqueta_id)
+                   SELECT %s, etiqueta_id FROM cliente_etiquetas WHERE cliente_id = %s""",
+                (conservar_id, eliminar_id),
+            )
+            movidos["etiquetas"] = cursor.rowcount
+
+            cursor.execute(
+                """SELECT id, estado_oportunidad, ultima_actualizacion FROM oportunidades
+                   WHERE cliente_id IN (%s, %s) FOR UPDATE""",
+                (conservar_id, eliminar_id),
+            )
+            oportunidades = cursor.fetchall()
+            movidos["oportunidad"], movidos["oportunidad_descartada"] = None, None
+            if len(oportunidades) > 1:
+                conservada, descartadas = _elegir_oportunidad(oportunidades)
+                cursor.execute(
+                    f"DELETE FROM oportunidades WHERE id IN ({', '.join(['%s'] * len(descartadas))})",
+                    tuple(op[0] for op in descartadas),
+                )
+                movidos["oportunidad_descartada"] = descartadas[0][1]
+                oportunidades = [conservada]
+            if oportunidades:
+                movidos["oportunidad"] = oportunidades[0][1]
+                cursor.execute(
+                    "UPDATE oportunidades SET cliente_id = %s WHERE id = %s", (conservar_id, oportunidades[0][0])
+                )
+
+            if movidos["pagos"]:
+                # Mismo criterio que crear_pago/actualizar_pago: manda el último pago
+                cursor.execute(
+                    """UPDATE clientes c JOIN (
+                           SELECT numero_cuota FROM pagos WHERE cliente_id = %s
+                           ORDER BY fecha DESC, id DESC LIMIT 1
+                       ) ultimo SET c.estado_pago = IF(ultimo.numero_cuota = 0, 'FINALIZADO', 'AL DIA')
+                       WHERE c.id = %s""",
+                    (conservar_id, conservar_id),
+                )
+            cursor.execute(
+                """
+                UPDATE clientes c JOIN clientes e ON e.id = %s SET
+                    c.correo = COALESCE(NULLIF(c.correo, ''), e.correo),
+                    c.celular = COALESCE(NULLIF(c.celular, ''), e.celular),
+                    c.genero = COALESCE(NULLIF(c.genero, ''), e.genero),
+                    c.curso_interes = COALESCE(NULLIF(c.curso_interes, ''), e.curso_interes),
+                    c.asesor_asignado = COALESCE(NULLIF(c.asesor_asignado, ''), e.asesor_asignado),
+                    c.estado = IF(e.estado = 'activo', 'activo', c.estado),
+                    c.actualizado_en = CURRENT_TIMESTAMP(6)
+                WHERE c.id = %s
+            """,
+                (eliminar_id, conservar_id),
+            )
+            cursor.execute("DELETE FROM clientes WHERE id = %s", (eliminar_id,))
+            cursor.execute(
+                "SELECT nombre, dni, correo, celular, estado FROM clientes WHERE id = %s", (conservar_id,)
+            )
+            conservado = cursor.fetchone()
+            conn.commit()
+        except Error as e:
+            conn.rollback()
+            print(f"ERROR EN BD (fusionar_clientes): {e}")
+            raise e
+        finally:
+            cursor.close()
+
+    INDICE_CLIENTES.eliminar(eliminar_id)
+    INDICE_CLIENTES.actualizar(conservar_id, *conservado)
+    invalidar_perfil(conservar_id)
+    invalidar_perfil(eliminar_id)
+    _invalidar_conteos()
+    invalidar_ultimos_pagos()
+    return movidos
+
+
 # --- Funciones para la Gestión de Oportunidades (Embudo) ---
 
 
@@ -934,6 +1908,132 @@ def mover_oportunidad(oportunidad_id, nuevo_estado):
             conn.close()
 
 
+ESTADOS_OPORTUNIDAD = ("Nuevo", "Contactado", "Propuesta", "Negociación", "Ganada", "Perdida")
+MAX_MOVIMIENTOS_LOTE = 200
+
+
+def version_oportunidad(ultima_actualizacion):
+    """
+    Token de concurrencia optimista: `ultima_actualizacion` con microsegundos,
+    o cadena vacía si la oportunidad nunca se actualizó.
+    """
+    return ultima_actualizacion.isoformat(timespec="microseconds") if ultima_actualizacion else ""
+
+
+def validar_movimientos(movimientos):
+    """
+    Revisa la forma de cada movimiento del tablero antes de tocar la base.
+    Devuelve [{indice, motivo}] con los que no sirven (vacía si todos están bien).
+    """
+    invalidos = []
+    for indice, mov in enumerate(movimientos):
+        if not isinstance(mov, dict):
+            motivo = "no es un objeto"
+        elif isinstance(mov.get("id"), bool) or not str(mov.get("id", "")).strip().isdigit():
+            motivo = "id inválido"
+        elif mov.get("estado") not in ESTADOS_OPORTUNIDAD:
+            motivo = "estado inválido"
+        elif not isinstance(mov.get("version"), str):
+            motivo = "falta version"
+        else:
+            continue
+        invalidos.append({"indice": indice, "motivo": motivo})
+    return invalidos
+
+
+def mover_oportunidades(movimientos, asesor=None):
+    """
+    Aplica varios movimientos del tablero en una sola transacción.
+
+    Cada movimiento es {"id", "estado", "version"}; `version` es el token
+    que el tablero recibió (ver version_oportunidad). Si la oportunidad
+    cambió desde entonces, ese movimiento no se aplica y vuelve como
+    conflicto con el estado actual; uno sin `version` también vuelve como
+    conflicto ("sin_version"), nunca se aplica a ciegas. Las rutas validan
+    antes la forma de cada movimiento con validar_movimientos; aquí lo
+    malformado se ignora. Con `asesor`, solo se pueden mover
+    oportunidades asignadas a ese asesor. Si hay dos movimientos de la
+    misma tarjeta, vale el último.
+
+    Devuelve {"aplicados": [{id, estado, version}],
+              "conflictos": [{id, motivo, estado, version}]}.
+    """
+    pedidos = {}
+    conflictos = []
+    for mov in movimientos:
+        try:
+            oportunidad_id = int(mov.get("id"))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if mov.get("estado") not in ESTADOS_OPORTUNIDAD:
+            conflictos.append({"id": oportunidad_id, "motivo": "estado_invalido", "estado": None, "version": None})
+            continue
+        pedidos[oportunidad_id] = mov
+    if not pedidos:
+        return {"aplicados": [], "conflictos": conflictos}
+
+    marcadores = ", ".join(["%s"] * len(pedidos))
+    with conexion() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            conn.start_transaction()
+            # Bloquea las filas hasta el commit: nadie las cambia entre la verificación y el UPDATE
+            cursor.execute(
+                f"""SELECT id, estado_oportunidad, asesor_asignado, ultima_actualizacion
+                    FROM oportunidades WHERE id IN ({marcadores}) FOR UPDATE""",
+                tuple(pedidos),
+            )
+            actuales = {fila["id"]: fila for fila in cursor.fetchall()}
+
+            por_estado = {}
+            for oportunidad_id, mov in pedidos.items():
+                fila = actuales.get(oportunidad_id)
+                if fila is None or (asesor is not None and fila["asesor_asignado"] != asesor):
+                    conflictos.append({"id": oportunidad_id, "motivo": "no_existe", "estado": None, "version": None})
+                    continue
+                version = version_oportunidad(fila["ultima_actualizacion"])
+                if not isinstance(mov.get("version"), str) or mov["version"] != version:
+                    conflictos.append({
+                        "id": oportunidad_id,
+                        "motivo": "modificada" if isinstance(mov.get("version"), str) else "sin_version",
+                        "estado": fila["estado_oportunidad"], "version": version,
+                    })
+                    continue
+                por_estado.setdefault(mov["estado"], []).append(oportunidad_id)
+
+            ahora = datetime.now()
+            for estado, ids in por_estado.items():
+                cierre = ", fecha_cierre = %s" if estado in ("Ganada", "Perdida") else ""
+                params = (estado, ahora) + ((ahora,) if cierre else ()) + tuple(ids)
+                cursor.execute(
+                    f"""UPDATE oportunidades SET estado_oportunidad = %s, ultima_actualizacion = %s{cierre}
+                        WHERE id IN ({", ".join(["%s"] * len(ids))})""",
+                    params,
+                )
+
+            aplicados = []
+            movidos = [i for ids in por_estado.values() for i in ids]
+            if movidos:
+                # Se relee la versión guardada: la precisión depende de la columna
+                cursor.execute(
+                    f"""SELECT id, estado_oportunidad, ultima_actualizacion FROM oportunidades
+                        WHERE id IN ({", ".join(["%s"] * len(movidos))})""",
+                    tuple(movidos),
+                )
+                aplicados = [
+                    {"id": f["id"], "estado": f["estado_oportunidad"], "version": version_oportunidad(f["ultima_actualizacion"])}
+                    for f in cursor.fetchall()
+                ]
+            conn.commit()
+            return {"aplicados": aplicados, "conflictos": conflictos}
+        except Error as e:
+            print(f"ERROR EN BD (mover_oportunidades): {e}")
+            conn.rollback()
+            raise e
+        finally:
+            cursor.close()
+
+
 # --- Funciones para la Gestión de Etiquetas ---
 def obtener_o_crear_etiqueta_id(nombre_etiqueta):
     """Busca una etiqueta por nombre. Si no existe, la crea. Devuelve el ID."""
@@ -973,7 +2073,9 @@ def anadir_etiqueta_a_cliente(cliente_id, etiqueta_id):
             "INSERT IGNORE INTO cliente_etiquetas (cliente_id, etiqueta_id) VALUES (%s, %s)",
             (cliente_id, etiqueta_id),
         )
+        _tocar_cliente(cursor, cliente_id)
         conn.commit()
+        invalidar_perfil(cliente_id)
     finally:
         if cursor:
             cursor.close()
@@ -992,7 +2094,9 @@ def quitar_etiqueta_a_cliente(cliente_id, etiqueta_id):
             "DELETE FROM cliente_etiquetas WHERE cliente_id = %s AND etiqueta_id = %s",
             (cliente_id, etiqueta_id),
         )
+        _tocar_cliente(cursor, cliente_id)
         conn.commit()
+        invalidar_perfil(cliente_id)
     finally:
         if cursor:
             cursor.close()
@@ -1046,8 +2150,11 @@ def crear_seguimiento(cliente_id, asesor_nombre, tipo_interaccion, comentarios):
         """
         datos = (cliente_id, asesor_nombre, fecha_actual, tipo_interaccion, comentarios)
         cursor.execute(sql, datos)
+        nuevo_id = cursor.lastrowid
+        _tocar_cliente(cursor, cliente_id)
         conn.commit()
-        return cursor.lastrowid
+        invalidar_perfil(cliente_id)
+        return nuevo_id
     except Error as e:
         print(f"ERROR EN BD (crear_seguimiento): {e}")
         raise e
@@ -1080,6 +2187,16 @@ def obtener_seguimientos_por_cliente(cliente_id):
             conn.close()
 
 
+def _tocar_cliente_de_seguimiento(cursor, seguimiento_id):
+    """_tocar_cliente para el dueño de un seguimiento; devuelve su cliente_id (o None)."""
+    cursor.execute("SELECT cliente_id FROM seguimientos WHERE id = %s", (seguimiento_id,))
+    fila = cursor.fetchone()
+    if fila:
+        _tocar_cliente(cursor, fila[0])
+        return fila[0]
+    return None
+
+
 def marcar_seguimiento_atendido(seguimiento_id):
     """
     Actualiza el estado de un seguimiento a 'Atendido' y registra la fecha.
@@ -1095,8 +2212,12 @@ def marcar_seguimiento_atendido(seguimiento_id):
 
         sql = "UPDATE seguimientos SET estado = 'Atendido', fecha_atencion = %s WHERE id = %s"
         cursor.execute(sql, (fecha_actual, seguimiento_id))
+        filas_afectadas = cursor.rowcount
+        cliente_id = _tocar_cliente_de_seguimiento(cursor, seguimiento_id)
         conn.commit()
-        return cursor.rowcount
+        if cliente_id:
+            invalidar_perfil(cliente_id)
+        return filas_afectadas
     except Error as e:
         print(f"ERROR EN BD (marcar_seguimiento_atendido): {e}")
         raise e
@@ -1116,10 +2237,17 @@ def eliminar_seguimiento(seguimiento_id):
     try:
         conn = get_connection()
         cursor = conn.cursor()
+        cursor.execute("SELECT cliente_id FROM seguimientos WHERE id = %s", (seguimiento_id,))
+        fila = cursor.fetchone()
         sql = "DELETE FROM seguimientos WHERE id = %s"
         cursor.execute(sql, (seguimiento_id,))
+        filas_afectadas = cursor.rowcount
+        if fila:
+            _tocar_cliente(cursor, fila[0])
         conn.commit()
-        return cursor.rowcount
+        if fila:
+            invalidar_perfil(fila[0])
+        return filas_afectadas
     except Error as e:
         print(f"ERROR EN BD (eliminar_seguimiento): {e}")
         raise e
@@ -1131,148 +2259,214 @@ def eliminar_seguimiento(seguimiento_id):
 
 
 # --- Funciones de Indicadores (KPI) ---
+# Los cuatro indicadores de /crm/indicadores salen de una sola consulta: cada
+# tabla se agrupa por asesor en su propio subconsulta (numerador y
+# denominador de cada KPI) y el GROUP BY ... WITH ROLLUP de afuera suma todo
+# por asesor y en total. Python solo divide.
+SIN_ASESOR = "(sin asesor)"
+
+
+def _rango_fechas(columna, desde, hasta):
+    """Condiciones [desde, hasta] (fechas inclusive) sobre una columna DATETIME."""
+    condiciones, params = [], []
+    if desde:
+        condiciones.append(f"{columna} >= %s")
+        params.append(desde)
+    if hasta:
+        condiciones.append(f"{columna} < %s + INTERVAL 1 DAY")
+        params.append(hasta)
+    return condiciones, params
+
+
+def _sql_indicadores_crm(desde=None, hasta=None, horas_limite=24, asesor=None):
+    """Devuelve (sql, params) del motor de indicadores."""
+    partes, params = [], []
+
+    # Tiempo de gestión: oportunidades cerradas en el rango (por fecha de cierre)
+    where, p = _rango_fechas("o.fecha_cierre", desde, hasta)
+    where = ["o.estado_oportunidad IN ('Ganada', 'Perdida')", "o.fecha_cierre IS NOT NULL"] + where
+    if asesor:
+        where.append("o.asesor_asignado = %s")
+        p.append(asesor)
+    partes.append(f"""
+        SELECT COALESCE(o.asesor_asignado, '{SIN_ASESOR}') AS asesor,
+               SUM(DATEDIFF(o.fecha_cierre, o.fecha_creacion)) AS dias_gestion, COUNT(*) AS cerradas,
+               0 AS contacto_a_tiempo, 0 AS leads_evaluados, 0 AS leads_con_seguimiento, 0 AS leads,
+               0 AS seguimientos_atendidos, 0 AS seguimientos
+        FROM oportunidades o
+        WHERE {" AND ".join(where)}
+        GROUP BY o.asesor_asignado
+    """)
+    params += p
+
+    # Primer contacto e interacción: leads registrados en el rango
+    where, p = _rango_fechas("c.fecha_contacto", desde, hasta)
+    where = ["c.estado IN ('potencial', 'activo')"] + where
+    if asesor:
+        where.append("c.asesor_asignado = %s")
+        p.append(asesor)
+    partes.append(f"""
+        SELECT l.asesor, 0, 0,
+               SUM(l.fecha_contacto IS NOT NULL AND l.primer_seguimiento IS NOT NULL
+                   AND TIMESTAMPDIFF(SECOND, l.fecha_contacto, l.primer_seguimiento) <= %s),
+               SUM(l.fecha_contacto IS NOT NULL), SUM(l.primer_seguimiento IS NOT NULL), COUNT(*),
+               0, 0
+        FROM (
+            SELECT COALESCE(c.asesor_asignado, '{SIN_ASESOR}') AS asesor, c.fecha_contacto,
+                   (SELECT MIN(s.fecha_creacion) FROM seguimientos s WHERE s.cliente_id = c.id) AS primer_seguimiento
+            FROM clientes c
+            WHERE {" AND ".join(where)}
+        ) l
+        GROUP BY l.asesor
+    """)
+    params += [horas_limite * 3600] + p
+
+    # Seguimientos atendidos: creados en el rango
+    where, p = _rango_fechas("s.fecha_creacion", desde, hasta)
+    if asesor:
+        where.append("s.asesor_nombre = %s")
+        p.append(asesor)
+    partes.append(f"""
+        SELECT COALESCE(s.asesor_nombre, '{SIN_ASESOR}'), 0, 0, 0, 0, 0, 0,
+               SUM(s.estado = 'Atendido'), COUNT(*)
+        FROM seguimientos s
+        {"WHERE " + " AND ".join(where) if where else ""}
+        GROUP BY s.asesor_nombre
+    """)
+    params += p
+
+    sql = f"""
+        SELECT k.asesor,
+               SUM(k.dias_gestion) AS dias_gestion, SUM(k.cerradas) AS cerradas,
+               SUM(k.contacto_a_tiempo) AS contacto_a_tiempo, SUM(k.leads_evaluados) AS leads_evaluados,
+               SUM(k.leads_con_seguimiento) AS leads_con_seguimiento, SUM(k.leads) AS leads,
+               SUM(k.seguimientos_atendidos) AS seguimientos_atendidos, SUM(k.seguimientos) AS seguimientos
+        FROM ({" UNION ALL ".join(partes)}) k
+        GROUP BY k.asesor WITH ROLLUP
+    """
+    return sql, tuple(params)
 
 
-def calcular_tiempo_gestion_promedio():
-    """Calcula el tiempo promedio (en días) desde creación hasta cierre (Ganada/Perdida)."""
-    conn = None
-    cursor = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        sql = """
-            SELECT AVG(DATEDIFF(fecha_cierre, fecha_creacion)) as tiempo_promedio_dias
-            FROM oportunidades
-            WHERE estado_oportunidad IN ('Ganada', 'Perdida') AND fecha_cierre IS NOT NULL
-        """
-        cursor.execute(sql)
-        resultado = cursor.fetchone()
-        return (
-            resultado["tiempo_promedio_dias"]
-            if resultado and resultado["tiempo_promedio_dias"] is not None
-            else 0
-        )
-    except Error as e:
-        print(f"ERROR EN BD (calcular_tiempo_gestion_promedio): {e}")
-        return 0
-    finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
+def _porcentaje(parte, total):
+    return float(parte) * 100 / float(total) if total else 0.0
 
 
-def calcular_cumplimiento_primer_contacto(horas_limite=24):
-    """Calcula el % de leads contactados (primer seguimiento) dentro de las horas_limite."""
-    conn = None
-    cursor = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        sql = """
-            SELECT
-                c.id,
-                c.fecha_contacto as fecha_registro,
-                MIN(s.fecha_creacion) as fecha_primer_seguimiento
-            FROM clientes c
-            LEFT JOIN seguimientos s ON c.id = s.cliente_id
-            WHERE c.estado IN ('potencial', 'activo')
-            GROUP BY c.id, c.fecha_contacto
-        """
-        cursor.execute(sql)
-        leads = cursor.fetchall()
-        if not leads:
-            return 0.0
-
-        cumplen = 0
-        total_evaluados = 0
-        for lead in leads:
-            if lead["fecha_registro"]:
-                total_evaluados += 1
-                if (
-                    lead["fecha_primer_seguimiento"]
-                    and (
-                        lead["fecha_primer_seguimiento"] - lead["fecha_registro"]
-                    ).total_seconds()
-                    <= horas_limite * 3600
-                ):
-                    cumplen += 1
-        return (cumplen / total_evaluados) * 100 if total_evaluados > 0 else 0.0
-    except Error as e:
-        print(f"ERROR EN BD (calcular_cumplimiento_primer_contacto): {e}")
-        return 0.0
-    finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
+def _kpis_de_fila(fila):
+    return {
+        "tiempo_promedio_gestion": float(fila["dias_gestion"] or 0) / fila["cerradas"] if fila["cerradas"] else 0,
+        "cumplimiento_primer_contacto": _porcentaje(fila["contacto_a_tiempo"] or 0, fila["leads_evaluados"]),
+        "leads_con_interaccion": _porcentaje(fila["leads_con_seguimiento"] or 0, fila["leads"]),
+        "tareas_completadas_total": _porcentaje(fila["seguimientos_atendidos"] or 0, fila["seguimientos"]),
+        "oportunidades_cerradas": int(fila["cerradas"] or 0),
+        "leads": int(fila["leads"] or 0),
+        "seguimientos": int(fila["seguimientos"] or 0),
+    }
 
 
-def calcular_porcentaje_leads_con_seguimiento():
-    """Calcula el % de clientes (potenciales o activos) que tienen al menos un seguimiento registrado."""
-    conn = None
-    cursor = None
-    try:
-        conn = get_connection()
+def calcular_indicadores_crm(desde=None, hasta=None, horas_limite=24, asesor=None):
+    """
+    Calcula los indicadores del CRM en una sola consulta.
+    `desde`/`hasta` (YYYY-MM-DD, inclusive) filtran cada indicador por su
+    propia fecha: cierre de la oportunidad, contacto del lead y creación del
+    seguimiento. Devuelve {"global": {...}, "por_asesor": [{"asesor", ...}]}.
+    """
+    sql, params = _sql_indicadores_crm(desde, hasta, horas_limite, asesor)
+    with conexion() as conn:
         cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, params)
+            filas = cursor.fetchall()
+        except Error as e:
+            print(f"ERROR EN BD (calcular_indicadores_crm): {e}")
+            raise e
+        finally:
+            cursor.close()
 
-        sql_seguimientos = (
-            "SELECT COUNT(DISTINCT cliente_id) as con_seguimiento FROM seguimientos"
-        )
-        cursor.execute(sql_seguimientos)
-        con_seguimiento = (cursor.fetchone() or {}).get("con_seguimiento", 0)
+    vacio = {"dias_gestion": 0, "cerradas": 0, "contacto_a_tiempo": 0, "leads_evaluados": 0,
+             "leads_con_seguimiento": 0, "leads": 0, "seguimientos_atendidos": 0, "seguimientos": 0}
+    # La fila del ROLLUP (asesor NULL) es el total; los grupos sin asesor vienen como SIN_ASESOR
+    total = next((f for f in filas if f["asesor"] is None), vacio)
+    por_asesor = [
+        dict(asesor=f["asesor"], **_kpis_de_fila(f)) for f in filas if f["asesor"] is not None
+    ]
+    por_asesor.sort(key=lambda k: (-k["leads"], k["asesor"]))
+    return {"global": _kpis_de_fila(total), "por_asesor": por_asesor}
 
-        sql_total = "SELECT COUNT(*) as total FROM clientes WHERE estado IN ('potencial', 'activo')"
-        cursor.execute(sql_total)
-        total_clientes = (cursor.fetchone() or {}).get("total", 0)
+# --- Espejo de Google Sheets en MySQL ---
+# sheets_manager envía aquí cada snapshot de certificados/diplomados para
+# poder consultarlos con SQL (índices por DNI/correo, JOIN con clientes).
+TABLAS_ESPEJO_SHEETS = {"certificados": "sheets_certificados", "diplomados": "sheets_diplomados"}
+ESPEJO_LOTE = 500
 
-        return (con_seguimiento / total_clientes) * 100 if total_clientes > 0 else 0.0
-    except Error as e:
-        print(f"ERROR EN BD (calcular_porcentaje_leads_con_seguimiento): {e}")
-        return 0.0
-    finally:
-        if cursor:
+
+def sincronizar_espejo_sheets(hoja, filas, completo=True):
+    """
+    Inserta/actualiza en bloque las filas (row_id, dni, correo, nombre,
+    datos_json, huella) de la hoja. Solo se escriben las filas cuya huella
+    cambió; con `completo=True` además se borran las filas que ya no están.
+    Devuelve (escritas, borradas).
+    """
+    tabla = TABLAS_ESPEJO_SHEETS[hoja]
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            if completo:
+                cursor.execute(f"SELECT row_id, huella FROM {tabla}")
+            else:
+                cursor.execute(
+                    f"SELECT row_id, huella FROM {tabla} WHERE row_id IN ({', '.join(['%s'] * len(filas))})",
+                    tuple(f[0] for f in filas),
+                )
+            existentes = dict(cursor.fetchall())
+            cambiadas = [f for f in filas if existentes.get(f[0]) != f[5]]
+            ahora = datetime.now()
+            sql = f"""
+                INSERT INTO {tabla} (row_id, dni, correo, nombre, datos, huella, sincronizado_en)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE dni = VALUES(dni), correo = VALUES(correo), nombre = VALUES(nombre),
+                    datos = VALUES(datos), huella = VALUES(huella), sincronizado_en = VALUES(sincronizado_en)
+            """
+            for i in range(0, len(cambiadas), ESPEJO_LOTE):
+                cursor.executemany(sql, [f + (ahora,) for f in cambiadas[i:i + ESPEJO_LOTE]])
+
+            borradas = []
+            if completo:
+                vigentes = {f[0] for f in filas}
+                borradas = [row_id for row_id in existentes if row_id not in vigentes]
+                for i in range(0, len(borradas), ESPEJO_LOTE):
+                    bloque = borradas[i:i + ESPEJO_LOTE]
+                    cursor.execute(
+                        f"DELETE FROM {tabla} WHERE row_id IN ({', '.join(['%s'] * len(bloque))})", tuple(bloque)
+                    )
+            conn.commit()
+            return len(cambiadas), len(borradas)
+        except Error as e:
+            print(f"ERROR EN BD (sincronizar_espejo_sheets): {e}")
+            conn.rollback()
+            raise e
+        finally:
             cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
 
 
-def calcular_porcentaje_seguimientos_atendidos(asesor_nombre=None):
-    """Calcula el % de seguimientos 'Atendidos' (opcionalmente filtrado por asesor)."""
-    conn = None
-    cursor = None
-    try:
-        conn = get_connection()
+def clientes_pagados_sin_certificado(hoja="certificados"):
+    """Clientes activos con pagos registrados cuyo DNI no figura en la hoja."""
+    tabla = TABLAS_ESPEJO_SHEETS[hoja]
+    with conexion() as conn:
         cursor = conn.cursor(dictionary=True)
-        base_sql = "SELECT COUNT(*) as count FROM seguimientos"
-        params = []
-        where_clause = ""
-        if asesor_nombre:
-            where_clause = " WHERE asesor_nombre = %s"
-            params.append(asesor_nombre)
-
-        sql_atendidos = (
-            base_sql
-            + where_clause
-            + (" AND " if where_clause else " WHERE ")
-            + "estado = 'Atendido'"
-        )
-        cursor.execute(sql_atendidos, tuple(params))
-        atendidos = (cursor.fetchone() or {}).get("count", 0)
-
-        sql_total = base_sql + where_clause
-        cursor.execute(sql_total, tuple(params))
-        total = (cursor.fetchone() or {}).get("count", 0)
-
-        return (atendidos / total) * 100 if total > 0 else 0.0
-    except Error as e:
-        print(f"ERROR EN BD (calcular_porcentaje_seguimientos_atendidos): {e}")
-        return 0.0
-    finally:
-        if cursor:
+        try:
+            cursor.execute(f"""
+                SELECT c.id, c.nombre, c.dni, c.correo, c.celular,
+                       COUNT(p.id) AS pagos, MAX(p.fecha) AS ultimo_pago
+                FROM clientes c
+                JOIN pagos p ON p.cliente_id = c.id
+                LEFT JOIN {tabla} s ON s.dni = c.dni
+                WHERE c.estado = 'activo' AND s.row_id IS NULL
+                GROUP BY c.id, c.nombre, c.dni, c.correo, c.celular
+                ORDER BY ultimo_pago DESC
+            """)
+            return cursor.fetchall()
+        finally:
             cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
 
 
 # --- Integración con Google Sheets (Funciones Antiguas) ---
@@ -1289,6 +2483,10 @@ def conectar_a_gsheets():
         creds_file = os.path.join(
             base_dir, "credentials.json"
         )  # Asume que credentials.json está en la raíz
+        # Solo las funciones antiguas las usan: no se cargan al iniciar la app
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
         creds = ServiceAccountCredentials.from_json_keyfile_name(creds_file, scope)
         client = gspread.authorize(creds)
         return client
@@ -1352,54 +2550,206 @@ def obtener_clientes_en_deuda():
     return res
 
 
-def consultar_pagos(query="", page=1, per_page=8):
-    conn = get_connection()
-    cursor = conn.cursor()
-    offset = (page - 1) * per_page
-    query = query.lower().strip() if query else ""
+# --- Consulta paginada de pagos (keyset / seek) ---
+# En lugar de traer todas las filas y cortarlas en Python, cada página pide a
+# MySQL solo `per_page + 1` filas a partir de la clave de la última fila vista.
+
+_COLUMNAS_CONSULTA = """
+    p.id, p.fecha, c.nombre, c.celular, p.especialidad, p.modalidad,
+    p.cuota, p.tipo_de_cuota, p.banco, p.destino, p.numero_operacion,
+    c.dni, c.correo, c.genero, p.asesor, c.id, c.estado,
+    p.monto_total_diplomado, p.numero_cuota, p.proxima_fecha_pago,
+    CASE
+        WHEN p.numero_cuota = 0 THEN 'FINALIZADO'
+        WHEN p.proxima_fecha_pago < CURDATE() THEN 'DEUDA'
+        WHEN p.proxima_fecha_pago = CURDATE() THEN 'POR VENCER'
+        ELSE 'AL DIA'
+    END AS estado_dinamico
+"""
+
+# Caché de conteos: {clave_filtros: (total, timestamp)}. La clave incluye el
+# texto libre de búsqueda, así que se acota como LRU para no crecer sin límite.
+CONTEO_CACHE = OrderedDict()
+CONTEO_CACHE_SEGUNDOS = 60
+CONTEO_CACHE_MAX = 256
+_CONTEO_LOCK = threading.Lock()
+
+
+def _invalidar_conteos():
+    """Limpia los conteos cacheados tras escribir en pagos o clientes."""
+    with _CONTEO_LOCK:
+        CONTEO_CACHE.clear()
+
+
+def _codificar_cursor(valores):
+    """Convierte la clave de una fila en un token opaco para la URL."""
+    texto = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in valores])
+    return base64.urlsafe_b64encode(texto.encode("utf-8")).decode("ascii")
+
+
+def _decodificar_cursor(token):
+    """
+    Inverso de `_codificar_cursor`. Devuelve None si el token es inválido o
+    no es una clave de dos valores (la que usan todas las paginaciones).
+    """
+    if not token:
+        return None
+    try:
+        clave = json.loads(base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8"))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(clave, list) or len(clave) != 2:
+        return None
+    return clave
+
+
+def _filtros_consulta(query, fecha_vence, especialidad, solo_inactivos):
+    """
+    Construye el FROM/WHERE común a la página y al conteo.
+    Devuelve (modo, sql_from_where, params).
+    """
+    query = (query or "").strip().lower()
+    where, params = [], []
 
-    # 1. Lógica para filtros rápidos (Morosos / Vencen Hoy)
     if query == "deuda":
-        sql = """SELECT p.id, p.fecha, c.nombre, c.celular, p.especialidad, p.modalidad, p.cuota, 
-                        p.tipo_de_cuota, p.banco, p.destino, p.numero_operacion, c.dni, c.correo, 
-                        c.genero, p.asesor, c.id, c.estado, 0, p.numero_cuota, p.proxima_fecha_pago, 'DEUDA' 
-                 FROM pagos p JOIN clientes c ON p.cliente_id = c.id 
-                 WHERE p.proxima_fecha_pago < CURDATE() AND p.numero_cuota != 0 
-                 ORDER BY p.fecha DESC LIMIT %s OFFSET %s"""
-        count_sql = "SELECT COUNT(*) FROM pagos WHERE proxima_fecha_pago < CURDATE() AND numero_cuota != 0"
-        params = (per_page, offset)
-        count_params = ()
+        modo = "deuda"
+        from_sql = "FROM pagos p JOIN clientes c ON p.cliente_id = c.id"
+        where.append("p.proxima_fecha_pago < CURDATE() AND p.numero_cuota != 0")
     elif query == "hoy":
-        sql = """SELECT p.id, p.fecha, c.nombre, c.celular, p.especialidad, p.modalidad, p.cuota, 
-                        p.tipo_de_cuota, p.banco, p.destino, p.numero_operacion, c.dni, c.correo, 
-                        c.genero, p.asesor, c.id, c.estado, 0, p.numero_cuota, p.proxima_fecha_pago, 'AL DIA' 
-                 FROM pagos p JOIN clientes c ON p.cliente_id = c.id 
-                 WHERE p.proxima_fecha_pago = CURDATE() 
-                 ORDER BY p.fecha DESC LIMIT %s OFFSET %s"""
-        count_sql = "SELECT COUNT(*) FROM pagos WHERE proxima_fecha_pago = CURDATE()"
-        params = (per_page, offset)
-        count_params = ()
+        modo = "hoy"
+        from_sql = "FROM pagos p JOIN clientes c ON p.cliente_id = c.id"
+        where.append("p.proxima_fecha_pago = CURDATE()")
     else:
-        # 2. Búsqueda general (Si query está vacío, muestra TODOS por el LIKE %%)
-        sql = """SELECT p.id, p.fecha, c.nombre, c.celular, p.especialidad, p.modalidad, p.cuota, 
-                        p.tipo_de_cuota, p.banco, p.destino, p.numero_operacion, c.dni, c.correo, 
-                        c.genero, p.asesor, c.id, c.estado, 0, p.numero_cuota, p.proxima_fecha_pago, 
-                        CASE 
-                            WHEN p.numero_cuota = 0 THEN 'FINALIZADO' 
-                            WHEN p.proxima_fecha_pago < CURDATE() THEN 'DEUDA' 
-                            ELSE 'AL DIA' 
-                        END 
-                 FROM pagos p JOIN clientes c ON p.cliente_id = c.id 
-                 WHERE c.nombre LIKE %s OR c.dni LIKE %s 
-                 ORDER BY p.id DESC LIMIT %s OFFSET %s"""
-        count_sql = "SELECT COUNT(*) FROM pagos p JOIN clientes c ON p.cliente_id = c.id WHERE c.nombre LIKE %s OR c.dni LIKE %s"
-        search = f"%{query}%"
-        params = (search, search, per_page, offset)
-        count_params = (search, search)
-
-    cursor.execute(sql, params)
-    res = cursor.fetchall()
-    cursor.execute(count_sql, count_params)
-    total = cursor.fetchone()[0]
-    conn.close()
-    return res, total
+        modo = "general"
+        from_sql = "FROM clientes c LEFT JOIN pagos p ON c.id = p.cliente_id"
+        estado = "inactivo" if solo_inactivos else "activo"
+        where.append("c.estado = %s")
+        params.append(estado)
+        if query:
+            condicion, params_busqueda, _ = _filtro_busqueda_clientes(query, estados=[estado])
+            where.append(condicion)
+            params.extend(params_busqueda)
+
+    if especialidad:
+        where.append("p.especialidad = %s")
+        params.append(especialidad)
+    if fecha_vence:
+        where.append("p.proxima_fecha_pago = %s")
+        params.append(fecha_vence)
+
+    return modo, f"{from_sql} WHERE " + " AND ".join(where), params
+
+
+def _clave_fila(modo, fila):
+    """Valores de orden de una fila (índices según `_COLUMNAS_CONSULTA`)."""
+    if modo == "deuda":
+        return [fila[19], fila[0]]
+    if modo == "hoy":
+        return [fila[2] or "", fila[0]]
+    return [fila[0], fila[15]]
+
+
+def _orden_y_seek(modo, clave, hacia_atras):
+    """
+    Devuelve (predicado_seek, params, order_by) para el modo dado.
+    - deuda:   proxima_fecha_pago ASC, p.id ASC
+    - hoy:     nombre ASC, p.id ASC
+    - general: p.id DESC (clientes sin pagos al final), c.id DESC
+    """
+    if modo in ("deuda", "hoy"):
+        k1 = "p.proxima_fecha_pago" if modo == "deuda" else "COALESCE(c.nombre, '')"
+        op, sentido = (">", "ASC") if not hacia_atras else ("<", "DESC")
+        order_by = f"{k1} {sentido}, p.id {sentido}"
+        if clave is None:
+            return None, [], order_by
+        seek = f"({k1} {op} %s OR ({k1} = %s AND p.id {op} %s))"
+        return seek, [clave[0], clave[0], clave[1]], order_by
+
+    # Modo general: MySQL ordena los NULL de p.id al final en DESC y al
+    # inicio en ASC, justo lo que necesitamos en cada sentido.
+    if not hacia_atras:
+        order_by = "p.id DESC, c.id DESC"
+        if clave is None:
+            return None, [], order_by
+        if clave[0] is not None:
+            return "(p.id < %s OR p.id IS NULL)", [clave[0]], order_by
+        return "(p.id IS NULL AND c.id < %s)", [clave[1]], order_by
+
+    order_by = "p.id ASC, c.id ASC"
+    if clave[0] is not None:
+        return "p.id > %s", [clave[0]], order_by
+    return "(p.id IS NOT NULL OR c.id > %s)", [clave[1]], order_by
+
+
+def contar_pagos_filtrados(query="", fecha_vence=None, especialidad=None, solo_inactivos=False):
+    """
+    Total de filas para los filtros dados, cacheado `CONTEO_CACHE_SEGUNDOS`
+    para no repetir el COUNT en cada cambio de página.
+    """
+    clave_cache = ((query or "").strip().lower(), fecha_vence or None, especialidad or None, bool(solo_inactivos))
+    with _CONTEO_LOCK:
+        en_cache = CONTEO_CACHE.get(clave_cache)
+        if en_cache and time.time() - en_cache[1] < CONTEO_CACHE_SEGUNDOS:
+            CONTEO_CACHE.move_to_end(clave_cache)
+            return en_cache[0]
+        if en_cache:
+            del CONTEO_CACHE[clave_cache]
+
+    _, from_where, params = _filtros_consulta(query, fecha_vence, especialidad, solo_inactivos)
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT COUNT(*) {from_where}", tuple(params))
+            total = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+    with _CONTEO_LOCK:
+        CONTEO_CACHE[clave_cache] = (total, time.time())
+        CONTEO_CACHE.move_to_end(clave_cache)
+        while len(CONTEO_CACHE) > CONTEO_CACHE_MAX:
+            CONTEO_CACHE.popitem(last=False)
+    return total
+
+
+def consultar_pagos(query="", fecha_vence=None, especialidad=None, solo_inactivos=False,
+                    cursor_token=None, hacia_atras=False, per_page=8):
+    """
+    Devuelve una página de la consulta de pagos (21 columnas, igual que
+    `buscar_pagos_completos`) usando paginación por clave (keyset).
+
+    `cursor_token` es la clave de la última fila de la página anterior (o de
+    la primera, si `hacia_atras`). Devuelve un dict con `filas`,
+    `cursor_siguiente` y `cursor_anterior` (None cuando no hay más páginas).
+    """
+    modo, from_where, params = _filtros_consulta(query, fecha_vence, especialidad, solo_inactivos)
+    clave = _decodificar_cursor(cursor_token)
+    if clave is None:
+        hacia_atras = False
+    seek, seek_params, order_by = _orden_y_seek(modo, clave, hacia_atras)
+
+    sql = f"SELECT {_COLUMNAS_CONSULTA} {from_where}"
+    if seek:
+        sql += f" AND {seek}"
+    sql += f" ORDER BY {order_by} LIMIT %s"
+
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, tuple(params + seek_params + [per_page + 1]))
+            filas = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    hay_mas = len(filas) > per_page
+    filas = filas[:per_page]
+    if hacia_atras:
+        filas.reverse()
+        hay_anterior, hay_siguiente = hay_mas, True
+    else:
+        hay_anterior, hay_siguiente = clave is not None, hay_mas
+
+    return {
+        "filas": filas,
+        "cursor_siguiente": _codificar_cursor(_clave_fila(modo, filas[-1])) if filas and hay_siguiente else None,
+        "cursor_anterior": _codificar_cursor(_clave_fila(modo, filas[0])) if filas and hay_anterior else None,
+    }
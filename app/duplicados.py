@@ -0,0 +1,217 @@
+"""
+Módulo de Detección de Clientes Duplicados
+------------------------------------------
+Encuentra pares de `clientes` que probablemente son la misma persona aunque
+tengan otro DNI (error de tipeo), el nombre escrito distinto o un celular con
+prefijo. Comparar todos contra todos es O(n²); en su lugar cada cliente se
+reparte en "bloques" por claves baratas (celular, correo y variantes del DNI)
+y solo se comparan los clientes que comparten algún bloque.
+
+El nombre no es clave de bloqueo: por sí solo no alcanza el `UMBRAL` (ver
+`puntaje`), así que todo par que lo alcanza comparte alguna de esas claves y
+el bloqueo no pierde candidatos.
+
+Aquí no se toca la base de datos: `database_manager` carga los clientes,
+guarda los pares en `clientes_duplicados` y hace la fusión.
+"""
+
+# --- Importaciones ---
+from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from app.search_index import normalizar
+
+# --- Configuración ---
+UMBRAL = 0.7
+# Un bloque más grande que esto es un valor de relleno (celular de la
+# oficina, "sincorreo@..."): compararlo entero costaría O(b²) sin aportar pares.
+MAX_BLOQUE = 200
+_DOMINIOS_GMAIL = ("gmail.com", "googlemail.com")
+
+
+# --- Normalización ---
+def normalizar_celular(celular):
+    """Solo dígitos y sin el código de país de Perú: '+51 987-654-321' -> '987654321'."""
+    digitos = "".join(c for c in str(celular or "") if c.isdigit())
+    if len(digitos) == 11 and digitos.startswith("51"):
+        digitos = digitos[2:]
+    return digitos if len(digitos) >= 7 else ""
+
+
+def normalizar_correo(correo):
+    """Minúsculas; en Gmail sin puntos ni '+etiqueta' en la parte local."""
+    correo = str(correo or "").strip().lower()
+    if "@" not in correo:
+        return ""
+    local, dominio = correo.rsplit("@", 1)
+    if dominio in _DOMINIOS_GMAIL:
+        local, dominio = local.split("+", 1)[0].replace(".", ""), "gmail.com"
+    return f"{local}@{dominio}"
+
+
+def normalizar_nombre(nombre):
+    """Tokens del nombre sin tildes ni mayúsculas, ordenados ('Quispe Ana' == 'Ana Quispe')."""
+    return " ".join(sorted(t for t in normalizar(nombre).split() if len(t) > 1 and "@" not in t))
+
+
+def _normalizar_dni(dni):
+    return "".join(c for c in str(dni or "") if c.isalnum()).lower()
+
+
+def preparar(cliente_id, nombre, dni, correo, celular):
+    """Registro normalizado que usan `claves` y `puntaje`."""
+    return {
+        "id": cliente_id,
+        "nombre": normalizar_nombre(nombre),
+        "dni": _normalizar_dni(dni),
+        "correo": normalizar_correo(correo),
+        "celular": normalizar_celular(celular),
+    }
+
+
+# --- Bloqueo ---
+def claves(registro):
+    """Claves de bloqueo de un registro preparado."""
+    resultado = set()
+    if registro["celular"]:
+        resultado.add("cel:" + registro["celular"])
+    if registro["correo"]:
+        resultado.add("correo:" + registro["correo"])
+    # El DNI sin cada uno de sus dígitos: dos DNI a un dígito de distancia
+    # (cambio, alta, baja o transposición) comparten al menos una clave.
+    dni = registro["dni"]
+    if len(dni) >= 6:
+        resultado.update(f"dni:{dni[:i]}{dni[i + 1:]}" for i in range(len(dni)))
+    return resultado
+
+
+def variantes_dni(dni):
+    """
+    Todos los DNI a un dígito de distancia de `dni` (cambio, alta, baja o
+    transposición), para buscar candidatos con `dni IN (...)` sobre el
+    índice único en vez de recorrer la tabla. Vacío si el DNI es muy corto.
+    """
+    dni = _normalizar_dni(dni)
+    if len(dni) < 6:
+        return []
+    digitos = "0123456789"
+    variantes = set()
+    for i in range(len(dni) + 1):
+        variantes.update(dni[:i] + d + dni[i:] for d in digitos)
+        if i < len(dni):
+            variantes.add(dni[:i] + dni[i + 1:])
+            variantes.update(dni[:i] + d + dni[i + 1:] for d in digitos)
+        if i < len(dni) - 1:
+            variantes.add(dni[:i] + dni[i + 1] + dni[i] + dni[i + 2:])
+    variantes.discard(dni)
+    return sorted(variantes)
+
+
+# --- Puntaje ---
+def _distancia_uno(a, b):
+    """True si a y b difieren en exactamente un carácter (cambio, alta o baja) o una transposición."""
+    if a == b or abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diferencias = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(diferencias) == 1 or (
+            len(diferencias) == 2 and diferencias[1] == diferencias[0] + 1
+            and a[diferencias[0]] == b[diferencias[1]] and a[diferencias[1]] == b[diferencias[0]]
+        )
+    corto, largo = (a, b) if len(a) < len(b) else (b, a)
+    return any(largo[:i] + largo[i + 1:] == corto for i in range(len(largo)))
+
+
+def puntaje(a, b, umbral=None):
+    """
+    (puntaje entre 0 y 1, [motivos]) de que a y b sean la misma persona.
+
+    El nombre aporta hasta 0.5; el mismo celular 0.3 (a veces lo comparte
+    la familia) y el mismo correo 0.35. Como `clientes.dni` es único, un
+    duplicado casi siempre trae el DNI mal escrito: a un dígito de distancia
+    suma 0.35, y dos DNI sin relación restan 0.15.
+
+    Con `umbral`, devuelve (0.0, []) en cuanto el par ya no puede alcanzarlo
+    sin calcular la similitud completa de los nombres (la parte cara).
+    """
+    total, motivos = 0.0, []
+    if a["celular"] and a["celular"] == b["celular"]:
+        total += 0.3
+        motivos.append("mismo celular")
+    if a["correo"] and a["correo"] == b["correo"]:
+        total += 0.35
+        motivos.append("mismo correo")
+    if a["dni"] and b["dni"]:
+        if a["dni"] == b["dni"]:
+            total += 0.5
+            motivos.append("mismo DNI")
+        elif _distancia_uno(a["dni"], b["dni"]):
+            total += 0.35
+            motivos.append("DNI a un dígito")
+        else:
+            total -= 0.15
+    if a["nombre"] and b["nombre"]:
+        comparador = SequenceMatcher(None, a["nombre"], b["nombre"])
+        if umbral is not None:
+            minimo = (umbral - total) / 0.5
+            if minimo > 1 or comparador.real_quick_ratio() < minimo or comparador.quick_ratio() < minimo:
+                return 0.0, []
+        similitud = comparador.ratio()
+        total += 0.5 * similitud
+        if similitud >= 0.8:
+            motivos.insert(0, f"nombre {similitud:.0%}")
+    elif umbral is not None and total < umbral:
+        return 0.0, []
+    return round(max(0.0, min(1.0, total)), 3), motivos
+
+
+# --- Detección ---
+def pares_candidatos(filas, umbral=UMBRAL, max_bloque=MAX_BLOQUE):
+    """
+    Detección por lotes. `filas` son (id, nombre, dni, correo, celular).
+    Devuelve [(id_menor, id_mayor, puntaje, motivos)] con puntaje >= umbral,
+    del más al menos probable.
+    """
+    registros = {}
+    bloques = defaultdict(list)
+    for fila in filas:
+        registro = preparar(*fila[:5])
+        registros[registro["id"]] = registro
+        for clave in claves(registro):
+            bloques[clave].append(registro["id"])
+
+    comparados, pares = set(), []
+    for ids in bloques.values():
+        if len(ids) < 2 or len(ids) > max_bloque:
+            continue
+        for a, b in combinations(sorted(ids), 2):
+            if (a, b) in comparados:
+                continue
+            comparados.add((a, b))
+            valor, motivos = puntaje(registros[a], registros[b], umbral)
+            if valor >= umbral:
+                pares.append((a, b, valor, motivos))
+    pares.sort(key=lambda par: -par[2])
+    return pares
+
+
+def candidatos_de(fila, otras, umbral=UMBRAL):
+    """
+    Detección al escribir: compara un cliente (id, nombre, dni, correo,
+    celular) con `otras` filas ya filtradas por el llamador (mismo celular,
+    mismo correo o DNI de `variantes_dni`). Devuelve los pares como
+    `pares_candidatos`.
+    """
+    nuevo = preparar(*fila[:5])
+    pares = []
+    for otra in otras:
+        registro = preparar(*otra[:5])
+        if registro["id"] == nuevo["id"]:
+            continue
+        valor, motivos = puntaje(nuevo, registro, umbral)
+        if valor >= umbral:
+            a, b = sorted((nuevo["id"], registro["id"]))
+            pares.append((a, b, valor, motivos))
+    pares.sort(key=lambda par: -par[2])
+    return pares
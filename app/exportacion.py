@@ -0,0 +1,128 @@
+"""
+Módulo de Exportación
+---------------------
+Convierte filas leídas por lotes de la base de datos en archivos descargables
+sin cargar la tabla completa en memoria. Formatos: xlsx, csv (gzip) y parquet.
+
+Las funciones de aquí reciben un iterable de filas (tuplas) y devuelven un
+generador de bloques de bytes, listo para `flask.Response`. El armado de las
+consultas vive en `database_manager.py`.
+"""
+
+# --- Importaciones ---
+import csv
+import gzip
+import io
+import tempfile
+
+# --- Configuración ---
+TAMANO_BLOQUE = 64 * 1024
+
+# Formato -> (extensión, mimetype)
+FORMATOS = {
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("csv.gz", "application/gzip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def verificar_formato(formato):
+    """
+    Valida el formato antes de abrir la consulta: ValueError si no existe,
+    ImportError si es parquet y falta `pyarrow`.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    if formato == "parquet":
+        import pyarrow  # noqa: F401
+
+
+def _leer_en_bloques(archivo, tamano=TAMANO_BLOQUE):
+    archivo.seek(0)
+    while True:
+        bloque = archivo.read(tamano)
+        if not bloque:
+            break
+        yield bloque
+
+
+def xlsx_en_stream(nombre_hoja, encabezados, filas):
+    """
+    Escribe las filas con un libro `write_only` de openpyxl (cada fila va a
+    un archivo temporal, no a memoria) y emite el .xlsx resultante por bloques.
+
+    Límite: el .xlsx es un zip que openpyxl arma recién en `save`, así que el
+    primer byte sale cuando ya se leyeron todas las filas y se comprimió el
+    libro entero en disco. La memoria queda acotada, pero la espera antes de
+    que empiece la descarga crece con la tabla; para exportaciones grandes
+    conviene csv, que sí se emite a medida que llegan los lotes.
+    """
+    from openpyxl import Workbook  # se importa al exportar, no al iniciar la app
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(nombre_hoja)
+    hoja.append(list(encabezados))
+    for fila in filas:
+        hoja.append(fila)
+
+    with tempfile.TemporaryFile() as temporal:
+        libro.save(temporal)
+        yield from _leer_en_bloques(temporal)
+
+
+def csv_gzip_en_stream(encabezados, lotes):
+    """
+    CSV comprimido con gzip, emitido a medida que llegan los lotes. Las fechas
+    salen en ISO 8601 y los DECIMAL con su valor exacto (str de Decimal).
+    """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb") as comprimido:
+        texto = io.TextIOWrapper(comprimido, encoding="utf-8", newline="")
+        escritor = csv.writer(texto)
+        escritor.writerow(encabezados)
+        for lote in lotes:
+            escritor.writerows(
+                tuple(v.isoformat() if hasattr(v, "isoformat") else v for v in fila)
+                for fila in lote
+            )
+            texto.flush()
+            if buffer.tell() >= TAMANO_BLOQUE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        texto.flush()
+        texto.detach()
+    yield buffer.getvalue()
+
+
+def _tipo_arrow(pa, tipo):
+    """Traduce los tipos declarados en database_manager a tipos de Arrow."""
+    if tipo.startswith("decimal"):
+        precision, escala = tipo[tipo.index("(") + 1:-1].split(",")
+        return pa.decimal128(int(precision), int(escala))
+    return {
+        "entero": pa.int64(),
+        "fecha": pa.date32(),
+        "fecha_hora": pa.timestamp("s"),
+        "texto": pa.string(),
+    }[tipo]
+
+
+def parquet_en_stream(encabezados, tipos, lotes):
+    """
+    Parquet columnar con un row group por lote. Requiere `pyarrow`; el
+    esquema fijo conserva fechas como fechas y DECIMAL como decimal exacto.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = pa.schema([(nombre, _tipo_arrow(pa, tipo)) for nombre, tipo in zip(encabezados, tipos)])
+    with tempfile.TemporaryFile() as temporal:
+        with pq.ParquetWriter(temporal, esquema, compression="snappy") as escritor:
+            for lote in lotes:
+                columnas = list(zip(*lote))
+                escritor.write_table(pa.Table.from_arrays(
+                    [pa.array(col, type=campo.type) for col, campo in zip(columnas, esquema)],
+                    schema=esquema,
+                ))
+        yield from _leer_en_bloques(temporal)
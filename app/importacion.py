@@ -0,0 +1,152 @@
+"""
+Módulo de Importación
+---------------------
+Lee archivos CSV/XLSX subidos por los usuarios fila por fila (sin cargar el
+archivo entero en memoria) y entrega cada fila como un dict con las columnas
+que entiende `database_manager.importar_leads`. Es la contraparte de
+`exportacion.py`: aquí solo se interpreta el archivo; las validaciones y la
+escritura en la base de datos viven en `database_manager.py`.
+"""
+
+# --- Importaciones ---
+import csv
+import itertools
+import unicodedata
+
+# --- Configuración ---
+EXTENSIONES = ("csv", "xlsx")
+# Bytes del inicio del CSV que se usan para adivinar el separador
+MUESTRA_CSV = 4096
+# Excel en Windows guarda los CSV en latin-1/cp1252, no en UTF-8
+CODIFICACION_ALTERNATIVA = "latin-1"
+
+# Encabezado normalizado -> columna. Las campañas exportan con nombres distintos.
+ALIAS_COLUMNAS = {
+    "cliente": "cliente", "nombre": "cliente", "nombres": "cliente", "nombre completo": "cliente",
+    "nombres y apellidos": "cliente", "full name": "cliente", "name": "cliente",
+    "dni": "dni", "documento": "dni", "nro documento": "dni", "numero de documento": "dni",
+    "correo": "correo", "correo electronico": "correo", "email": "correo", "e-mail": "correo",
+    "celular": "celular", "telefono": "celular", "whatsapp": "celular", "phone": "celular",
+    "phone number": "celular",
+    "genero": "genero", "sexo": "genero",
+    "curso": "curso_interes", "curso interes": "curso_interes", "curso de interes": "curso_interes",
+    "curso_interes": "curso_interes",
+}
+
+
+def _normalizar_encabezado(texto):
+    sin_tildes = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode()
+    return " ".join(sin_tildes.lower().replace("_", " ").split())
+
+
+def _mapa_columnas(encabezados):
+    """[(indice, columna)] para los encabezados reconocidos; el resto se ignora."""
+    mapa, vistas = [], set()
+    for i, encabezado in enumerate(encabezados):
+        texto = _normalizar_encabezado(encabezado)
+        columna = ALIAS_COLUMNAS.get(texto) or ALIAS_COLUMNAS.get(texto.replace(" ", "_"))
+        if columna and columna not in vistas:
+            mapa.append((i, columna))
+            vistas.add(columna)
+    return mapa
+
+
+def _celda(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))  # Excel guarda DNI/celulares como número
+    return str(valor).strip()
+
+
+def _decodificar(linea):
+    """UTF-8 y, si la línea no lo es, latin-1 (que acepta cualquier byte)."""
+    try:
+        return linea.decode("utf-8")
+    except UnicodeDecodeError:
+        return linea.decode(CODIFICACION_ALTERNATIVA)
+
+
+def _lineas_csv(archivo):
+    """
+    Líneas del archivo ya decodificadas, una por una. Se decide la
+    codificación por línea: un archivo mezclado (filas pegadas desde otra
+    hoja) no corta la importación a la mitad con un UnicodeDecodeError.
+    """
+    for numero, bloque in enumerate(archivo):
+        if numero == 0 and bloque.startswith(b"\xef\xbb\xbf"):
+            bloque = bloque[3:]  # BOM de UTF-8
+        # Los CSV de Mac antiguos terminan las líneas solo con \r
+        for linea in bloque.splitlines(keepends=True):
+            yield _decodificar(linea)
+
+
+def _filas_csv(archivo):
+    lineas = _lineas_csv(archivo)
+    muestra, largo = [], 0
+    for linea in lineas:
+        muestra.append(linea)
+        largo += len(linea)
+        if largo >= MUESTRA_CSV:
+            break
+    try:
+        dialecto = csv.Sniffer().sniff("".join(muestra)[:MUESTRA_CSV], delimiters=",;\t")
+    except csv.Error:
+        dialecto = csv.excel
+    return csv.reader(itertools.chain(muestra, lineas), dialecto)
+
+
+def _filas_xlsx(archivo):
+    from openpyxl import load_workbook  # se importa al importar un archivo, no al iniciar la app
+
+    try:
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+    except Exception as e:
+        # zipfile.BadZipFile, InvalidFileException, KeyError por partes faltantes...
+        raise ValueError("El archivo no es un libro de Excel (.xlsx) válido.") from e
+    try:
+        yield from libro.worksheets[0].iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+def _leer(filas, numero):
+    """Siguiente fila cruda (o None al terminar); los errores del formato, como ValueError."""
+    try:
+        return next(filas, None)
+    except ValueError:
+        raise
+    except Exception as e:
+        # csv.Error (comillas sin cerrar, campo demasiado largo), XML dañado del .xlsx...
+        raise ValueError(f"No se pudo leer la fila {numero} del archivo: {e}") from e
+
+
+def _registros(filas, mapa):
+    numero = 2
+    while (fila := _leer(filas, numero)) is not None:
+        registro = {columna: _celda(fila[i]) if i < len(fila) else "" for i, columna in mapa}
+        if any(registro.values()):
+            yield numero, registro
+        numero += 1
+
+
+def leer_filas(archivo, nombre_archivo):
+    """
+    Devuelve un generador de (numero_fila, dict) por cada fila con datos.
+    `numero_fila` es la fila del archivo tal como la ve el usuario (el
+    encabezado es la fila 1). La extensión y el encabezado se revisan aquí
+    mismo, antes de que el llamador toque la base de datos: ValueError si la
+    extensión no está soportada, el archivo no se puede leer o no hay
+    columnas conocidas. Un error de formato más abajo también llega como
+    ValueError, al iterar el generador.
+    """
+    extension = nombre_archivo.rsplit(".", 1)[-1].lower() if "." in nombre_archivo else ""
+    if extension not in EXTENSIONES:
+        raise ValueError("Formato no soportado: sube un archivo .csv o .xlsx.")
+    filas = _filas_csv(archivo) if extension == "csv" else _filas_xlsx(archivo)
+
+    encabezados = _leer(filas, 1)
+    mapa = _mapa_columnas(encabezados or [])
+    if not any(columna == "cliente" for _, columna in mapa):
+        raise ValueError("El archivo no tiene una columna de nombre (cliente/nombre).")
+    return _registros(filas, mapa)
@@ -0,0 +1,268 @@
+"""
+Módulo de Migraciones de Esquema
+--------------------------------
+Aplica en orden los archivos `migrations/NNNN_nombre.sql` que aún no figuran
+en la tabla `schema_migrations`, y revisa con EXPLAIN que las consultas más
+usadas de `database_manager.py` sigan usando índices.
+
+Uso (ver app/commands.py):
+    flask --app run migrar
+    flask --app run verificar-indices [--estricto]
+"""
+
+# --- Importaciones ---
+import os
+import re
+from datetime import datetime
+from mysql.connector import Error, errorcode
+from app import database_manager as db
+
+# --- Configuración ---
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+PATRON_ARCHIVO = re.compile(r"^(\d{4})_([\w-]+)\.sql$")
+
+# Errores que indican que la sentencia ya estaba aplicada (índice o columna
+# que ya existe, índice que ya no está). Se omiten para que una migración que
+# falló a medias, o un esquema creado a mano, pueda volver a correrse entera.
+YA_APLICADA = {
+    errorcode.ER_DUP_KEYNAME,             # 1061: CREATE INDEX / ADD UNIQUE KEY
+    errorcode.ER_DUP_FIELDNAME,           # 1060: ADD COLUMN
+    errorcode.ER_CANT_DROP_FIELD_OR_KEY,  # 1091: DROP INDEX
+}
+
+
+# --- Lectura de archivos ---
+def listar_migraciones():
+    """Devuelve [(version, nombre, ruta)] ordenado por versión."""
+    migraciones = []
+    for archivo in sorted(os.listdir(MIGRATIONS_DIR)):
+        coincidencia = PATRON_ARCHIVO.match(archivo)
+        if coincidencia:
+            migraciones.append(
+                (int(coincidencia.group(1)), coincidencia.group(2), os.path.join(MIGRATIONS_DIR, archivo))
+            )
+    return migraciones
+
+
+def _sentencias(ruta):
+    """Separa un archivo SQL en sentencias, ignorando comentarios `--`."""
+    with open(ruta, encoding="utf-8") as f:
+        sin_comentarios = "\n".join(linea.split("--", 1)[0] for linea in f)
+    return [s.strip() for s in sin_comentarios.split(";") if s.strip()]
+
+
+# --- Aplicación ---
+def _ejecutar_sentencia(cursor, sentencia):
+    """Ejecuta una sentencia de migración; omite la que ya estaba aplicada."""
+    try:
+        cursor.execute(sentencia)
+    except Error as e:
+        if e.errno not in YA_APLICADA:
+            raise
+        print(f"  Ya aplicada, se omite: {e.msg}")
+
+
+def aplicar_migraciones():
+    """
+    Lleva la base de datos al esquema actual. Devuelve la lista de archivos
+    aplicados en esta ejecución (vacía si ya estaba al día).
+    """
+    aplicadas = []
+    with db.conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    nombre VARCHAR(255) NOT NULL,
+                    aplicada_en DATETIME NOT NULL
+                ) ENGINE=InnoDB
+            """)
+            cursor.execute("SELECT version FROM schema_migrations")
+            versiones = {fila[0] for fila in cursor.fetchall()}
+
+            for version, nombre, ruta in listar_migraciones():
+                if version in versiones:
+                    continue
+                print(f"Aplicando migración {version:04d}_{nombre}...")
+                # MySQL confirma cada DDL por separado: si una sentencia falla,
+                # la versión no se registra y el error indica dónde continuar.
+                # Al reintentar, lo que ya quedó hecho se omite (YA_APLICADA).
+                for sentencia in _sentencias(ruta):
+                    _ejecutar_sentencia(cursor, sentencia)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, nombre, aplicada_en) VALUES (%s, %s, %s)",
+                    (version, nombre, datetime.now()),
+                )
+                conn.commit()
+                aplicadas.append(f"{version:04d}_{nombre}")
+            return aplicadas
+        except Error as e:
+            print(f"ERROR EN BD (aplicar_migraciones): {e}")
+            raise e
+        finally:
+            cursor.close()
+
+
+# --- Verificación de índices ---
+# Consultas (por nombre de `consultas_criticas`) a las que se les acepta un
+# escaneo completo ("ALL") o un ordenamiento en memoria ("filesort"), con el
+# motivo. Todo lo que no esté aquí falla en `verificar_indices`.
+PERMITIDOS = {
+    "dashboard resumen especialidades": ({"filesort"}, "ORDER BY de un SUM sobre la tabla resumen, que es pequeña"),
+    "consulta hoy": ({"filesort"}, "orden por nombre de los pagos que vencen hoy: pocas filas"),
+    "consulta texto": ({"filesort"}, "ordena solo los ids que devolvió el índice de búsqueda (acotados)"),
+    "consulta texto sin índice": ({"ALL", "filesort"}, "LIKE de respaldo mientras el índice de búsqueda se construye"),
+    "leads": ({"filesort"}, "lista completa sin LIMIT de dos estados: ordenar cuesta lo mismo que leer las filas "
+                            "que se devuelven, y los dos rangos del índice no salen ya mezclados en orden"),
+}
+
+
+def consultas_criticas():
+    """
+    Consultas calientes de database_manager.py con parámetros de ejemplo:
+    [(nombre, sql, params)]. Mantener alineado con las funciones reales.
+    """
+    hoy = datetime.now().date()
+    consultas = []
+
+    # /consulta: una entrada por modo de filtrado (misma SQL que consultar_pagos)
+    for etiqueta, kwargs in (
+        ("consulta general", {}),
+        ("consulta especialidad", {"especialidad": "CSS"}),
+        ("consulta fecha_vence", {"fecha_vence": hoy}),
+        ("consulta hoy", {"query": "hoy"}),
+        ("consulta deuda", {"query": "deuda"}),
+        ("consulta texto", {"query": "garcia"}),
+    ):
+        modo, from_where, params = db._filtros_consulta(
+            kwargs.get("query", ""), kwargs.get("fecha_vence"), kwargs.get("especialidad"), False
+        )
+        _, _, order_by = db._orden_y_seek(modo, None, False)
+        if etiqueta == "consulta texto" and "LIKE" in from_where:
+            # El índice de búsqueda aún no estaba listo: se verifica aparte la
+            # forma que tiene la consulta con él (ids en orden de relevancia)
+            consultas.append((
+                "consulta texto sin índice",
+                f"SELECT {db._COLUMNAS_CONSULTA} {from_where} ORDER BY {order_by} LIMIT 6",
+                tuple(params),
+            ))
+            from_where = ("FROM clientes c LEFT JOIN pagos p ON c.id = p.cliente_id "
+                          "WHERE c.estado = %s AND c.id IN (%s, %s, %s)")
+            params = ["activo", 1, 2, 3]
+        consultas.append((
+            etiqueta,
+            f"SELECT {db._COLUMNAS_CONSULTA} {from_where} ORDER BY {order_by} LIMIT 6",
+            tuple(params),
+        ))
+
+    # /auditoria: página inicial, por usuario y por historial de un registro
+    for etiqueta, kwargs in (
+        ("auditoría página", {}),
+        ("auditoría por usuario", {"usuario": "admin"}),
+        ("auditoría por acción", {"accion": "EDITAR_PAGO"}),
+        ("auditoría historial de registro", {"tabla": "pagos", "registro_id": 1}),
+        ("auditoría rango de fechas", {"desde": hoy, "hasta": hoy}),
+    ):
+        where, params = db._filtros_auditoria(**kwargs)
+        consultas.append((
+            etiqueta,
+            "SELECT id FROM auditoria_accesos"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY timestamp DESC, id DESC LIMIT 51",
+            tuple(params),
+        ))
+
+    consultas += [
+        ("dashboard resumen por día",
+         "SELECT fecha, SUM(total) FROM resumen_ingresos_diarios WHERE fecha >= %s GROUP BY fecha",
+         (hoy,)),
+        ("dashboard resumen especialidades",
+         "SELECT especialidad, SUM(cantidad) AS cantidad FROM resumen_ingresos_diarios "
+         "WHERE especialidad != '' GROUP BY especialidad ORDER BY cantidad DESC LIMIT 5",
+         ()),
+        ("últimos pagos",
+         f"SELECT {db._COLUMNAS_CONSULTA} FROM pagos p JOIN clientes c ON p.cliente_id = c.id "
+         "WHERE c.estado = 'activo' ORDER BY p.id DESC LIMIT 20",
+         ()),
+        ("reporte asesores",
+         "SELECT asesor, COUNT(*), SUM(cuota) FROM pagos WHERE fecha >= %s AND fecha <= %s "
+         "GROUP BY asesor",
+         (hoy, hoy)),
+        ("pagos por cliente",
+         "SELECT * FROM pagos WHERE cliente_id = %s ORDER BY fecha DESC",
+         (1,)),
+        ("voucher duplicado",
+         "SELECT c.nombre FROM pagos p JOIN clientes c ON p.cliente_id = c.id WHERE p.numero_operacion = %s",
+         ("0",)),
+        ("cliente por dni", "SELECT id, estado FROM clientes WHERE dni = %s", ("0",)),
+        ("cliente por correo", "SELECT id FROM clientes WHERE correo = %s", ("x@x",)),
+        ("leads",
+         "SELECT id, nombre FROM clientes WHERE (estado = 'potencial' OR estado = 'inactivo') "
+         "ORDER BY fecha_contacto DESC",
+         ()),
+        ("oportunidades por asesor",
+         "SELECT o.*, c.nombre FROM oportunidades o JOIN clientes c ON o.cliente_id = c.id "
+         "WHERE o.asesor_asignado = %s AND o.estado_oportunidad NOT IN ('Ganada', 'Perdida') "
+         "ORDER BY o.ultima_actualizacion DESC",
+         ("x",)),
+        ("seguimientos por cliente",
+         "SELECT * FROM seguimientos WHERE cliente_id = %s ORDER BY fecha_creacion DESC",
+         (1,)),
+        ("etiquetas por cliente",
+         "SELECT e.id, e.nombre FROM etiquetas e JOIN cliente_etiquetas ce ON e.id = ce.etiqueta_id "
+         "WHERE ce.cliente_id = %s ORDER BY e.nombre",
+         (1,)),
+        ("pagados sin certificado",
+         "SELECT c.id FROM clientes c JOIN pagos p ON p.cliente_id = c.id "
+         "LEFT JOIN sheets_certificados s ON s.dni = c.dni WHERE c.estado = 'activo' AND s.row_id IS NULL "
+         "GROUP BY c.id",
+         ()),
+        ("duplicados pendientes",
+         "SELECT d.id FROM clientes_duplicados d JOIN clientes a ON a.id = d.cliente_a "
+         "JOIN clientes b ON b.id = d.cliente_b WHERE d.estado = 'pendiente' ORDER BY d.puntaje DESC, d.id LIMIT 100",
+         ()),
+        ("candidatos a duplicado",
+         "SELECT id FROM clientes WHERE id != %s AND (celular IN (%s, %s, %s) OR correo = %s OR dni IN (%s, %s))",
+         (0, "987654321", "51987654321", "+51987654321", "x@x", "40123457", "40123465")),
+    ]
+    # /crm/indicadores: sin filtro y con rango de fechas
+    consultas.append(("kpi indicadores", *db._sql_indicadores_crm()))
+    consultas.append(("kpi indicadores por rango", *db._sql_indicadores_crm(desde=hoy, hasta=hoy)))
+    return consultas
+
+
+def verificar_indices(estricto=False):
+    """
+    Ejecuta EXPLAIN sobre cada consulta crítica y devuelve la lista de
+    problemas encontrados (vacía si todo usa índices).
+
+    Es un problema todo escaneo completo (`type = ALL`) y todo `Using
+    filesort` sobre una tabla, salvo lo aceptado en `PERMITIDOS`. Con
+    `estricto=True` tampoco se acepta lo de `PERMITIDOS`.
+    """
+    problemas = []
+    with db.conexion() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            for nombre, sql, params in consultas_criticas():
+                aceptados = set() if estricto else PERMITIDOS.get(nombre, (set(), ""))[0]
+                cursor.execute(f"EXPLAIN {sql}", params)
+                for fila in cursor.fetchall():
+                    tabla = str(fila.get("table") or "")
+                    if not tabla or tabla.startswith("<"):
+                        # <derivedN>/<unionN,M>: resultado temporal de una subconsulta, no una tabla
+                        continue
+                    if fila.get("type") == "ALL" and "ALL" not in aceptados:
+                        problemas.append(
+                            f"{nombre}: escaneo completo de '{tabla}' "
+                            f"(possible_keys={fila.get('possible_keys')}, rows={fila.get('rows')})"
+                        )
+                    if "Using filesort" in str(fila.get("Extra") or "") and "filesort" not in aceptados:
+                        problemas.append(
+                            f"{nombre}: ordenamiento en memoria (filesort) sobre '{tabla}' "
+                            f"(key={fila.get('key')}, rows={fila.get('rows')})"
+                        )
+        finally:
+            cursor.close()
+    return problemas
@@ -12,18 +12,21 @@ from datetime import datetime
 from functools import wraps
 from flask import (
     render_template, request, redirect, url_for,
-    flash, session, send_file, send_from_directory, jsonify
+    flash, session, send_from_directory, jsonify, Response
 )
 from app import app
 from app import database_manager as db
 from mysql.connector import IntegrityError, Error as DB_Error
 from werkzeug.security import check_password_hash
 from app import sheets_manager
+from app import exportacion
+from app import importacion
 
 
 # --- Configuración y Constantes ---
 RECORDS_PER_PAGE = 5
 RECORDS_PER_PAGE_SHEETS = 20
+AUDIT_RECORDS_PER_PAGE = 50
 
 # --- Configuración de Seguridad de Login ---
 failed_logins = {}
@@ -161,8 +164,8 @@ def dashboard():
     try:
         # Obtenemos las estadísticas mejoradas (incluye datos para gráficos)[cite: 1]
         estadisticas = db.obtener_estadisticas_dashboard()
-        # Traemos los últimos 5 usando la nueva consulta con todas las columnas[cite: 1]
-        ultimos_pagos = db.buscar_pagos_completos("")[:5]
+        # Últimos 5 pagos desde el feed en memoria (sin recorrer toda la tabla)
+        ultimos_pagos = db.obtener_ultimos_pagos(5)
     except Exception as e:
         flash(f"Error al cargar los datos del dashboard: {e}", "error")
         estadisticas = {
@@ -288,36 +291,40 @@ def consulta():
     especialidad = request.args.get("especialidad")  # Filtro de especialidad
     estado_filtro = request.args.get("estado")  # Para detectar 'inactivo'
     page = request.args.get("page", 1, type=int)
+    # Cursores de paginación por clave (keyset)
+    despues = request.args.get("despues")
+    antes = request.args.get("antes")
 
     resultados_paginados = []
     total_pages = 1
+    cursor_siguiente = cursor_anterior = None
 
     try:
         # 2. LÓGICA DE FILTRADO INTEGRADA
-        # Usamos la nueva versión de buscar_pagos_completos que acepta todos los filtros
-        if query == "hoy":
-            todos_los_resultados = db.obtener_vencimientos_hoy()
-        elif query == "deuda":
-            todos_los_resultados = db.obtener_clientes_en_deuda()
-        else:
-            # Esta función ahora centraliza la búsqueda por texto, fecha, especialidad y estado
-            todos_los_resultados = db.buscar_pagos_completos(
-                query=query, 
-                fecha_vence=fecha_vence, 
-                especialidad=especialidad, 
-                solo_inactivos=(estado_filtro == 'inactivo')
-            )
-
-        # 3. PAGINACIÓN[cite: 1]
-        total_records = len(todos_los_resultados)
-        total_pages = (
-            (total_records + RECORDS_PER_PAGE - 1) // RECORDS_PER_PAGE
-            if RECORDS_PER_PAGE > 0
-            else 1
+        # La base de datos aplica los filtros y devuelve solo la página pedida
+        filtros = dict(
+            query=query,
+            fecha_vence=fecha_vence,
+            especialidad=especialidad,
+            solo_inactivos=(estado_filtro == 'inactivo')
+        )
+        pagina = db.consultar_pagos(
+            **filtros,
+            cursor_token=antes or despues,
+            hacia_atras=bool(antes),
+            per_page=RECORDS_PER_PAGE
+        )
+        resultados_paginados = pagina["filas"]
+        cursor_siguiente = pagina["cursor_siguiente"]
+        cursor_anterior = pagina["cursor_anterior"]
+        if not cursor_anterior:
+            page = 1
+
+        # 3. PAGINACIÓN (total cacheado, solo informativo)
+        total_records = db.contar_pagos_filtrados(**filtros)
+        total_pages = max(
+            (total_records + RECORDS_PER_PAGE - 1) // RECORDS_PER_PAGE, page, 1
         )
-        start_index = (page - 1) * RECORDS_PER_PAGE
-        end_index = start_index + RECORDS_PER_PAGE
-        resultados_paginados = todos_los_resultados[start_index:end_index]
 
     except DB_Error as e:
         flash(f"Error al consultar la base de datos: {e}", "error")
@@ -332,6 +339,8 @@ def consulta():
         fecha_actual=fecha_vence,      # Para mantener la fecha en el input date
         especialidad_actual=especialidad, # Para mantener el select seleccionado
         estado_actual=estado_filtro,    # Para saber si estamos viendo inactivos
+        cursor_siguiente=cursor_siguiente,
+        cursor_anterior=cursor_anterior,
         current_section="ventas"
     )
 
@@ -503,24 +512,25 @@ def reportes():
         flash(f"Error al generar el reporte: {e}", "error")
         return render_template("reportes.html", reporte=[], current_section='ventas')
 
+def _respuesta_descarga(bloques, nombre_base, formato):
+    """Envía un archivo generado por bloques sin armarlo completo en memoria."""
+    extension, mimetype = exportacion.FORMATOS[formato]
+    return Response(
+        bloques, mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={nombre_base}.{extension}'}
+    )
+
 @app.route("/descargar")
 @login_required
 def descargar():
     if session.get('role') == 'atencion_cliente':
         flash("Acceso no autorizado.", "error")
         return redirect(url_for('consulta'))
+    formato = request.args.get('formato', 'xlsx')
     try:
-        output = db.generar_excel_dinamico(HEADERS)
-        if output:
-            return send_file(
-                output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True, download_name='registros_db.xlsx'
-            )
-        else:
-            flash("Error al generar el archivo Excel.", "error")
-            return redirect(url_for('index'))
-    except DB_Error as e:
-        flash(f"Error al generar el archivo Excel: {e}", "error")
+        return _respuesta_descarga(db.generar_excel_dinamico(HEADERS, formato), 'registros_db', formato)
+    except (DB_Error, ValueError, ImportError) as e:
+        flash(f"Error al generar el archivo de descarga: {e}", "error")
         return redirect(url_for('index'))
 
 @app.route("/auditoria")
@@ -529,12 +539,46 @@ def auditoria():
     if session.get('username') != 'admin':
         flash("Acceso no autorizado.", "error")
         return redirect(url_for('index'))
+    filtros = {
+        'usuario': request.args.get('usuario', '').strip(),
+        'accion': request.args.get('accion', '').strip(),
+        'tabla': request.args.get('tabla', '').strip(),
+        'registro_id': request.args.get('registro_id', '').strip(),
+        'desde': request.args.get('desde', '').strip(),
+        'hasta': request.args.get('hasta', '').strip(),
+    }
+    if filtros['registro_id'] and not filtros['registro_id'].isdigit():
+        flash("El ID de registro debe ser numérico.", "error")
+        filtros['registro_id'] = ''
+    antes = request.args.get('antes')
+    despues = request.args.get('despues')
     try:
-        todos_los_logs = db.leer_log_auditoria()
-        return render_template("auditoria.html", logs=todos_los_logs, current_section='ventas')
+        pagina = db.consultar_auditoria(
+            **{k: v or None for k, v in filtros.items()},
+            cursor_token=antes or despues, hacia_atras=bool(antes), per_page=AUDIT_RECORDS_PER_PAGE
+        )
+        return render_template(
+            "auditoria.html", logs=pagina["filas"], filtros=filtros,
+            cursor_anterior=pagina["cursor_anterior"], cursor_siguiente=pagina["cursor_siguiente"],
+            current_section='ventas'
+        )
     except DB_Error as e:
         flash(f"Error al leer la auditoría: {e}", "error")
-        return render_template("auditoria.html", logs=[], current_section='ventas')
+        return render_template("auditoria.html", logs=[], filtros=filtros, current_section='ventas')
+
+@app.route("/api/db/pool")
+@login_required
+def estado_pool_db():
+    if session.get('username') != 'admin':
+        return jsonify({"status": "error", "message": "Acceso no autorizado."}), 403
+    return jsonify(db.estadisticas_pool())
+
+@app.route("/api/auditoria/cola")
+@login_required
+def estado_cola_auditoria():
+    if session.get('username') != 'admin':
+        return jsonify({"status": "error", "message": "Acceso no autorizado."}), 403
+    return jsonify(db.estadisticas_auditoria())
 
 
 # ================= SECCIÓN CRM (FUNCIONALIDAD COMPLETA) =================
@@ -553,6 +597,9 @@ def registrar_interesado():
         flash("Acceso no autorizado.", "error")
         return redirect(url_for('consulta'))
     
+    if request.method == 'POST' and 'archivo' in request.files:
+        return _importar_leads(request.files['archivo'])
+
     if request.method == 'POST':
         form_data = request.form.to_dict()
         asesor_actual = session.get('full_name', 'desconocido')
@@ -576,6 +623,39 @@ def registrar_interesado():
     
     return render_template("registrar_interesado.html", current_section='crm')
 
+# Filas con problemas que se muestran tras una importación (el resto solo se cuenta)
+MAX_FILAS_REPORTE_IMPORTACION = 500
+
+def _importar_leads(archivo):
+    """Importación masiva desde /registrar_interesado: procesa el archivo y muestra el reporte."""
+    if not archivo or not archivo.filename:
+        flash("Selecciona un archivo .csv o .xlsx.", "error")
+        return redirect(url_for('registrar_interesado'))
+    asesor_actual = session.get('full_name', 'desconocido')
+    try:
+        resultado = db.importar_leads(importacion.leer_filas(archivo.stream, archivo.filename), asesor_actual)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for('registrar_interesado'))
+    except DB_Error as e:
+        flash(f"Error al importar los leads: {e}", "error")
+        return redirect(url_for('registrar_interesado'))
+
+    db.registrar_auditoria(
+        asesor_actual, "IMPORTAR_LEADS", get_user_ip(), "clientes", None,
+        f"{archivo.filename}: {resultado['creados']} creados, {resultado['duplicados']} duplicados, "
+        f"{resultado['invalidos']} inválidos" + (f"; detenida: {resultado['error']}" if resultado['error'] else ""),
+    )
+    if resultado['error']:
+        flash(f"La importación se detuvo: {resultado['error']}. Las {resultado['total']} filas anteriores "
+              f"se procesaron ({resultado['creados']} registradas).", "error")
+    else:
+        flash(f"Importación terminada: {resultado['creados']} de {resultado['total']} filas registradas.",
+              "success" if resultado['creados'] else "error")
+    omitidas = [r for r in resultado['filas'] if r['estado'] != 'creado']
+    return render_template("registrar_interesado.html", current_section='crm', resultado=resultado,
+        omitidas=omitidas[:MAX_FILAS_REPORTE_IMPORTACION], omitidas_total=len(omitidas))
+
 @app.route("/oportunidades")
 @login_required
 def oportunidades():
@@ -590,6 +670,7 @@ def oportunidades():
     try:
         todas_las_oportunidades = db.obtener_oportunidades_por_asesor(asesor_actual)
         for op in todas_las_oportunidades:
+            op['version'] = db.version_oportunidad(op['ultima_actualizacion'])
             if op['estado_oportunidad'] in oportunidades_por_etapa:
                 oportunidades_por_etapa[op['estado_oportunidad']].append(op)
     except DB_Error as e:
@@ -607,6 +688,33 @@ def mover_oportunidad_api():
     except DB_Error as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route("/api/oportunidades/mover", methods=['POST'])
+@login_required
+def mover_oportunidades_api():
+    """Movimientos acumulados del tablero: {"movimientos": [{"id", "estado", "version"}, ...]}."""
+    if session.get('role') not in ['admin', 'equipo', 'crm']:
+        return jsonify({"status": "error", "message": "Acceso no autorizado."}), 403
+    movimientos = (request.get_json(silent=True) or {}).get('movimientos')
+    if not isinstance(movimientos, list) or not movimientos:
+        return jsonify({"status": "error", "message": "No se enviaron movimientos."}), 400
+    if len(movimientos) > db.MAX_MOVIMIENTOS_LOTE:
+        return jsonify({"status": "error", "message": f"Máximo {db.MAX_MOVIMIENTOS_LOTE} movimientos por envío."}), 400
+    invalidos = db.validar_movimientos(movimientos)
+    if invalidos:
+        return jsonify({
+            "status": "error",
+            "message": f"{len(invalidos)} movimiento(s) sin id, estado o version válidos.",
+            "invalidos": invalidos,
+        }), 400
+    # Cada asesor solo mueve sus propias oportunidades; el admin, cualquiera
+    asesor = None if session.get('role') == 'admin' else session.get('full_name')
+    try:
+        resultado = db.mover_oportunidades(movimientos, asesor=asesor)
+    except DB_Error as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+    resultado["status"] = "conflicto" if resultado["conflictos"] else "success"
+    return jsonify(resultado), 200
+
 @app.route("/crm/consulta")
 @login_required
 def consulta_leads():
@@ -626,12 +734,11 @@ def consulta_leads():
 def descargar_leads():
     if session.get('role') not in ['admin', 'equipo', 'crm']:
         return redirect(url_for('dashboard'))
+    formato = request.args.get('formato', 'xlsx')
     try:
-        output = db.generar_excel_leads()
-        if output:
-            return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name='registros_leads.xlsx')
-    except DB_Error as e:
-        flash(f"Error al generar Excel: {e}", "error")
+        return _respuesta_descarga(db.generar_excel_leads(formato), 'registros_leads', formato)
+    except (DB_Error, ValueError, ImportError) as e:
+        flash(f"Error al generar el archivo de descarga: {e}", "error")
     return redirect(url_for('crm_dashboard'))
 
 @app.route("/crm/lead/eliminar/<int:cliente_id>", methods=["POST"])
@@ -644,22 +751,97 @@ def eliminar_lead(cliente_id):
         flash(f"Error: {e}", "error")
     return redirect(url_for('consulta_leads'))
 
+@app.route("/crm/duplicados")
+@login_required
+def duplicados():
+    if session.get('role') not in ['admin', 'equipo', 'crm']:
+        return redirect(url_for('menu'))
+    try:
+        pares = db.listar_duplicados()
+    except DB_Error as e:
+        flash(f"Error al cargar los posibles duplicados: {e}", "error")
+        pares = []
+    return render_template("duplicados.html", pares=pares, current_section='crm')
+
+@app.route("/crm/duplicados/detectar", methods=["POST"])
+@login_required
+def detectar_duplicados():
+    if session.get('role') not in ['admin', 'equipo', 'crm']:
+        return redirect(url_for('menu'))
+    try:
+        total = db.detectar_duplicados()
+        flash(f"Detección terminada: {total} posibles duplicados.", "success")
+    except DB_Error as e:
+        flash(f"Error al detectar duplicados: {e}", "error")
+    return redirect(url_for('duplicados'))
+
+@app.route("/crm/duplicados/<int:par_id>/descartar", methods=["POST"])
+@login_required
+def descartar_duplicado(par_id):
+    if session.get('role') not in ['admin', 'equipo', 'crm']:
+        return redirect(url_for('menu'))
+    try:
+        db.descartar_duplicado(par_id, session.get('full_name'))
+        flash("Par descartado: no se volverá a proponer.", "success")
+    except DB_Error as e:
+        flash(f"Error: {e}", "error")
+    return redirect(url_for('duplicados'))
+
+@app.route("/crm/duplicados/<int:par_id>/fusionar", methods=["POST"])
+@login_required
+def fusionar_duplicado(par_id):
+    # Mueve pagos y borra un cliente: solo el administrador
+    if session.get('role') != 'admin':
+        flash("Solo el administrador puede fusionar clientes.", "error")
+        return redirect(url_for('duplicados'))
+    try:
+        par = db.obtener_par_duplicado(par_id)
+        conservar = request.form.get('conservar', type=int)
+        if not par or conservar not in par:
+            flash("El par ya no está pendiente.", "error")
+            return redirect(url_for('duplicados'))
+        eliminar = par[1] if conservar == par[0] else par[0]
+        movidos = db.fusionar_clientes(conservar, eliminar)
+        if movidos is None:
+            flash("Uno de los clientes ya no existe.", "error")
+            return redirect(url_for('duplicados'))
+        detalle = (f"Cliente {eliminar} fusionado en {conservar}: {movidos['pagos']} pagos, "
+                   f"{movidos['seguimientos']} seguimientos, {movidos['etiquetas']} etiquetas")
+        if movidos['oportunidad_descartada']:
+            detalle += (f"; oportunidad '{movidos['oportunidad']}' conservada, "
+                        f"'{movidos['oportunidad_descartada']}' eliminada")
+        db.registrar_auditoria(
+            session.get('full_name'), "FUSIONAR_CLIENTES", get_user_ip(), "clientes", conservar, detalle,
+        )
+        flash(f"Clientes fusionados: {movidos['pagos']} pagos y {movidos['seguimientos']} seguimientos movidos.", "success")
+    except DB_Error as e:
+        flash(f"Error al fusionar: {e}", "error")
+    return redirect(url_for('duplicados'))
+
 @app.route("/crm/indicadores")
 @login_required
 def reporte_indicadores():
     if session.get('role') not in ['admin', 'equipo', 'crm']:
         return redirect(url_for('menu'))
         
+    start_date = request.args.get('start_date', '').strip()
+    end_date = request.args.get('end_date', '').strip()
+    for fecha in (start_date, end_date):
+        try:
+            if fecha: datetime.strptime(fecha, '%Y-%m-%d')
+        except ValueError:
+            flash("Formato de fecha inválido (use AAAA-MM-DD).", "error")
+            start_date = end_date = ''
+            break
     try:
-        kpis = {
-            'tiempo_promedio_gestion': db.calcular_tiempo_gestion_promedio(),
-            'cumplimiento_primer_contacto': db.calcular_cumplimiento_primer_contacto(24),
-            'leads_con_interaccion': db.calcular_porcentaje_leads_con_seguimiento(),
-            'tareas_completadas_total': db.calcular_porcentaje_seguimientos_atendidos()
-        }
+        resultado = db.calcular_indicadores_crm(desde=start_date or None, hasta=end_date or None, horas_limite=24)
+        kpis, por_asesor = resultado['global'], resultado['por_asesor']
     except DB_Error:
-        kpis = {}
-    return render_template("reporte_indicadores.html", indicadores=kpis, current_section='crm')
+        kpis, por_asesor = {}, []
+    return render_template(
+        "reporte_indicadores.html", indicadores=kpis, por_asesor=por_asesor,
+        start_date=start_date, end_date=end_date, current_section='crm'
+    )
 
 # ================= RUTAS PERFIL (Con Control de Cobranza) =================
 
@@ -687,16 +869,16 @@ def perfil_cliente(cliente_id):
             
             return redirect(url_for('perfil_cliente', cliente_id=cliente_id))
         
-        cliente = db.obtener_cliente_por_id(cliente_id)
-        if not cliente:
+        perfil = db.obtener_perfil_cliente(cliente_id)
+        if not perfil:
             flash("Cliente no encontrado.", "error")
             return redirect(url_for('consulta'))
         
         return render_template("perfil_cliente.html", 
-            cliente=cliente, 
-            pagos=db.obtener_pagos_por_cliente(cliente_id),
-            historial=db.obtener_seguimientos_por_cliente(cliente_id),
-            etiquetas_cliente=db.obtener_etiquetas_por_cliente(cliente_id),
+            cliente=perfil['cliente'], 
+            pagos=perfil['pagos'],
+            historial=perfil['seguimientos'],
+            etiquetas_cliente=perfil['etiquetas'],
             current_section='crm')
     except DB_Error as e:
         flash(f"Error al cargar perfil: {e}", "error")
@@ -737,18 +919,17 @@ def eliminar_seguimiento(seguimiento_id):
 @app.route("/certificados")
 @login_required
 def certificados():
-    q = request.args.get("query", "").strip().lower()
+    q = request.args.get("query", "").strip()
+    columna = request.args.get("columna", "").strip() or None
     page = request.args.get('page', 1, type=int)
     
     try:
-        data = sheets_manager.obtener_datos_certificados()
-        if q:
-            data = [r for r in data if any(q in str(v).lower() for v in r.values())]
+        data = sheets_manager.buscar_certificados(q, columna) if q else sheets_manager.obtener_datos_certificados()
         
         total = len(data)
         pages = (total + RECORDS_PER_PAGE_SHEETS - 1) // RECORDS_PER_PAGE_SHEETS
         start = (page - 1) * RECORDS_PER_PAGE_SHEETS
-        return render_template("certificados.html", certificados=data[start:start+RECORDS_PER_PAGE_SHEETS], page=page, total_pages=pages, query=q, is_certificate_section=True)
+        return render_template("certificados.html", certificados=data[start:start+RECORDS_PER_PAGE_SHEETS], page=page, total_pages=pages, query=q, columna=columna, columnas=sheets_manager.columnas_certificados(), is_certificate_section=True, edad_datos=sheets_manager.edad_datos_certificados())
     except Exception as e:
         flash(f"Error certificados: {e}", "error")
         return render_template("certificados.html", certificados=[], page=1, total_pages=1, query=q, is_certificate_section=True)
@@ -756,22 +937,48 @@ def certificados():
 @app.route("/diplomados")
 @login_required
 def diplomados():
-    q = request.args.get("query", "").strip().lower()
+    q = request.args.get("query", "").strip()
+    columna = request.args.get("columna", "").strip() or None
     page = request.args.get('page', 1, type=int)
     
     try:
-        data = sheets_manager.obtener_datos_diplomados()
-        if q:
-            data = [r for r in data if any(q in str(v).lower() for v in r.values())]
+        data = sheets_manager.buscar_diplomados(q, columna) if q else sheets_manager.obtener_datos_diplomados()
         
         total = len(data)
         pages = (total + RECORDS_PER_PAGE_SHEETS - 1) // RECORDS_PER_PAGE_SHEETS
         start = (page - 1) * RECORDS_PER_PAGE_SHEETS
-        return render_template("diplomados.html", diplomados=data[start:start+RECORDS_PER_PAGE_SHEETS], page=page, total_pages=pages, query=q, is_certificate_section=True)
+        return render_template("diplomados.html", diplomados=data[start:start+RECORDS_PER_PAGE_SHEETS], page=page, total_pages=pages, query=q, columna=columna, columnas=sheets_manager.columnas_diplomados(), is_certificate_section=True, edad_datos=sheets_manager.edad_datos_diplomados())
     except Exception as e:
         flash(f"Error diplomados: {e}", "error")
         return render_template("diplomados.html", diplomados=[], page=1, total_pages=1, query=q, is_certificate_section=True)
 
+@app.route("/certificados/pendientes")
+@login_required
+def certificados_pendientes():
+    """Clientes con pagos que aún no figuran en la hoja (consulta sobre la copia en MySQL)."""
+    hoja = request.args.get("hoja", "certificados")
+    if hoja not in db.TABLAS_ESPEJO_SHEETS:
+        hoja = "certificados"
+    try:
+        clientes = db.clientes_pagados_sin_certificado(hoja)
+    except DB_Error as e:
+        flash(f"Error al consultar pendientes: {e}", "error")
+        clientes = []
+    return render_template("certificados_pendientes.html", clientes=clientes, hoja=hoja, is_certificate_section=True)
+
+@app.route("/api/sheets/estado")
+@login_required
+def estado_sheets():
+    """Ediciones de Sheets aún no enviadas (la UI muestra 'sincronizando')."""
+    return jsonify(sheets_manager.estado_escrituras())
+
+@app.route("/api/<any(certificados, diplomados):hoja>/dni/<dni>")
+@login_required
+def registros_sheets_por_dni(hoja, dni):
+    """Filas de la hoja con ese DNI (búsqueda directa, sin recorrer la hoja)."""
+    buscar = sheets_manager.certificados_por_dni if hoja == 'certificados' else sheets_manager.diplomados_por_dni
+    return jsonify(buscar(dni))
+
 @app.route("/certificados/editar/<int:row_id>", methods=["GET", "POST"])
 @login_required
 def editar_certificado(row_id):
@@ -779,7 +986,7 @@ def editar_certificado(row_id):
         sheets_manager.actualizar_certificado(row_id, request.form.to_dict())
         return redirect(url_for('certificados'))
     try:
-        data = next((d for d in sheets_manager.obtener_datos_certificados() if d['row_id']==row_id), None)
+        data = sheets_manager.obtener_certificado(row_id)
         if not data: return redirect(url_for('certificados'))
         return render_template("editar_certificado.html", registro={k:v for k,v in data.items() if k!='row_id'}, row_id=row_id)
     except: return redirect(url_for('certificados'))
@@ -791,7 +998,7 @@ def editar_diplomado(row_id):
         sheets_manager.actualizar_diplomado(row_id, request.form.to_dict())
         return redirect(url_for('diplomados'))
     try:
-        data = next((d for d in sheets_manager.obtener_datos_diplomados() if d['row_id']==row_id), None)
+        data = sheets_manager.obtener_diplomado(row_id)
         if not data: return redirect(url_for('diplomados'))
         return render_template("editar_diplomado.html", registro={k:v for k,v in data.items() if k!='row_id'}, row_id=row_id)
     except: return redirect(url_for('diplomados'))
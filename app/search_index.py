@@ -0,0 +1,277 @@
+"""
+Módulo de Búsqueda de Clientes
+------------------------------
+Índice de trigramas en memoria sobre nombre, DNI, correo y celular de
+`clientes`. Reemplaza los `LIKE '%q%'` (que siempre recorren toda la tabla)
+por búsquedas que:
+- ignoran tildes y mayúsculas ("Jose Nunez" encuentra "José Núñez"),
+- toleran errores de tipeo ("jaun perez" encuentra "Juan Pérez"),
+- devuelven los resultados ordenados por relevancia.
+
+Las funciones de escritura de `database_manager` mantienen el índice al día
+en el worker que escribe. Los cambios hechos por otros workers se traen antes
+de cada búsqueda con `cargador_cambios` (solo las filas modificadas), y cada
+`ttl_segundos` se reconstruye entero en segundo plano para soltar los
+clientes borrados.
+"""
+
+# --- Importaciones ---
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+# --- Normalización ---
+_SEPARADORES = re.compile(r"[^0-9a-z@.]+")
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes y con los separadores reducidos a un espacio."""
+    if not texto:
+        return ""
+    texto = str(texto).lower()
+    if not texto.isascii():
+        texto = unicodedata.normalize("NFKD", texto)
+        texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _SEPARADORES.sub(" ", texto).strip()
+
+
+def _trigramas(texto, relleno=True):
+    """Trigramas de un texto ya normalizado (con relleno estilo pg_trgm)."""
+    if relleno:
+        texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceClientes:
+    """
+    Índice invertido trigrama -> {cliente_id}. `cargador` es una función sin
+    argumentos que devuelve filas (id, nombre, dni, correo, celular, estado).
+
+    `cargador_cambios(marca)` (opcional) devuelve (filas, marca_nueva): las
+    filas con el mismo formato que cambiaron desde `marca` y la marca a usar
+    la próxima vez. Con `marca=None` solo devuelve la marca actual.
+    """
+
+    def __init__(self, cargador, ttl_segundos=300, umbral=0.45, max_resultados=200,
+                 cargador_cambios=None, max_exactos=2000):
+        self.cargador = cargador
+        self.cargador_cambios = cargador_cambios
+        self.ttl_segundos = ttl_segundos
+        self.umbral = umbral
+        self.max_resultados = max_resultados
+        self.max_exactos = max_exactos
+
+        self._lock = threading.RLock()
+        self._lock_construccion = threading.Lock()
+        self._postings = defaultdict(set)
+        self._docs = {}  # id -> (campos_normalizados, trigramas, estado)
+        self._construido_en = 0
+        self._reconstruyendo = False
+        self._pendientes = None
+        self._lock_cambios = threading.Lock()
+        self._marca = None
+
+    # --- Construcción ---
+    @staticmethod
+    def _documento(nombre, dni, correo, celular):
+        campos = tuple(normalizar(v) for v in (nombre, dni, correo, celular))
+        trigramas = set()
+        for campo in campos:
+            if campo:
+                trigramas |= _trigramas(campo)
+        return campos, trigramas
+
+    def reconstruir(self):
+        """Carga todos los clientes y reemplaza el índice de una sola vez."""
+        with self._lock_construccion:
+            with self._lock:
+                # Escrituras que lleguen mientras se carga: se reaplican al final
+                self._pendientes = []
+            try:
+                # La marca se toma antes de leer: lo que cambie durante la
+                # carga vuelve a llegar en la siguiente sincronización
+                marca = self.cargador_cambios(None)[1] if self.cargador_cambios else None
+                postings = defaultdict(set)
+                docs = {}
+                for cliente_id, nombre, dni, correo, celular, estado in self.cargador():
+                    campos, trigramas = self._documento(nombre, dni, correo, celular)
+                    docs[cliente_id] = (campos, trigramas, estado)
+                    for t in trigramas:
+                        postings[t].add(cliente_id)
+                with self._lock:
+                    self._postings = postings
+                    self._docs = docs
+                    self._construido_en = time.time()
+                    self._marca = marca
+                    for operacion, args in self._pendientes:
+                        operacion(*args)
+            finally:
+                with self._lock:
+                    self._pendientes = None
+                    self._reconstruyendo = False
+
+    def _reconstruir_en_segundo_plano(self):
+        try:
+            self.reconstruir()
+        except Exception as e:
+            print(f"Error al reconstruir el índice de búsqueda: {e}")
+
+    def _asegurar_vigente(self):
+        """
+        Lanza la (re)construcción en segundo plano si hace falta. Devuelve
+        False mientras el índice todavía no se ha construido nunca.
+        """
+        with self._lock:
+            listo = bool(self._construido_en)
+            vencido = time.time() - self._construido_en > self.ttl_segundos
+            if vencido and not self._reconstruyendo:
+                self._reconstruyendo = True
+                threading.Thread(target=self._reconstruir_en_segundo_plano, daemon=True).start()
+        return listo
+
+    def _sincronizar(self):
+        """Aplica los clientes que otros workers cambiaron desde la última marca."""
+        if not self.cargador_cambios:
+            return
+        with self._lock_cambios:
+            with self._lock:
+                marca = self._marca
+            try:
+                filas, nueva_marca = self.cargador_cambios(marca)
+            except Exception as e:
+                print(f"Error al sincronizar el índice de búsqueda: {e}")
+                return
+            for cliente_id, nombre, dni, correo, celular, estado in filas:
+                self.actualizar(cliente_id, nombre, dni, correo, celular, estado)
+            with self._lock:
+                # Una reconstrucción pudo terminar mientras tanto con una marca propia
+                if self._marca == marca:
+                    self._marca = nueva_marca
+
+    # --- Mantenimiento en escrituras ---
+    def _registrar(self, operacion, *args):
+        """Aplica la operación si el índice existe y la anota si se está cargando."""
+        with self._lock:
+            if self._pendientes is not None:
+                self._pendientes.append((operacion, args))
+            if self._construido_en:
+                operacion(*args)
+
+    def actualizar(self, cliente_id, nombre, dni, correo, celular, estado):
+        """Inserta o reemplaza un cliente."""
+        self._registrar(self._actualizar, cliente_id, nombre, dni, correo, celular, estado)
+
+    def cambiar_estado(self, cliente_id, estado):
+        self._registrar(self._cambiar_estado, cliente_id, estado)
+
+    def eliminar(self, cliente_id):
+        self._registrar(self._quitar, cliente_id)
+
+    def _actualizar(self, cliente_id, nombre, dni, correo, celular, estado):
+        self._quitar(cliente_id)
+        campos, trigramas = self._documento(nombre, dni, correo, celular)
+        self._docs[cliente_id] = (campos, trigramas, estado)
+        for t in trigramas:
+            self._postings[t].add(cliente_id)
+
+    def _cambiar_estado(self, cliente_id, estado):
+        doc = self._docs.get(cliente_id)
+        if doc:
+            self._docs[cliente_id] = (doc[0], doc[1], estado)
+
+    def _quitar(self, cliente_id):
+        doc = self._docs.pop(cliente_id, None)
+        if doc:
+            for t in doc[1]:
+                ids = self._postings.get(t)
+                if ids:
+                    ids.discard(cliente_id)
+
+    # --- Búsqueda ---
+    def buscar(self, consulta, estados=None, limite=None):
+        """
+        Devuelve los ids de clientes que coinciden con `consulta`, del más al
+        menos relevante. `estados` restringe por `clientes.estado`. Devuelve
+        None si el índice aún se está construyendo (el llamador debe usar la
+        búsqueda SQL de siempre).
+
+        Las coincidencias exactas (subcadena, como el antiguo LIKE) van
+        primero y todas; después las aproximadas cuya similitud de trigramas
+        supera `umbral`, hasta `limite`. Si hay más de `max_exactos`
+        coincidencias exactas (consultas muy cortas o nombres muy comunes)
+        también devuelve None: el LIKE las trae todas sin una lista IN enorme.
+        Los DNI/celulares (consultas numéricas) solo admiten coincidencia
+        exacta para no mezclar documentos de otras personas.
+        """
+        q = normalizar(consulta)
+        if not q:
+            return []
+        if not self._asegurar_vigente():
+            return None
+        self._sincronizar()
+        limite = limite or self.max_resultados
+        estados = set(estados) if estados else None
+
+        with self._lock:
+            exactos = [
+                (2.5 if any(c.startswith(q) for c in self._docs[i][0]) else 2.0, i)
+                for i in self._subcadena(q)
+                if estados is None or self._docs[i][2] in estados
+            ]
+            if len(exactos) > self.max_exactos:
+                return None
+            aproximados = []
+            if not q.replace(" ", "").isdigit():
+                vistos = {i for _, i in exactos}
+                aproximados = [
+                    (similitud, i) for i, similitud in self._aproximados(q)
+                    if i not in vistos and (estados is None or self._docs[i][2] in estados)
+                ]
+        exactos.sort(key=lambda par: (-par[0], -par[1]))
+        aproximados.sort(key=lambda par: (-par[0], -par[1]))
+        return [i for _, i in exactos] + [i for _, i in aproximados[:limite]]
+
+    def _subcadena(self, q):
+        """Clientes con `q` contenido en algún campo (equivale a LIKE '%q%')."""
+        if len(q) < 3:
+            # Muy corto para trigramas: recorrido simple sobre los normalizados
+            return [i for i, doc in self._docs.items() if any(q in c for c in doc[0])]
+        listas = sorted((self._postings.get(t, set()) for t in _trigramas(q, relleno=False)), key=len)
+        candidatos = set(listas[0])
+        for ids in listas[1:]:
+            candidatos &= ids
+            if not candidatos:
+                break
+        return [i for i in candidatos if any(q in c for c in self._docs[i][0])]
+
+    def _aproximados(self, q):
+        """
+        Clientes cuya proporción de trigramas compartidos con `q` es al menos
+        `umbral`. Para no contar sobre listas enormes, los candidatos salen de
+        los (n - m + 1) trigramas más raros: quien comparta m de n trigramas
+        tiene que tener al menos uno de ellos.
+        """
+        trigramas_q = _trigramas(q)
+        n = len(trigramas_q)
+        minimo = max(1, math.ceil(self.umbral * n))
+        listas = sorted(((t, self._postings.get(t, set())) for t in trigramas_q), key=lambda par: len(par[1]))
+        candidatos = set()
+        for _, ids in listas[: n - minimo + 1]:
+            candidatos |= ids
+
+        conjuntos = [ids for _, ids in listas]
+        for cliente_id in candidatos:
+            comunes = sum(1 for ids in conjuntos if cliente_id in ids)
+            if comunes >= minimo:
+                yield cliente_id, comunes / n
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "clientes": len(self._docs),
+                "trigramas": len(self._postings),
+                "edad_segundos": round(time.time() - self._construido_en, 1) if self._construido_en else None,
+            }
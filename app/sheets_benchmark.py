@@ -0,0 +1,129 @@
+"""
+Módulo de Medición de las Secciones de Google Sheets
+----------------------------------------------------
+Mide la latencia de /certificados y /diplomados contra el backend local
+(`sheets_local.py`), sin tocar la API real ni los snapshots del servidor.
+Se usa desde la terminal:
+    flask --app run medir-sheets --filas 20000 --latencia 0.3
+
+Escenarios (cada uno se repite `repeticiones` veces):
+- sin_cache:   memoria y almacén vacíos, la petición descarga la hoja entera.
+- cache:       datos frescos en memoria.
+- refresco:    pasado el SOFT_TTL; se sirven los datos y se refresca aparte.
+- vencida:     pasado el HARD_TTL; la petición espera la sincronización.
+- busqueda:    /certificados?query=... sobre la caché.
+"""
+
+# --- Importaciones ---
+import os
+import shutil
+import tempfile
+import time
+
+from app import app
+from app import sheets_manager as sm
+from app.sheets_local import ClienteSheetsLocal, generar_filas
+from app.sheets_store import AlmacenSnapshots
+
+
+ESCENARIOS = ("sin_cache", "cache", "refresco", "vencida", "busqueda")
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _vaciar_cache(cache):
+    with cache['lock']:
+        cache.update(datos=None, meta=None, timestamp=0, version=0, refrescando=False)
+        cache.pop('indice', None)
+
+
+def _esperar_refresco(cache, timeout=60):
+    limite = time.time() + timeout
+    while cache['refrescando'] and time.time() < limite:
+        time.sleep(0.01)
+
+
+def _preparar(escenario, cache, ruta_almacen):
+    """Deja la caché en el estado que el escenario quiere medir."""
+    _esperar_refresco(cache)
+    if escenario == "sin_cache":
+        _vaciar_cache(cache)
+        if os.path.exists(ruta_almacen):
+            for sufijo in ("", "-wal", "-shm"):
+                if os.path.exists(ruta_almacen + sufijo):
+                    os.remove(ruta_almacen + sufijo)
+        sm.ALMACEN = AlmacenSnapshots(ruta_almacen)
+    elif escenario == "refresco":
+        cache['timestamp'] = time.time() - sm.CACHE_SOFT_TTL_SECONDS - 1
+    elif escenario == "vencida":
+        cache['timestamp'] = time.time() - sm.CACHE_HARD_TTL_SECONDS - 1
+    elif cache['datos'] is None or time.time() - cache['timestamp'] >= sm.CACHE_SOFT_TTL_SECONDS:
+        cache['timestamp'] = time.time()
+
+
+def medir(filas=5000, repeticiones=20, latencia=0.2, tasa_errores=0.0, cuota_por_minuto=None,
+          seccion="certificados", consulta="garcia quispe"):
+    """
+    Ejecuta los escenarios y devuelve una lista de dicts con la latencia
+    (ms: p50, p95, máx) y las llamadas a la API simulada de cada uno.
+    """
+    cache = sm.CERTIFICADOS_CACHE if seccion == "certificados" else sm.DIPLOMADOS_CACHE
+    sheet_id, worksheet_name = sm._HOJAS_POR_NOMBRE[cache['nombre']][:2]
+    directorio = tempfile.mkdtemp(prefix="medir_sheets_")
+    ruta_almacen = os.path.join(directorio, "snapshots.db")
+
+    cliente = ClienteSheetsLocal(
+        os.path.join(directorio, "hojas.json"),
+        latencia=latencia, tasa_errores=tasa_errores, cuota_por_minuto=cuota_por_minuto, semilla=0,
+    )
+    cliente.poblar(sheet_id, worksheet_name, generar_filas(filas))
+
+    # Estado real que se reemplaza durante la medición
+    anterior = sm.usar_cliente(cliente)
+    almacen, espejo = sm.ALMACEN, sm.ESPEJO_MYSQL
+    guardado = {k: cache[k] for k in ('datos', 'meta', 'timestamp', 'version')}
+    sm.ESPEJO_MYSQL = False
+    sm.ALMACEN = AlmacenSnapshots(ruta_almacen)
+    _vaciar_cache(cache)
+
+    app.config['TESTING'] = True
+    http = app.test_client()
+    with http.session_transaction() as sesion:
+        sesion.update(logged_in=True, username='medicion', full_name='Medición', role='admin')
+
+    resultados = []
+    try:
+        for escenario in ESCENARIOS:
+            url = f"/{seccion}?query={consulta}" if escenario == "busqueda" else f"/{seccion}"
+            tiempos, fallidas = [], 0
+            cliente.reiniciar_estadisticas()
+            for _ in range(repeticiones):
+                _preparar(escenario, cache, ruta_almacen)
+                inicio = time.perf_counter()
+                respuesta = http.get(url)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+                if respuesta.status_code != 200:
+                    fallidas += 1
+            _esperar_refresco(cache)
+            stats = cliente.estadisticas()
+            resultados.append({
+                "escenario": escenario,
+                "p50_ms": round(_percentil(tiempos, 50), 1),
+                "p95_ms": round(_percentil(tiempos, 95), 1),
+                "max_ms": round(max(tiempos), 1),
+                "llamadas_api": sum(stats["llamadas"].values()),
+                "errores_api": sum(stats["errores"].values()),
+                "respuestas_fallidas": fallidas,
+            })
+    finally:
+        _esperar_refresco(cache)
+        sm.usar_cliente(anterior)
+        sm.ALMACEN, sm.ESPEJO_MYSQL = almacen, espejo
+        with cache['lock']:
+            cache.update(guardado)
+            cache.pop('indice', None)
+        shutil.rmtree(directorio, ignore_errors=True)
+    return resultados
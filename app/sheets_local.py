@@ -0,0 +1,250 @@
+"""
+Módulo de Backend Local de Google Sheets
+----------------------------------------
+Sustituto de `gspread` que guarda las hojas en un archivo JSON local, para
+medir y probar las secciones de certificados/diplomados sin credenciales ni
+conexión. Implementa solo la parte de la API que usa `sheets_manager`:
+
+    cliente.open_by_key(id).worksheet(nombre) -> hoja
+    hoja.get_all_values() / row_values(n) / batch_get(rangos)
+    hoja.update(rango, valores) / batch_update([{'range', 'values'}])
+
+Cada llamada puede simular la red de Google:
+- `latencia`: segundos (o rango (min, max)) que tarda cada llamada.
+- `tasa_errores`: probabilidad de responder un 503.
+- `cuota_por_minuto`: llamadas permitidas en 60 s; al pasarse responde 429.
+
+Los errores se lanzan como `gspread.exceptions.APIError`, igual que la API real.
+
+Formato del archivo: {"<sheet_id>": {"<worksheet>": [[celda, ...], ...]}}
+"""
+
+# --- Importaciones ---
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+
+from gspread.exceptions import APIError, WorksheetNotFound, SpreadsheetNotFound
+
+
+class _RespuestaSimulada:
+    """Lo mínimo de `requests.Response` que necesita `APIError`."""
+
+    def __init__(self, codigo, mensaje, estado):
+        self.status_code = codigo
+        self.text = mensaje
+        self._error = {"code": codigo, "message": mensaje, "status": estado}
+
+    def json(self):
+        return {"error": self._error}
+
+
+def _columna_a_numero(letras):
+    numero = 0
+    for letra in letras:
+        numero = numero * 26 + ord(letra) - 64
+    return numero
+
+
+def _rango(a1, total_filas, total_columnas):
+    """'A2:D10', 'A5:D' o 'B3' -> (fila_ini, fila_fin, col_ini, col_fin), base 1 inclusive."""
+    partes = a1.split("!")[-1].upper().split(":")
+    celdas = []
+    for parte in partes:
+        m = re.fullmatch(r"([A-Z]*)(\d*)", parte.strip())
+        if not m:
+            raise ValueError(f"Rango inválido: {a1}")
+        celdas.append((int(m.group(2)) if m.group(2) else None,
+                       _columna_a_numero(m.group(1)) if m.group(1) else None))
+    (f1, c1), (f2, c2) = celdas[0], celdas[-1]
+    return (f1 or 1, f2 or (total_filas if len(celdas) > 1 else f1 or 1),
+            c1 or 1, c2 or (total_columnas if len(celdas) > 1 else c1 or 1))
+
+
+def _sin_vacios_al_final(filas):
+    """Como la API: sin celdas vacías al final de cada fila ni filas vacías al final."""
+    resultado = []
+    for fila in filas:
+        fila = list(fila)
+        while fila and fila[-1] == "":
+            fila.pop()
+        resultado.append(fila)
+    while resultado and not resultado[-1]:
+        resultado.pop()
+    return resultado
+
+
+class HojaLocal:
+
+    def __init__(self, cliente, sheet_id, titulo):
+        self.cliente = cliente
+        self.sheet_id = sheet_id
+        self.title = titulo
+
+    @property
+    def _filas(self):
+        return self.cliente._datos[self.sheet_id][self.title]
+
+    # --- Lectura ---
+    def get_all_values(self, **kwargs):
+        self.cliente._llamada("get_all_values")
+        with self.cliente._lock:
+            filas = _sin_vacios_al_final(self._filas)
+            ancho = max((len(f) for f in filas), default=0)
+            return [f + [""] * (ancho - len(f)) for f in filas]
+
+    def row_values(self, fila, **kwargs):
+        self.cliente._llamada("row_values")
+        with self.cliente._lock:
+            filas = self._filas
+            return _sin_vacios_al_final([filas[fila - 1]])[0] if 0 < fila <= len(filas) else []
+
+    def batch_get(self, rangos, **kwargs):
+        self.cliente._llamada("batch_get")
+        with self.cliente._lock:
+            filas = self._filas
+            ancho = max((len(f) for f in filas), default=0)
+            respuesta = []
+            for a1 in rangos:
+                f1, f2, c1, c2 = _rango(a1, len(filas), ancho)
+                respuesta.append(_sin_vacios_al_final([fila[c1 - 1:c2] for fila in filas[f1 - 1:f2]]))
+            return respuesta
+
+    # --- Escritura ---
+    def update(self, rango, valores=None, **kwargs):
+        # gspread 5 acepta update(rango, valores); gspread 6 update(valores, rango)
+        if isinstance(rango, list):
+            rango, valores = valores, rango
+        self.cliente._llamada("update")
+        with self.cliente._lock:
+            self._escribir(rango, valores)
+            self.cliente._guardar()
+        return {"updatedRows": len(valores)}
+
+    def batch_update(self, datos, **kwargs):
+        self.cliente._llamada("batch_update")
+        with self.cliente._lock:
+            for bloque in datos:
+                self._escribir(bloque["range"], bloque["values"])
+            self.cliente._guardar()
+        return {"totalUpdatedRows": sum(len(b["values"]) for b in datos)}
+
+    def _escribir(self, a1, valores):
+        filas = self._filas
+        f1, _, c1, _ = _rango(a1, len(filas), 0)
+        for i, valores_fila in enumerate(valores):
+            while len(filas) < f1 + i:
+                filas.append([])
+            fila = filas[f1 + i - 1]
+            fin = c1 - 1 + len(valores_fila)
+            if len(fila) < fin:
+                fila.extend([""] * (fin - len(fila)))
+            fila[c1 - 1:fin] = ["" if v is None else str(v) for v in valores_fila]
+
+
+class HojaCalculoLocal:
+
+    def __init__(self, cliente, sheet_id):
+        self.cliente = cliente
+        self.id = sheet_id
+
+    def worksheet(self, titulo):
+        self.cliente._llamada("worksheet")
+        if titulo not in self.cliente._datos[self.id]:
+            raise WorksheetNotFound(titulo)
+        return HojaLocal(self.cliente, self.id, titulo)
+
+
+class ClienteSheetsLocal:
+    """Reemplaza al cliente de `gspread.authorize(...)`."""
+
+    def __init__(self, ruta, latencia=0.0, tasa_errores=0.0, cuota_por_minuto=None, semilla=None):
+        self.ruta = ruta
+        self.latencia = latencia if isinstance(latencia, (tuple, list)) else (latencia, latencia)
+        self.tasa_errores = float(tasa_errores)
+        self.cuota_por_minuto = cuota_por_minuto
+        self._azar = random.Random(semilla)
+        self._lock = threading.RLock()
+        self._ventana = deque()  # instantes de las llamadas del último minuto
+        self._llamadas = Counter()
+        self._errores = Counter()
+        self._datos = {}
+        if os.path.exists(ruta):
+            with open(ruta, encoding="utf-8") as f:
+                self._datos = json.load(f)
+
+    def open_by_key(self, sheet_id):
+        self._llamada("open_by_key")
+        if sheet_id not in self._datos:
+            raise SpreadsheetNotFound(sheet_id)
+        return HojaCalculoLocal(self, sheet_id)
+
+    # --- Datos de prueba ---
+    def poblar(self, sheet_id, titulo, filas):
+        """Reemplaza el contenido de una hoja (encabezados en la primera fila)."""
+        with self._lock:
+            self._datos.setdefault(sheet_id, {})[titulo] = [list(map(str, f)) for f in filas]
+            self._guardar()
+
+    # --- Métricas ---
+    def estadisticas(self):
+        with self._lock:
+            return {"llamadas": dict(self._llamadas), "errores": dict(self._errores)}
+
+    def reiniciar_estadisticas(self):
+        with self._lock:
+            self._llamadas.clear()
+            self._errores.clear()
+
+    # --- Simulación de la red ---
+    def _llamada(self, metodo):
+        minimo, maximo = self.latencia
+        if maximo > 0:
+            time.sleep(self._azar.uniform(minimo, maximo))
+        with self._lock:
+            self._llamadas[metodo] += 1
+            if self.cuota_por_minuto:
+                ahora = time.monotonic()
+                while self._ventana and ahora - self._ventana[0] >= 60:
+                    self._ventana.popleft()
+                if len(self._ventana) >= self.cuota_por_minuto:
+                    self._errores["429"] += 1
+                    raise APIError(_RespuestaSimulada(429, "Quota exceeded (simulado)", "RESOURCE_EXHAUSTED"))
+                self._ventana.append(ahora)
+            if self.tasa_errores and self._azar.random() < self.tasa_errores:
+                self._errores["503"] += 1
+                raise APIError(_RespuestaSimulada(503, "The service is currently unavailable (simulado)", "UNAVAILABLE"))
+
+    def _guardar(self):
+        directorio = os.path.dirname(os.path.abspath(self.ruta))
+        os.makedirs(directorio, exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._datos, f, ensure_ascii=False)
+        os.replace(temporal, self.ruta)
+
+
+def generar_filas(cantidad, semilla=0):
+    """Hoja de respuestas de formulario ficticia (encabezados + `cantidad` filas)."""
+    azar = random.Random(semilla)
+    nombres = ["Ana", "Luis", "María", "José", "Carmen", "Jorge", "Rosa", "Pedro", "Lucía", "Miguel"]
+    apellidos = ["García", "Quispe", "Flores", "Rojas", "Díaz", "Torres", "Vargas", "Mendoza", "Castillo", "Ramos"]
+    cursos = ["Gestión Pública", "Contrataciones del Estado", "SIAF", "Control Gubernamental", "Derecho Administrativo"]
+    filas = [["Marca temporal", "Nombres y Apellidos", "DNI", "Correo electrónico", "Celular", "Curso", "Estado"]]
+    for i in range(cantidad):
+        nombre = f"{azar.choice(nombres)} {azar.choice(apellidos)} {azar.choice(apellidos)}"
+        filas.append([
+            f"{azar.randint(1, 28)}/{azar.randint(1, 12)}/2024 {azar.randint(8, 20)}:{azar.randint(0, 59):02d}:00",
+            nombre,
+            str(40000000 + i),
+            f"alumno{i}@correo.com",
+            f"9{azar.randint(10000000, 99999999)}",
+            azar.choice(cursos),
+            azar.choice(["Emitido", "Pendiente", ""]),
+        ])
+    return filas
@@ -1,7 +1,18 @@
 # app/sheets_manager.py
-import gspread
-from google.oauth2.service_account import Credentials
+# gspread y google-auth se importan recién al crear el cliente (ver _cliente()):
+# los workers que no usan Sheets no pagan esa carga al arrancar.
+import os
+import threading
 import time
+import bisect
+import json
+import random
+import re
+import zlib
+from collections import OrderedDict, defaultdict
+from app.search_index import normalizar
+from app.sheets_store import AlmacenSnapshots
+from app.sheets_writer import ColaEscrituras
 
 # --- CONFIGURACIÓN ---
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive.file"]
@@ -15,68 +26,692 @@ DIPLOMADOS_SHEET_ID = "1xWgTYcMgjQYf6ZDlhqszoALWyQICEBx5RBKX0OcOICc"
 DIPLOMADOS_WORKSHEET_NAME = "Form Responses 1" # O el nombre de la pestaña de diplomados
 
 # --- Carga de credenciales ---
-try:
-    CREDS = Credentials.from_service_account_file(CREDS_FILE, scopes=SCOPES)
-    CLIENT = gspread.authorize(CREDS)
+# SHEETS_BACKEND=local reemplaza la API por un archivo JSON (ver sheets_local.py),
+# para pruebas y mediciones sin credenciales.
+SHEETS_BACKEND = os.environ.get("SHEETS_BACKEND", "google")
+# Tras un fallo al autenticar, segundos antes de volver a intentarlo
+REINTENTO_CLIENTE_SECONDS = 60
+
+def _crear_cliente():
+    if SHEETS_BACKEND == "local":
+        from app.sheets_local import ClienteSheetsLocal
+        latencia = [float(x) for x in os.environ.get("SHEETS_LOCAL_LATENCY", "0").split(",")]
+        cliente = ClienteSheetsLocal(
+            os.environ.get("SHEETS_LOCAL_PATH", "sheets_local.json"),
+            latencia=tuple(latencia) if len(latencia) > 1 else latencia[0],
+            tasa_errores=float(os.environ.get("SHEETS_LOCAL_ERROR_RATE", "0")),
+            cuota_por_minuto=int(os.environ.get("SHEETS_LOCAL_QUOTA", "0")) or None,
+        )
+        print(f"-> Usando el backend local de Google Sheets ('{cliente.ruta}').")
+        return cliente
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    creds = Credentials.from_service_account_file(CREDS_FILE, scopes=SCOPES)
+    cliente = gspread.authorize(creds)
     print("-> Cliente de Google Sheets autenticado correctamente.")
-except Exception as e:
-    print(f"ERROR CRÍTICO al cargar las credenciales: {e}")
-    CLIENT = None
+    return cliente
+
+CLIENT = None
+_LOCK_CLIENTE = threading.Lock()
+_FALLO_CLIENTE_EN = None
+
+def _cliente():
+    """Cliente de Sheets, creado en el primer uso por un solo hilo (None si no hay credenciales)."""
+    global CLIENT, _FALLO_CLIENTE_EN
+    if CLIENT is not None: return CLIENT
+    with _LOCK_CLIENTE:
+        if CLIENT is None and (_FALLO_CLIENTE_EN is None or time.monotonic() - _FALLO_CLIENTE_EN >= REINTENTO_CLIENTE_SECONDS):
+            try:
+                CLIENT = _crear_cliente()
+            except Exception as e:
+                _FALLO_CLIENTE_EN = time.monotonic()
+                print(f"ERROR CRÍTICO al cargar las credenciales: {e}")
+        return CLIENT
 
 # --- Implementación de Cachés (uno para cada sección) ---
-CERTIFICADOS_CACHE = {'datos': None, 'timestamp': 0}
-DIPLOMADOS_CACHE = {'datos': None, 'timestamp': 0}
-CACHE_DURATION_SECONDS = 300
+# Stale-while-revalidate: pasado SOFT_TTL se sirven los datos guardados y se
+# refrescan en un hilo aparte; solo pasado HARD_TTL (o sin datos) la petición
+# espera a la API. Los snapshots se comparten entre workers y reinicios a
+# través de ALMACEN (ver sheets_store.py); cada caché en memoria recuerda la
+# `version` que tiene cargada.
+CERTIFICADOS_CACHE = {'nombre': 'certificados', 'datos': None, 'meta': None, 'timestamp': 0, 'version': 0, 'refrescando': False, 'carga': None, 'lock': threading.RLock()}
+DIPLOMADOS_CACHE = {'nombre': 'diplomados', 'datos': None, 'meta': None, 'timestamp': 0, 'version': 0, 'refrescando': False, 'carga': None, 'lock': threading.RLock()}
+CACHE_SOFT_TTL_SECONDS = int(os.environ.get("SHEETS_SOFT_TTL", "240"))
+CACHE_HARD_TTL_SECONDS = int(os.environ.get("SHEETS_HARD_TTL", "3600"))
+# Sincronización incremental: las hojas de respuestas de formularios solo
+# crecen por abajo. Se leen solo las filas nuevas y, para detectar ediciones
+# de filas anteriores, se comparan huellas (crc32) de algunas filas de muestra.
+# Cada SHEETS_FULL_RELOAD_EVERY refrescos se hace una lectura completa igual.
+SYNC_INCREMENTAL = os.environ.get("SHEETS_INCREMENTAL", "1") == "1"
+FILAS_MUESTRA = 10
+RECARGA_COMPLETA_CADA = int(os.environ.get("SHEETS_FULL_RELOAD_EVERY", "12"))
+# Copia en MySQL (tablas sheets_certificados / sheets_diplomados)
+ESPEJO_MYSQL = os.environ.get("SHEETS_MIRROR_MYSQL", "1") == "1"
+# Cuánto espera un worker a que otro publique el snapshot antes de ir él mismo a la API
+ESPERA_OTRO_WORKER_SECONDS = 20
+
+SNAPSHOTS_PATH = os.environ.get(
+    "SHEETS_SNAPSHOTS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "sheets_snapshots.db"),
+)
+try:
+    ALMACEN = AlmacenSnapshots(SNAPSHOTS_PATH)
+except Exception as e:
+    print(f"AVISO: sin almacén compartido de snapshots ({e}); se usa solo la caché en memoria.")
+    ALMACEN = None
 
 # --- FUNCIONES GENÉRICAS ---
+# (sheet_id, worksheet_name) -> {'worksheet': ..., 'headers': [...]}
+_HOJAS = {}
+
+def _hoja(sheet_id, worksheet_name):
+    """Worksheet reutilizable (evita un open_by_key + worksheet por operación)."""
+    hoja = _HOJAS.get((sheet_id, worksheet_name))
+    if hoja is None:
+        cliente = _cliente()
+        if cliente is None: raise RuntimeError("Cliente de Google Sheets no disponible.")
+        worksheet = cliente.open_by_key(sheet_id).worksheet(worksheet_name)
+        hoja = _HOJAS[(sheet_id, worksheet_name)] = {'worksheet': worksheet, 'headers': None}
+    return hoja
+
+def _letra_columna(numero):
+    """1 -> 'A', 27 -> 'AA' (notación A1)."""
+    letras = ""
+    while numero > 0:
+        numero, resto = divmod(numero - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+def _huella(fila):
+    """crc32 de una fila tal como la devuelve la API (sin celdas vacías al final)."""
+    valores = list(fila)
+    while valores and valores[-1] == "":
+        valores.pop()
+    return zlib.crc32("\x1f".join(valores).encode("utf-8"))
+
+def _convertir(headers, filas, primera_fila):
+    """Filas crudas -> registros {'row_id', header: valor}, sin las filas vacías."""
+    datos = []
+    for i, row in enumerate(filas, start=primera_fila):
+        record = {'row_id': i}
+        for j, header in enumerate(headers):
+            if header and header.strip():
+                if j < len(row): record[header] = row[j]
+                else: record[header] = ""
+        if any(str(val).strip() for h, val in record.items() if h != 'row_id'):
+            datos.append(record)
+    return datos
+
+def _descargar_datos(sheet_id, worksheet_name):
+    """
+    Lee la hoja completa de la API. Devuelve (registros, meta) donde `meta`
+    guarda lo necesario para la sincronización incremental.
+    """
+    print(f"Cargando datos de '{worksheet_name}' desde la API.")
+    hoja = _hoja(sheet_id, worksheet_name)
+    all_values = hoja['worksheet'].get_all_values()
+    if not all_values: return [], None
+
+    headers = all_values[0]
+    hoja['headers'] = headers
+    meta = {
+        'filas': len(all_values),
+        'columna_final': _letra_columna(max(1, len(headers))),
+        'huella_headers': _huella(headers),
+        'huellas': [_huella(row) for row in all_values[1:]],
+        'refrescos_incrementales': 0,
+    }
+    return _convertir(headers, all_values[1:], 2), meta
+
+def _rangos_muestra(filas):
+    """Rangos de filas [(desde, hasta)] a verificar: inicio, final y un bloque al azar."""
+    if filas < 2: return []
+    ultima = filas
+    rangos = {(2, min(ultima, 1 + FILAS_MUESTRA)), (max(2, ultima - FILAS_MUESTRA + 1), ultima)}
+    if ultima - 1 > 3 * FILAS_MUESTRA:
+        inicio = random.randint(2, ultima - FILAS_MUESTRA + 1)
+        rangos.add((inicio, inicio + FILAS_MUESTRA - 1))
+    return sorted(rangos)
+
+def _descargar_incremental(sheet_id, worksheet_name, cache):
+    """
+    Trae solo las filas agregadas desde la última sincronización, con una
+    única llamada (batch_get) que incluye las filas de muestra. Devuelve
+    (registros_nuevos, meta) o None si hay que recargar la hoja completa
+    (encabezados o filas anteriores cambiaron).
+    """
+    meta = cache.get('meta')
+    if not SYNC_INCREMENTAL or not meta or cache['datos'] is None: return None
+    if meta.get('refrescos_incrementales', 0) >= RECARGA_COMPLETA_CADA: return None
+
+    hoja = _hoja(sheet_id, worksheet_name)
+    col, filas = meta['columna_final'], meta['filas']
+    muestras = _rangos_muestra(filas)
+    rangos = [f"A1:{col}1"] + [f"A{d}:{col}{h}" for d, h in muestras] + [f"A{filas + 1}:{col}"]
+    respuesta = hoja['worksheet'].batch_get(rangos)
+
+    encabezados = respuesta[0][0] if respuesta[0] else []
+    if _huella(encabezados) != meta['huella_headers']:
+        print(f"Encabezados de '{worksheet_name}' cambiaron: recarga completa.")
+        return None
+    for (desde, hasta), valores in zip(muestras, respuesta[1:-1]):
+        valores = list(valores) + [[]] * (hasta - desde + 1 - len(valores))
+        if [_huella(v) for v in valores] != meta['huellas'][desde - 2:hasta - 1]:
+            print(f"Filas {desde}-{hasta} de '{worksheet_name}' fueron editadas: recarga completa.")
+            return None
+
+    nuevas = list(respuesta[-1])
+    print(f"Sincronización incremental de '{worksheet_name}': {len(nuevas)} filas nuevas.")
+    hoja['headers'] = encabezados
+    meta = dict(meta)
+    meta['filas'] = filas + len(nuevas)
+    meta['huellas'] = meta['huellas'] + [_huella(v) for v in nuevas]
+    meta['refrescos_incrementales'] = meta.get('refrescos_incrementales', 0) + 1
+    return _convertir(encabezados, nuevas, filas + 1), meta
+
+def _sincronizar_desde_almacen(cache):
+    """
+    Carga el snapshot compartido si otro worker publicó una versión nueva y
+    le vuelve a aplicar las ediciones de este worker que siguen en cola
+    (como _refrescar): el snapshot ajeno todavía no las tiene.
+    """
+    if not ALMACEN: return
+    try:
+        version, _ = ALMACEN.version(cache['nombre'])
+        if version == cache['version']: return
+        snapshot = ALMACEN.leer(cache['nombre'])
+        if not snapshot: return
+        with cache['lock']:
+            cache['version'], cache['timestamp'], cache['datos'], cache['meta'] = snapshot
+            pendientes = COLA_ESCRITURAS.filas_pendientes(cache['nombre'])
+            if pendientes:
+                sheet_id, worksheet_name, _ = _HOJAS_POR_NOMBRE[cache['nombre']]
+                # Quien encoló una edición ya abrió la hoja: sus encabezados están en _HOJAS
+                headers = (_HOJAS.get((sheet_id, worksheet_name)) or {}).get('headers') or []
+                for row_id, valores in pendientes.items():
+                    _parchear_cache(row_id, headers, valores, cache, espejar=False, guardar=False)
+    except Exception as e:
+        print(f"Error al leer el almacén de snapshots ('{cache['nombre']}'): {e}")
+
+def _publicar(cache, datos, meta=None):
+    cache['datos'] = datos
+    cache['meta'] = meta
+    cache['timestamp'] = time.time()
+    if ALMACEN:
+        try:
+            cache['version'] = ALMACEN.guardar(cache['nombre'], datos, cache['timestamp'], meta)
+        except Exception as e:
+            print(f"Error al guardar el snapshot de '{cache['nombre']}': {e}")
+
+def _tomar_refresco(cache):
+    if not ALMACEN: return True
+    try:
+        return ALMACEN.tomar_refresco(cache['nombre'])
+    except Exception:
+        return True
+
+def _soltar_refresco(cache):
+    if not ALMACEN: return
+    try:
+        ALMACEN.soltar_refresco(cache['nombre'])
+    except Exception:
+        pass
+
+# --- Espejo en MySQL ---
+_COLUMNAS_ESPEJO = {
+    'dni': ('dni', 'documento'),
+    'correo': ('correo', 'email', 'e mail', 'mail'),
+    'nombre': ('nombre', 'apellido'),
+}
+_LOCK_ESPEJO = threading.Lock()
+
+def _columnas_espejo(registro):
+    """Qué encabezado de la hoja corresponde a dni, correo y nombre."""
+    columnas = {}
+    for clave, palabras in _COLUMNAS_ESPEJO.items():
+        for header in registro:
+            if header != 'row_id' and any(p in normalizar(header) for p in palabras):
+                columnas[clave] = header
+                break
+    return columnas
+
+def _normalizar_dni(valor):
+    """'12.345.678 ' -> '12345678' (sin espacios, puntos ni guiones)."""
+    return re.sub(r"[\s.\-]", "", str(valor or ""))
+
+def _fila_espejo(registro, columnas):
+    def valor(clave, largo):
+        texto = str(registro.get(columnas.get(clave), "") or "").strip()
+        return texto[:largo] or None
+    dni = _normalizar_dni(registro.get(columnas.get('dni')))[:20]
+    correo = valor('correo', 255)
+    datos = json.dumps({k: v for k, v in registro.items() if k != 'row_id'}, ensure_ascii=False, sort_keys=True)
+    return (
+        registro['row_id'],
+        dni or None,
+        correo.lower() if correo else None,
+        valor('nombre', 255),
+        datos,
+        zlib.crc32(datos.encode("utf-8")),
+    )
+
+def _espejar(cache, registros=None):
+    """
+    Copia a MySQL el snapshot completo (o solo `registros`) en un hilo
+    aparte, para que la petición no espere a la base de datos.
+    """
+    if not ESPEJO_MYSQL: return
+    completo = registros is None
+    registros = list(cache['datos'] or []) if completo else registros
+    if not registros: return
+
+    def trabajar():
+        from app import database_manager as db
+        with _LOCK_ESPEJO:
+            try:
+                columnas = _columnas_espejo(registros[0])
+                filas = [_fila_espejo(r, columnas) for r in registros]
+                escritas, borradas = db.sincronizar_espejo_sheets(cache['nombre'], filas, completo)
+                if escritas or borradas:
+                    print(f"Espejo MySQL de '{cache['nombre']}': {escritas} filas escritas, {borradas} borradas.")
+            except Exception as e:
+                print(f"Error al copiar '{cache['nombre']}' a MySQL: {e}")
+
+    threading.Thread(target=trabajar, daemon=True).start()
+
+def _refrescar(sheet_id, worksheet_name, cache):
+    try:
+        incremental = None
+        try:
+            incremental = _descargar_incremental(sheet_id, worksheet_name, cache)
+        except Exception as e:
+            print(f"Falló la sincronización incremental de '{worksheet_name}' ({e}): recarga completa.")
+        if incremental is not None:
+            nuevos, meta = incremental
+            datos = cache['datos']
+            with cache['lock']:
+                # Se agrega al mismo snapshot: el índice de búsqueda solo suma las filas nuevas
+                inicio = len(datos)
+                datos.extend(nuevos)
+                indice = cache.get('indice')
+                if indice is not None and indice.datos is datos:
+                    indice.agregar(inicio)
+                claves = cache.get('claves')
+                if claves is not None and claves.datos is datos:
+                    claves.agregar(inicio)
+        else:
+            datos, meta = _descargar_datos(sheet_id, worksheet_name)
+        _publicar(cache, datos, meta)
+        # Ediciones encoladas que la hoja todavía no tiene
+        headers = _hoja(sheet_id, worksheet_name)['headers']
+        pendientes = COLA_ESCRITURAS.filas_pendientes(cache['nombre'])
+        for row_id, valores in pendientes.items():
+            _parchear_cache(row_id, headers, valores, cache, espejar=False, guardar=False)
+        if pendientes: _guardar_snapshot(cache)
+        _espejar(cache)
+        return cache['datos']
+    finally:
+        cache['refrescando'] = False
+        _soltar_refresco(cache)
+
+def _refrescar_en_segundo_plano(sheet_id, worksheet_name, cache):
+    try:
+        _refrescar(sheet_id, worksheet_name, cache)
+        _indice(cache) # Indexar aquí y no en la próxima búsqueda
+    except Exception as e:
+        # Se siguen sirviendo los datos anteriores hasta el HARD_TTL
+        print(f"Ocurrió un error al refrescar en segundo plano la hoja '{worksheet_name}': {e}")
+
+def _esperar_otro_worker(cache):
+    """Espera a que el worker que tiene el candado publique una versión nueva."""
+    version_inicial = cache['version']
+    limite = time.time() + ESPERA_OTRO_WORKER_SECONDS
+    while time.time() < limite:
+        time.sleep(0.25)
+        _sincronizar_desde_almacen(cache)
+        if cache['version'] != version_inicial and cache['timestamp']:
+            return True
+        if _tomar_refresco(cache):
+            # El otro terminó (o murió) sin publicar: nos toca a nosotros
+            return False
+    return False
+
 def _obtener_datos_generico(sheet_id, worksheet_name, cache):
-    if not CLIENT: return []
-    current_time = time.time()
-    
-    if cache['datos'] and (current_time - cache['timestamp'] < CACHE_DURATION_SECONDS):
-        print(f"Cargando datos de '{worksheet_name}' desde el CACHÉ.")
+    _sincronizar_desde_almacen(cache)
+    edad = time.time() - cache['timestamp']
+
+    if cache['datos'] is not None and edad < CACHE_HARD_TTL_SECONDS:
+        if edad >= CACHE_SOFT_TTL_SECONDS:
+            with cache['lock']:
+                lanzar = not cache['refrescando'] and _tomar_refresco(cache)
+                if lanzar: cache['refrescando'] = True
+            if lanzar:
+                threading.Thread(
+                    target=_refrescar_en_segundo_plano, args=(sheet_id, worksheet_name, cache), daemon=True
+                ).start()
         return cache['datos']
 
-    print(f"Cargando datos de '{worksheet_name}' desde la API.")
+    # Sin datos o demasiado viejos: un solo hilo del worker va a la API (o
+    # espera al worker que ya fue); los demás esperan su evento. El candado
+    # solo se toma para decidir quién va: esperar con él tomado frenaría
+    # también los parches y los refrescos en segundo plano de la hoja.
+    with cache['lock']:
+        _sincronizar_desde_almacen(cache)
+        if cache['datos'] is not None and time.time() - cache['timestamp'] < CACHE_HARD_TTL_SECONDS:
+            return cache['datos']
+        carga = cache.get('carga')
+        lider = carga is None
+        if lider:
+            carga = cache['carga'] = threading.Event()
+    if not lider:
+        carga.wait()
+        return cache['datos'] or []
+
+    try:
+        if not _tomar_refresco(cache) and _esperar_otro_worker(cache):
+            return cache['datos']
+        if not _cliente():
+            _soltar_refresco(cache)
+            return cache['datos'] or []
+        try:
+            cache['refrescando'] = True
+            return _refrescar(sheet_id, worksheet_name, cache)
+        except Exception as e:
+            print(f"Ocurrió un error al leer la API para la hoja '{worksheet_name}': {e}")
+            return cache['datos'] or []
+    finally:
+        with cache['lock']:
+            cache['carga'] = None
+        carga.set()
+
+# --- Búsqueda (índice invertido por snapshot) ---
+class IndiceHoja:
+    """
+    Índice token -> posiciones sobre un snapshot de registros, general y por
+    columna. Cada palabra de la búsqueda debe ser prefijo de alguna palabra
+    del registro (sin tildes ni mayúsculas). Se construye una vez por
+    snapshot y guarda los últimos resultados para que paginar no repita la
+    búsqueda.
+    """
+    MAX_RESULTADOS_CACHE = 128
+
+    def __init__(self, datos):
+        self.datos = datos
+        self.columnas = [h for h in datos[0] if h != 'row_id'] if datos else []
+        general = defaultdict(set)
+        por_columna = defaultdict(lambda: defaultdict(set))
+        for pos, registro in enumerate(datos):
+            for columna, valor in registro.items():
+                if columna == 'row_id': continue
+                for token in self._tokens(valor):
+                    general[token].add(pos)
+                    por_columna[columna][token].add(pos)
+        self._postings = {None: dict(general)}
+        self._postings.update({c: dict(t) for c, t in por_columna.items()})
+        self._ordenados = {c: sorted(t) for c, t in self._postings.items()}
+        self._resultados = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _tokens(valor):
+        tokens = set()
+        for token in normalizar(valor).split():
+            tokens.add(token)
+            # Correos y folios: también cada parte ("ana@gmail.com" -> "ana", "gmail"...)
+            partes = [p for p in re.split(r"[@.]", token) if p]
+            if len(partes) > 1: tokens.update(partes)
+        return tokens
+
+    def _posiciones_prefijo(self, columna, prefijo):
+        ordenados = self._ordenados.get(columna, [])
+        postings = self._postings.get(columna, {})
+        posiciones = set()
+        i = bisect.bisect_left(ordenados, prefijo)
+        while i < len(ordenados) and ordenados[i].startswith(prefijo):
+            posiciones |= postings[ordenados[i]]
+            i += 1
+        return posiciones
+
+    def buscar(self, consulta, columna=None):
+        """Registros que coinciden, en el orden original de la hoja."""
+        columna = columna if columna in self.columnas else None
+        tokens = normalizar(consulta).split()
+        if not tokens: return self.datos
+        clave = (columna, tuple(tokens))
+        with self._lock:
+            if clave in self._resultados:
+                self._resultados.move_to_end(clave)
+                return self._resultados[clave]
+
+        with self._lock:
+            posiciones = None
+            for token in sorted(tokens, key=len, reverse=True):
+                encontrados = self._posiciones_prefijo(columna, token)
+                posiciones = encontrados if posiciones is None else posiciones & encontrados
+                if not posiciones: break
+            resultado = [self.datos[p] for p in sorted(posiciones)]
+            self._resultados[clave] = resultado
+            if len(self._resultados) > self.MAX_RESULTADOS_CACHE:
+                self._resultados.popitem(last=False)
+        return resultado
+
+    def agregar(self, desde):
+        """Indexa los registros agregados al final de `datos` desde la posición `desde`."""
+        with self._lock:
+            for pos in range(desde, len(self.datos)):
+                self._indexar(pos, self.datos[pos])
+            self._resultados.clear()
+
+    def _indexar(self, pos, registro):
+        for columna, valor in registro.items():
+            if columna == 'row_id': continue
+            for token in self._tokens(valor):
+                for clave in (None, columna):
+                    postings = self._postings.setdefault(clave, {})
+                    if token not in postings:
+                        postings[token] = set()
+                        bisect.insort(self._ordenados.setdefault(clave, []), token)
+                    postings[token].add(pos)
+
+    def reemplazar(self, pos, anterior, nuevo):
+        """Actualiza en el índice el registro de la posición `pos` (edición en sitio)."""
+        with self._lock:
+            for columna, valor in anterior.items():
+                if columna == 'row_id': continue
+                for token in self._tokens(valor):
+                    for clave in (None, columna):
+                        posiciones = self._postings.get(clave, {}).get(token)
+                        if posiciones: posiciones.discard(pos)
+            self._indexar(pos, nuevo)
+            self._resultados.clear()
+
+def _indice(cache):
+    """Índice del snapshot actual de la caché (se reconstruye si cambió)."""
+    datos = cache['datos'] or []
+    indice = cache.get('indice')
+    if indice is None or indice.datos is not datos:
+        indice = IndiceHoja(datos)
+        cache['indice'] = indice
+    return indice
+
+# --- Acceso directo por row_id / DNI ---
+class ClavesHoja:
+    """
+    Diccionarios row_id -> registro y DNI -> registros de un snapshot. Son
+    baratos de armar (una pasada, sin tokenizar) y se mantienen al agregar
+    filas nuevas y al parchear ediciones, igual que IndiceHoja.
+    """
+
+    def __init__(self, datos):
+        self.datos = datos
+        self.columna_dni = _columnas_espejo(datos[0]).get('dni') if datos else None
+        self.por_row_id = {}
+        self.por_dni = defaultdict(list)
+        self.agregar(0)
+
+    def _dni(self, registro):
+        return _normalizar_dni(registro.get(self.columna_dni)) if self.columna_dni else ""
+
+    def agregar(self, desde):
+        """Registra los registros agregados al final de `datos` desde la posición `desde`."""
+        for pos in range(desde, len(self.datos)):
+            registro = self.datos[pos]
+            self.por_row_id[registro['row_id']] = registro
+            dni = self._dni(registro)
+            if dni: self.por_dni[dni].append(registro)
+
+    def reemplazar(self, anterior, nuevo):
+        self.por_row_id[nuevo['row_id']] = nuevo
+        dni_anterior, dni = self._dni(anterior), self._dni(nuevo)
+        if dni_anterior:
+            filas = [r for r in self.por_dni.get(dni_anterior, []) if r is not anterior]
+            if filas: self.por_dni[dni_anterior] = filas
+            else: self.por_dni.pop(dni_anterior, None)
+        if dni:
+            # Cada lista queda en el orden de la hoja
+            filas = self.por_dni[dni]
+            filas.insert(bisect.bisect([r['row_id'] for r in filas], nuevo['row_id']), nuevo)
+
+def _claves(cache):
+    """ClavesHoja del snapshot actual de la caché (se rearma si cambió)."""
+    datos = cache['datos'] or []
+    claves = cache.get('claves')
+    if claves is None or claves.datos is not datos:
+        with cache['lock']:
+            claves = cache.get('claves')
+            if claves is None or claves.datos is not datos:
+                claves = ClavesHoja(datos)
+                cache['claves'] = claves
+    return claves
+
+def _edad_cache(cache):
+    """Segundos desde la última lectura de la API (None si nunca se leyó)."""
+    return round(time.time() - cache['timestamp']) if cache['timestamp'] else None
+
+def _guardar_snapshot(cache):
+    """Publica la caché en ALMACEN con la misma antigüedad (solo cambiaron filas)."""
+    if not ALMACEN: return
     try:
-        spreadsheet = CLIENT.open_by_key(sheet_id)
-        worksheet = spreadsheet.worksheet(worksheet_name)
-        all_values = worksheet.get_all_values()
-        if not all_values: return []
-
-        headers = all_values[0]
-        data_rows = all_values[1:]
-        datos = []
-        for i, row in enumerate(data_rows, start=2):
-            record = {'row_id': i}
-            for j, header in enumerate(headers):
-                if header and header.strip():
-                    if j < len(row): record[header] = row[j]
-                    else: record[header] = ""
-            if any(str(val).strip() for h, val in record.items() if h != 'row_id'):
-                datos.append(record)
-        
-        cache['datos'] = datos
-        cache['timestamp'] = current_time
-        return datos
+        cache['version'] = ALMACEN.guardar(cache['nombre'], cache['datos'], cache['timestamp'], cache.get('meta'))
     except Exception as e:
-        print(f"Ocurrió un error al leer la API para la hoja '{worksheet_name}': {e}")
-        return []
+        print(f"Error al guardar el snapshot de '{cache['nombre']}': {e}")
+
+def _parchear_cache(row_id, headers, update_values, cache, espejar=True, guardar=True):
+    """
+    Reemplaza en la caché (e índice) el registro editado, sin volver a leer
+    la hoja. Con `guardar=False` no se publica en ALMACEN: quien parchea
+    varias filas seguidas guarda una sola vez al final (_guardar_snapshot).
+    """
+    datos = cache['datos']
+    if datos is None: return
+    nuevo = {'row_id': row_id}
+    for header, valor in zip(headers, update_values):
+        if header and header.strip(): nuevo[header] = valor
+
+    with cache['lock']:
+        meta = cache.get('meta')
+        if meta and 2 <= row_id <= meta['filas']:
+            # Nuestra propia edición no debe contar como "fila editada por otros"
+            meta['huellas'][row_id - 2] = _huella(update_values)
+        # Los registros están ordenados por row_id
+        pos = _buscar_posicion(datos, row_id)
+        if pos < len(datos) and datos[pos]['row_id'] == row_id:
+            anterior = datos[pos]
+            datos[pos] = nuevo
+            indice = cache.get('indice')
+            if indice is not None and indice.datos is datos:
+                indice.reemplazar(pos, anterior, nuevo)
+            claves = cache.get('claves')
+            if claves is not None and claves.datos is datos:
+                claves.reemplazar(anterior, nuevo)
+        else:
+            # Fila que antes estaba vacía: nueva lista, los índices se reconstruyen
+            cache['datos'] = datos[:pos] + [nuevo] + datos[pos:]
+    if guardar: _guardar_snapshot(cache)
+    if espejar: _espejar(cache, [nuevo])
+
+def _buscar_posicion(datos, row_id):
+    """Búsqueda binaria por row_id (la caché está ordenada por fila)."""
+    inicio, fin = 0, len(datos)
+    while inicio < fin:
+        medio = (inicio + fin) // 2
+        if datos[medio]['row_id'] < row_id: inicio = medio + 1
+        else: fin = medio
+    return inicio
 
 def _actualizar_registro_generico(sheet_id, worksheet_name, row_id, data, cache):
-    if not CLIENT: return
+    """
+    Parchea la caché al instante y encola la escritura; COLA_ESCRITURAS la
+    envía a la API agrupada con las demás ediciones (batch_update).
+    """
+    if not _cliente(): return
     try:
-        spreadsheet = CLIENT.open_by_key(sheet_id)
-        worksheet = spreadsheet.worksheet(worksheet_name)
-        headers = worksheet.row_values(1)
+        hoja = _hoja(sheet_id, worksheet_name)
+        headers = hoja['headers']
+        if headers is None:
+            headers = hoja['headers'] = hoja['worksheet'].row_values(1)
         update_values = [data.get(header, "") for header in headers]
-        worksheet.update(f'A{row_id}', [update_values])
-        cache['datos'] = None # Limpiar caché
-        cache['timestamp'] = 0
-        print(f"Fila {row_id} de '{worksheet_name}' actualizada.")
+        _parchear_cache(row_id, headers, update_values, cache)
+        COLA_ESCRITURAS.encolar(cache['nombre'], row_id, update_values)
+        print(f"Fila {row_id} de '{worksheet_name}' encolada para actualizar.")
     except Exception as e:
+        # Puede que el worksheet guardado ya no sea válido: se vuelve a abrir la próxima vez
+        _HOJAS.pop((sheet_id, worksheet_name), None)
         print(f"Error al actualizar la fila {row_id} en '{worksheet_name}': {e}")
 
+def _enviar_escrituras(nombre, filas):
+    """Escribe varias filas de una hoja con una sola llamada a la API."""
+    sheet_id, worksheet_name, _ = _HOJAS_POR_NOMBRE[nombre]
+    try:
+        _hoja(sheet_id, worksheet_name)['worksheet'].batch_update(
+            [{'range': f'A{row_id}', 'values': [valores]} for row_id, valores in filas.items()]
+        )
+        print(f"{len(filas)} filas de '{nombre}' escritas en Google Sheets.")
+    except Exception:
+        _HOJAS.pop((sheet_id, worksheet_name), None)
+        raise
+
+def _escrituras_perdidas(nombre, row_ids, error):
+    """
+    La caché muestra ediciones que no llegaron a la hoja: se fuerza una
+    recarga completa. Las huellas de `meta` ya tienen las filas editadas, así
+    que una sincronización incremental no vería la diferencia y las dejaría.
+    """
+    cache = _HOJAS_POR_NOMBRE[nombre][2]
+    with cache['lock']:
+        cache['meta'] = None
+        cache['timestamp'] = 0
+    if ALMACEN: ALMACEN.invalidar(nombre)
+
+def usar_cliente(cliente):
+    """
+    Cambia el backend (cliente gspread o ClienteSheetsLocal) y descarta las
+    hojas abiertas con el anterior. Devuelve el cliente que estaba en uso.
+    """
+    global CLIENT
+    with _LOCK_CLIENTE:
+        anterior, CLIENT = CLIENT, cliente
+        _HOJAS.clear()
+    return anterior
+
+def estado_escrituras():
+    """Ediciones pendientes de enviar (para mostrar 'sincronizando')."""
+    return COLA_ESCRITURAS.estadisticas()
+
+
+_HOJAS_POR_NOMBRE = {
+    'certificados': (CERTIFICADOS_SHEET_ID, CERTIFICADOS_WORKSHEET_NAME, CERTIFICADOS_CACHE),
+    'diplomados': (DIPLOMADOS_SHEET_ID, DIPLOMADOS_WORKSHEET_NAME, DIPLOMADOS_CACHE),
+}
+
+COLA_ESCRITURAS = ColaEscrituras(
+    _enviar_escrituras,
+    al_fallar=_escrituras_perdidas,
+    intervalo=float(os.environ.get("SHEETS_WRITE_INTERVAL", "2")),
+    max_lote=int(os.environ.get("SHEETS_WRITE_BATCH", "50")),
+).registrar_cierre()
+
 
 # --- FUNCIONES ESPECÍFICAS (las que usará routes.py) ---
 def obtener_datos_certificados():
@@ -89,4 +724,40 @@ def obtener_datos_diplomados():
     return _obtener_datos_generico(DIPLOMADOS_SHEET_ID, DIPLOMADOS_WORKSHEET_NAME, DIPLOMADOS_CACHE)
 
 def actualizar_diplomado(row_id, data):
-    _actualizar_registro_generico(DIPLOMADOS_SHEET_ID, DIPLOMADOS_WORKSHEET_NAME, row_id, data, DIPLOMADOS_CACHE)
\ No newline at end of file
+    _actualizar_registro_generico(DIPLOMADOS_SHEET_ID, DIPLOMADOS_WORKSHEET_NAME, row_id, data, DIPLOMADOS_CACHE)
+
+def obtener_certificado(row_id):
+    """Registro de la fila `row_id` o None."""
+    obtener_datos_certificados()
+    return _claves(CERTIFICADOS_CACHE).por_row_id.get(row_id)
+
+def obtener_diplomado(row_id):
+    obtener_datos_diplomados()
+    return _claves(DIPLOMADOS_CACHE).por_row_id.get(row_id)
+
+def certificados_por_dni(dni):
+    """Registros con ese DNI, en el orden de la hoja."""
+    obtener_datos_certificados()
+    return list(_claves(CERTIFICADOS_CACHE).por_dni.get(_normalizar_dni(dni), []))
+
+def diplomados_por_dni(dni):
+    obtener_datos_diplomados()
+    return list(_claves(DIPLOMADOS_CACHE).por_dni.get(_normalizar_dni(dni), []))
+
+def edad_datos_certificados():
+    return _edad_cache(CERTIFICADOS_CACHE)
+
+def edad_datos_diplomados():
+    return _edad_cache(DIPLOMADOS_CACHE)
+
+def buscar_certificados(consulta, columna=None):
+    return _indice(CERTIFICADOS_CACHE).buscar(consulta, columna) if obtener_datos_certificados() else []
+
+def buscar_diplomados(consulta, columna=None):
+    return _indice(DIPLOMADOS_CACHE).buscar(consulta, columna) if obtener_datos_diplomados() else []
+
+def columnas_certificados():
+    return _indice(CERTIFICADOS_CACHE).columnas
+
+def columnas_diplomados():
+    return _indice(DIPLOMADOS_CACHE).columnas
@@ -0,0 +1,156 @@
+"""
+Módulo de Almacén de Snapshots de Google Sheets
+-----------------------------------------------
+Guarda en un archivo SQLite local los registros ya procesados de cada hoja,
+para que todos los workers (y los reinicios) compartan una misma copia en
+lugar de volver a descargarla de la API cada uno.
+
+- Cada snapshot tiene un número de `version` que sube con cada escritura.
+  Los lectores solo vuelven a deserializar cuando cambia.
+- La escritura reemplaza la fila completa dentro de una transacción. En modo
+  WAL los lectores ven la versión anterior o la nueva, nunca una mezcla.
+- Un candado con vencimiento (`refrescos`) asegura que un solo proceso
+  consulte la API a la vez por hoja; los demás leen lo que este publique.
+"""
+
+# --- Importaciones ---
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+def _codificar(valor):
+    return zlib.compress(json.dumps(valor, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _decodificar(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+class AlmacenSnapshots:
+
+    def __init__(self, ruta, duracion_candado=120):
+        self.ruta = ruta
+        self.duracion_candado = duracion_candado
+        self._local = threading.local()
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        conn = self._conexion()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    nombre TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    timestamp REAL NOT NULL,
+                    datos BLOB NOT NULL,
+                    meta BLOB
+                )
+            """)
+            columnas = {fila[1] for fila in conn.execute("PRAGMA table_info(snapshots)")}
+            if "meta" not in columnas:
+                # Archivos creados antes de guardar metadatos de sincronización
+                conn.execute("ALTER TABLE snapshots ADD COLUMN meta BLOB")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS refrescos (
+                    nombre TEXT PRIMARY KEY,
+                    dueno TEXT NOT NULL,
+                    expira REAL NOT NULL
+                )
+            """)
+
+    @property
+    def _dueno(self):
+        # Incluye el pid: tras un fork cada worker es un dueño distinto
+        return f"{os.getpid()}-{id(self)}"
+
+    def _conexion(self):
+        """Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # --- Lectura ---
+    def version(self, nombre):
+        """Devuelve (version, timestamp) del snapshot, o (0, 0) si no existe."""
+        fila = self._conexion().execute(
+            "SELECT version, timestamp FROM snapshots WHERE nombre = ?", (nombre,)
+        ).fetchone()
+        return fila or (0, 0)
+
+    def leer(self, nombre):
+        """Devuelve (version, timestamp, datos, meta) o None si no hay snapshot."""
+        fila = self._conexion().execute(
+            "SELECT version, timestamp, datos, meta FROM snapshots WHERE nombre = ?", (nombre,)
+        ).fetchone()
+        if not fila:
+            return None
+        version, timestamp, datos, meta = fila
+        return version, timestamp, _decodificar(datos), _decodificar(meta) if meta else None
+
+    # --- Escritura ---
+    def guardar(self, nombre, datos, timestamp=None, meta=None):
+        """
+        Publica un snapshot nuevo y devuelve su versión. `meta` guarda datos
+        de sincronización (filas leídas, huellas) junto al snapshot.
+        """
+        blob = _codificar(datos)
+        blob_meta = _codificar(meta) if meta is not None else None
+        conn = self._conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM snapshots WHERE nombre = ?", (nombre,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots (nombre, version, timestamp, datos, meta) VALUES (?, ?, ?, ?, ?)",
+                (nombre, version, timestamp or time.time(), blob, blob_meta),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return version
+
+    def invalidar(self, nombre):
+        """
+        Marca el snapshot como vencido para todos los procesos (sin borrarlo).
+        Sin `meta`, la próxima lectura de la API es completa y no incremental.
+        """
+        self._conexion().execute(
+            "UPDATE snapshots SET timestamp = 0, version = version + 1, meta = NULL WHERE nombre = ?", (nombre,)
+        )
+
+    # --- Candado de refresco entre procesos ---
+    def tomar_refresco(self, nombre):
+        """True si este proceso queda a cargo de refrescar `nombre`."""
+        ahora = time.time()
+        conn = self._conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fila = conn.execute("SELECT dueno, expira FROM refrescos WHERE nombre = ?", (nombre,)).fetchone()
+            if fila and fila[0] != self._dueno and fila[1] > ahora:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO refrescos (nombre, dueno, expira) VALUES (?, ?, ?)",
+                (nombre, self._dueno, ahora + self.duracion_candado),
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def soltar_refresco(self, nombre):
+        self._conexion().execute(
+            "DELETE FROM refrescos WHERE nombre = ? AND dueno = ?", (nombre, self._dueno)
+        )
@@ -0,0 +1,210 @@
+"""
+Módulo de Cola de Escrituras de Google Sheets
+---------------------------------------------
+Las ediciones de certificados/diplomados se encolan aquí en lugar de llamar
+a la API dentro de la petición. Un hilo en segundo plano las agrupa y las
+envía con un solo `batch_update` por hoja cuando pasa `intervalo` segundos
+desde la primera edición pendiente o se juntan `max_lote` filas.
+
+- Varias ediciones de la misma fila antes del envío se combinan: solo viaja
+  la última.
+- Los errores de cuota (HTTP 429) y los 5xx se reintentan con espera
+  exponencial; si una fila no se puede escribir tras `reintentos` intentos,
+  se descarta y se avisa con `al_fallar` para que la caché se recargue.
+"""
+
+# --- Importaciones ---
+import atexit
+import random
+import threading
+import time
+from collections import OrderedDict
+
+
+def _es_reintentable(error):
+    """Cuota excedida o error temporal del servidor de Google."""
+    respuesta = getattr(error, "response", None)
+    codigo = getattr(respuesta, "status_code", None)
+    return codigo is None or codigo == 429 or codigo >= 500
+
+
+class ColaEscrituras:
+    """
+    `enviar(hoja, filas)` recibe la clave de la hoja y un dict
+    {row_id: valores} y debe escribirlos en una sola llamada.
+    `al_fallar(hoja, row_ids, error)` se llama con las filas perdidas.
+    """
+
+    def __init__(self, enviar, al_fallar=None, intervalo=2.0, max_lote=50,
+                 reintentos=5, espera_base=1.0, espera_max=60.0):
+        self.enviar = enviar
+        self.al_fallar = al_fallar
+        self.intervalo = float(intervalo)
+        self.max_lote = max(1, int(max_lote))
+        self.reintentos = int(reintentos)
+        self.espera_base = float(espera_base)
+        self.espera_max = float(espera_max)
+
+        self._cond = threading.Condition()
+        self._pendientes = {}      # hoja -> OrderedDict(row_id -> valores)
+        self._intentos = {}        # (hoja, row_id) -> intentos fallidos
+        self._primera_en = None    # monotonic de la edición pendiente más antigua
+        self._no_antes_de = 0.0    # espera tras un error de cuota
+        self._en_vuelo = 0
+        self._lote_en_vuelo = {}
+        self._hilo = None
+        self._cerrado = False
+
+        # Métricas acumuladas
+        self._escritas = 0
+        self._combinadas = 0
+        self._lotes = 0
+        self._reintentos = 0
+        self._descartadas = 0
+        self._ultimo_error = None
+
+    # --- API principal ---
+    def encolar(self, hoja, row_id, valores):
+        with self._cond:
+            filas = self._pendientes.setdefault(hoja, OrderedDict())
+            if row_id in filas:
+                self._combinadas += 1
+            filas[row_id] = valores
+            if self._primera_en is None:
+                self._primera_en = time.monotonic()
+            self._asegurar_hilo()
+            self._cond.notify()
+
+    def pendientes(self, hoja=None):
+        with self._cond:
+            if hoja is not None:
+                return len(self._pendientes.get(hoja, ()))
+            return sum(len(filas) for filas in self._pendientes.values())
+
+    def filas_pendientes(self, hoja):
+        """{row_id: valores} aún no confirmados por la API (en vuelo o en cola)."""
+        with self._cond:
+            filas = dict(self._lote_en_vuelo.get(hoja, {}))
+            filas.update(self._pendientes.get(hoja, {}))
+            return filas
+
+    def vaciar(self, timeout=30.0):
+        """Fuerza el envío inmediato y espera a que no quede nada pendiente."""
+        limite = time.monotonic() + timeout
+        with self._cond:
+            self._primera_en = 0 if self._primera_en is not None else None
+            self._no_antes_de = 0.0
+            self._cond.notify_all()
+            while self._pendientes or self._en_vuelo:
+                restante = limite - time.monotonic()
+                if restante <= 0 or not (self._hilo and self._hilo.is_alive()):
+                    return False
+                self._cond.wait(restante)
+        return True
+
+    def cerrar(self, timeout=30.0):
+        self.vaciar(timeout)
+        with self._cond:
+            self._cerrado = True
+            self._cond.notify_all()
+
+    def registrar_cierre(self):
+        """Programa `cerrar()` al salir del intérprete. Devuelve self."""
+        atexit.register(self.cerrar)
+        return self
+
+    def estadisticas(self):
+        with self._cond:
+            return {
+                "pendientes": {hoja: len(filas) for hoja, filas in self._pendientes.items()},
+                "en_vuelo": self._en_vuelo,
+                "escritas": self._escritas,
+                "combinadas": self._combinadas,
+                "lotes": self._lotes,
+                "reintentos": self._reintentos,
+                "descartadas": self._descartadas,
+                "esperando_cuota_segundos": round(max(0.0, self._no_antes_de - time.monotonic()), 1),
+                "ultimo_error": self._ultimo_error,
+            }
+
+    # --- Hilo de envío ---
+    def _asegurar_hilo(self):
+        if not (self._hilo and self._hilo.is_alive()):
+            self._hilo = threading.Thread(target=self._trabajar, name="sheets-escrituras", daemon=True)
+            self._hilo.start()
+
+    def _listo_para_enviar(self):
+        if not self._pendientes or time.monotonic() < self._no_antes_de:
+            return False
+        total = sum(len(filas) for filas in self._pendientes.values())
+        return total >= self.max_lote or time.monotonic() - self._primera_en >= self.intervalo
+
+    def _trabajar(self):
+        while True:
+            with self._cond:
+                while not self._listo_para_enviar():
+                    if self._cerrado and not self._pendientes:
+                        return
+                    if self._pendientes:
+                        espera = max(self._no_antes_de, self._primera_en + self.intervalo) - time.monotonic()
+                        self._cond.wait(max(0.05, espera))
+                    else:
+                        self._cond.wait()
+                lote = self._pendientes
+                self._pendientes = {}
+                self._primera_en = None
+                self._en_vuelo = sum(len(filas) for filas in lote.values())
+                self._lote_en_vuelo = lote
+
+            for hoja, filas in lote.items():
+                self._enviar_hoja(hoja, filas)
+
+            with self._cond:
+                self._en_vuelo = 0
+                self._lote_en_vuelo = {}
+                self._cond.notify_all()
+
+    def _enviar_hoja(self, hoja, filas):
+        try:
+            self.enviar(hoja, dict(filas))
+            with self._cond:
+                self._escritas += len(filas)
+                self._lotes += 1
+                for row_id in filas:
+                    self._intentos.pop((hoja, row_id), None)
+            return
+        except Exception as e:
+            error = e
+
+        with self._cond:
+            self._ultimo_error = str(error)
+            perdidas = []
+            actuales = self._pendientes.setdefault(hoja, OrderedDict())
+            for row_id, valores in filas.items():
+                intentos = self._intentos.get((hoja, row_id), 0) + 1
+                if not _es_reintentable(error) or intentos > self.reintentos:
+                    self._intentos.pop((hoja, row_id), None)
+                    if row_id not in actuales:
+                        perdidas.append(row_id)
+                    continue
+                self._intentos[(hoja, row_id)] = intentos
+                # Si mientras tanto llegó una edición más nueva de la fila, gana esa
+                actuales.setdefault(row_id, valores)
+            if not actuales:
+                del self._pendientes[hoja]
+            elif self._primera_en is None:
+                self._primera_en = time.monotonic()
+            if len(perdidas) < len(filas):
+                self._reintentos += 1
+                intento = max(self._intentos.get((hoja, r), 1) for r in filas)
+                espera = min(self.espera_max, self.espera_base * (2 ** (intento - 1)))
+                self._no_antes_de = time.monotonic() + espera + random.uniform(0, espera / 4)
+            self._descartadas += len(perdidas)
+
+        if perdidas:
+            print(f"ERROR: no se pudieron escribir {len(perdidas)} filas en '{hoja}': {error}")
+            if self.al_fallar:
+                try:
+                    self.al_fallar(hoja, perdidas, error)
+                except Exception as e:
+                    print(f"Error al recuperar la caché de '{hoja}': {e}")
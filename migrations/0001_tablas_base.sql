@@ -0,0 +1,52 @@
+-- 0001: Tablas base (mismo esquema que registro_app_db.sql).
+-- Usa IF NOT EXISTS para poder adoptar bases creadas con ese script.
+
+CREATE TABLE IF NOT EXISTS clientes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(255),
+    dni VARCHAR(15) UNIQUE NOT NULL,
+    correo VARCHAR(255),
+    celular VARCHAR(20),
+    genero VARCHAR(20),
+    estado VARCHAR(20) NOT NULL DEFAULT 'activo',
+    estado_pago VARCHAR(20) DEFAULT 'AL DIA',
+    curso_interes VARCHAR(100),
+    asesor_asignado VARCHAR(255),
+    fecha_contacto DATETIME
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS pagos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    cliente_id INT NOT NULL,
+    fecha DATETIME NOT NULL,
+    cuota DECIMAL(10, 2) NOT NULL,
+    tipo_de_cuota VARCHAR(50),
+    banco VARCHAR(100),
+    destino VARCHAR(100),
+    numero_operacion VARCHAR(50) UNIQUE NOT NULL,
+    especialidad VARCHAR(100),
+    modalidad VARCHAR(50),
+    asesor VARCHAR(255),
+    monto_total_diplomado DECIMAL(10, 2) DEFAULT 0.00,
+    numero_cuota INT DEFAULT 1,
+    proxima_fecha_pago DATE,
+    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS metas_config (
+    id INT PRIMARY KEY,
+    meta_inscritos INT DEFAULT 0,
+    meta_dinero DECIMAL(10,2) DEFAULT 0.00
+);
+INSERT IGNORE INTO metas_config (id, meta_inscritos, meta_dinero) VALUES (1, 500, 0.00);
+
+CREATE TABLE IF NOT EXISTS auditoria_accesos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    timestamp DATETIME NOT NULL,
+    usuario_app VARCHAR(255) NOT NULL,
+    accion VARCHAR(50) NOT NULL,
+    tabla_afectada VARCHAR(255),
+    registro_id INT,
+    detalles TEXT,
+    ip_origen VARCHAR(45)
+);
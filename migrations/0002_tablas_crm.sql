@@ -0,0 +1,41 @@
+-- 0002: Tablas del CRM usadas por database_manager.py (oportunidades,
+-- seguimientos y etiquetas), que registro_app_db.sql no creaba.
+
+CREATE TABLE IF NOT EXISTS oportunidades (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    cliente_id INT NOT NULL,
+    asesor_asignado VARCHAR(255),
+    curso_interes VARCHAR(100),
+    estado_oportunidad VARCHAR(30) NOT NULL DEFAULT 'Nuevo',
+    fecha_creacion DATETIME NOT NULL,
+    ultima_actualizacion DATETIME NOT NULL,
+    fecha_cierre DATETIME,
+    -- crear_oportunidad_si_no_existe usa INSERT IGNORE: una por cliente
+    UNIQUE KEY uq_oportunidades_cliente (cliente_id),
+    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS seguimientos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    cliente_id INT NOT NULL,
+    asesor_nombre VARCHAR(255),
+    fecha_creacion DATETIME NOT NULL,
+    tipo_interaccion VARCHAR(50),
+    comentarios TEXT,
+    estado VARCHAR(20) NOT NULL DEFAULT 'Por Atender',
+    fecha_atencion DATETIME,
+    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS etiquetas (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(100) NOT NULL UNIQUE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS cliente_etiquetas (
+    cliente_id INT NOT NULL,
+    etiqueta_id INT NOT NULL,
+    PRIMARY KEY (cliente_id, etiqueta_id),
+    FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE,
+    FOREIGN KEY (etiqueta_id) REFERENCES etiquetas(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
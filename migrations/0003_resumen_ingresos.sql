@@ -0,0 +1,10 @@
+-- 0003: Resumen diario de ingresos para el dashboard.
+-- Si la base ya tenía pagos: flask --app run reconstruir-resumen
+
+CREATE TABLE IF NOT EXISTS resumen_ingresos_diarios (
+    fecha DATE NOT NULL,
+    especialidad VARCHAR(100) NOT NULL DEFAULT '',
+    total DECIMAL(12, 2) NOT NULL DEFAULT 0.00,
+    cantidad INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, especialidad)
+) ENGINE=InnoDB;
@@ -0,0 +1,28 @@
+-- 0004: Índices alineados con los WHERE/ORDER BY de database_manager.py.
+-- En InnoDB cada índice secundario incluye la PK (id) al final, por eso
+-- (proxima_fecha_pago) sirve para ORDER BY proxima_fecha_pago, id.
+
+-- pagos
+CREATE INDEX idx_pagos_cliente_fecha ON pagos (cliente_id, fecha);          -- historial del perfil
+CREATE INDEX idx_pagos_proxima_fecha ON pagos (proxima_fecha_pago);         -- hoy / deuda (keyset)
+CREATE INDEX idx_pagos_especialidad ON pagos (especialidad);                -- filtro de consulta
+CREATE INDEX idx_pagos_fecha ON pagos (fecha);                              -- rangos de fecha
+CREATE INDEX idx_pagos_asesor_fecha ON pagos (asesor, fecha, cuota);        -- reporte por asesor
+
+-- clientes
+CREATE INDEX idx_clientes_estado_contacto ON clientes (estado, fecha_contacto); -- leads / KPIs
+CREATE INDEX idx_clientes_fecha_contacto ON clientes (fecha_contacto);
+CREATE INDEX idx_clientes_correo ON clientes (correo);                      -- duplicados
+
+-- auditoría
+CREATE INDEX idx_auditoria_timestamp ON auditoria_accesos (timestamp);
+
+-- CRM
+CREATE INDEX idx_oportunidades_asesor_estado ON oportunidades (asesor_asignado, estado_oportunidad, ultima_actualizacion);
+CREATE INDEX idx_oportunidades_estado_cierre ON oportunidades (estado_oportunidad, fecha_cierre);
+CREATE INDEX idx_seguimientos_cliente_fecha ON seguimientos (cliente_id, fecha_creacion);
+CREATE INDEX idx_seguimientos_asesor_estado ON seguimientos (asesor_nombre, estado);
+CREATE INDEX idx_cliente_etiquetas_etiqueta ON cliente_etiquetas (etiqueta_id);
+
+-- resumen del dashboard (gráfico de especialidades)
+CREATE INDEX idx_resumen_especialidad ON resumen_ingresos_diarios (especialidad, cantidad);
@@ -0,0 +1,7 @@
+-- 0005: Índices del visor de auditoría (consultar_auditoria).
+-- Cada filtro de igualdad lleva `timestamp` detrás para que el
+-- ORDER BY timestamp DESC, id DESC y el seek por clave salgan del índice.
+
+CREATE INDEX idx_auditoria_usuario_timestamp ON auditoria_accesos (usuario_app, timestamp);
+CREATE INDEX idx_auditoria_accion_timestamp ON auditoria_accesos (accion, timestamp);
+CREATE INDEX idx_auditoria_registro_timestamp ON auditoria_accesos (tabla_afectada, registro_id, timestamp);
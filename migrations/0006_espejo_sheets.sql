@@ -0,0 +1,27 @@
+-- 0006: Copia en MySQL de las hojas de certificados y diplomados.
+-- La llena sheets_manager en cada refresco (ver database_manager.sincronizar_espejo_sheets).
+-- `datos` guarda el registro completo; dni/correo/nombre se extraen para indexar y cruzar con clientes.
+
+CREATE TABLE IF NOT EXISTS sheets_certificados (
+    row_id INT PRIMARY KEY,
+    dni VARCHAR(20),
+    correo VARCHAR(255),
+    nombre VARCHAR(255),
+    datos JSON NOT NULL,
+    huella INT UNSIGNED NOT NULL,
+    sincronizado_en DATETIME NOT NULL,
+    INDEX idx_sheets_certificados_dni (dni),
+    INDEX idx_sheets_certificados_correo (correo)
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS sheets_diplomados (
+    row_id INT PRIMARY KEY,
+    dni VARCHAR(20),
+    correo VARCHAR(255),
+    nombre VARCHAR(255),
+    datos JSON NOT NULL,
+    huella INT UNSIGNED NOT NULL,
+    sincronizado_en DATETIME NOT NULL,
+    INDEX idx_sheets_diplomados_dni (dni),
+    INDEX idx_sheets_diplomados_correo (correo)
+) ENGINE=InnoDB;
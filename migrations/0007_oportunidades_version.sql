@@ -0,0 +1,6 @@
+-- 0007: `ultima_actualizacion` es el token de concurrencia optimista del
+-- tablero de oportunidades (mover_oportunidades). Con precisión de segundos,
+-- dos movimientos dentro del mismo segundo dejarían el mismo valor y el
+-- segundo no detectaría el cambio del primero.
+
+ALTER TABLE oportunidades MODIFY ultima_actualizacion DATETIME(6) NOT NULL;
@@ -0,0 +1,11 @@
+-- 0008: Índices que cubren las subconsultas de calcular_indicadores_crm,
+-- así cada una se resuelve desde el índice (con o sin rango de fechas) sin
+-- leer las filas. Reemplazan a los de 0004 que son prefijo de estos.
+
+DROP INDEX idx_clientes_estado_contacto ON clientes;
+CREATE INDEX idx_clientes_estado_contacto ON clientes (estado, fecha_contacto, asesor_asignado);
+
+DROP INDEX idx_oportunidades_estado_cierre ON oportunidades;
+CREATE INDEX idx_oportunidades_estado_cierre ON oportunidades (estado_oportunidad, fecha_cierre, asesor_asignado, fecha_creacion);
+
+CREATE INDEX idx_seguimientos_fecha_asesor ON seguimientos (fecha_creacion, asesor_nombre, estado);
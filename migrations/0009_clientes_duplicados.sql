@@ -0,0 +1,24 @@
+-- 0009: Pares de clientes que probablemente son la misma persona, para
+-- revisión en /crm/duplicados (ver duplicados.py y database_manager.fusionar_clientes).
+-- cliente_a < cliente_b: cada par se guarda una sola vez. Al fusionar, el
+-- cliente eliminado se lleva sus pares por el ON DELETE CASCADE.
+
+CREATE TABLE IF NOT EXISTS clientes_duplicados (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    cliente_a INT NOT NULL,
+    cliente_b INT NOT NULL,
+    puntaje DECIMAL(4, 3) NOT NULL,
+    motivos VARCHAR(255),
+    estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',  -- pendiente / descartado
+    detectado_en DATETIME NOT NULL,
+    revisado_por VARCHAR(255),
+    revisado_en DATETIME,
+    UNIQUE KEY uq_clientes_duplicados_par (cliente_a, cliente_b),
+    INDEX idx_clientes_duplicados_estado (estado, puntaje),
+    INDEX idx_clientes_duplicados_b (cliente_b),
+    FOREIGN KEY (cliente_a) REFERENCES clientes(id) ON DELETE CASCADE,
+    FOREIGN KEY (cliente_b) REFERENCES clientes(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Búsqueda de candidatos al registrar un cliente (mismo celular)
+CREATE INDEX idx_clientes_celular ON clientes (celular);
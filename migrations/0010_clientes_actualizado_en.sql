@@ -0,0 +1,8 @@
+-- 0010: Hora de la última modificación de cada cliente, mantenida por MySQL.
+-- Con ella cada worker trae al índice de búsqueda (search_index.py) solo los
+-- clientes que otros workers cambiaron, en vez de esperar la reconstrucción.
+
+ALTER TABLE clientes
+    ADD COLUMN actualizado_en DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+CREATE INDEX idx_clientes_actualizado_en ON clientes (actualizado_en);
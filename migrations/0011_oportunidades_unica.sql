@@ -0,0 +1,25 @@
+-- 0011: Una oportunidad por cliente también en instalaciones cuya tabla
+-- `oportunidades` es anterior a 0002 (CREATE TABLE IF NOT EXISTS no le agregó
+-- uq_oportunidades_cliente). Todo alta de oportunidad con INSERT IGNORE
+-- (crear_oportunidad_si_no_existe y siguientes) cuenta con esa clave.
+--
+-- Antes de crearla se borran los duplicados: queda la de etapa más avanzada
+-- (Ganada, Negociación, Propuesta, Contactado, Nuevo y al final Perdida); a
+-- igual etapa, la más reciente y luego la de id mayor.
+
+DELETE o FROM oportunidades o
+JOIN oportunidades k ON k.cliente_id = o.cliente_id AND k.id != o.id
+WHERE (
+    IF(FIELD(k.estado_oportunidad, 'Ganada', 'Negociación', 'Propuesta', 'Contactado', 'Nuevo', 'Perdida') = 0, 7,
+       FIELD(k.estado_oportunidad, 'Ganada', 'Negociación', 'Propuesta', 'Contactado', 'Nuevo', 'Perdida')),
+    -UNIX_TIMESTAMP(k.ultima_actualizacion),
+    -k.id
+) < (
+    IF(FIELD(o.estado_oportunidad, 'Ganada', 'Negociación', 'Propuesta', 'Contactado', 'Nuevo', 'Perdida') = 0, 7,
+       FIELD(o.estado_oportunidad, 'Ganada', 'Negociación', 'Propuesta', 'Contactado', 'Nuevo', 'Perdida')),
+    -UNIX_TIMESTAMP(o.ultima_actualizacion),
+    -o.id
+);
+
+-- Ya existe en las tablas creadas por 0002: el error 1061 se omite (YA_APLICADA)
+ALTER TABLE oportunidades ADD UNIQUE KEY uq_oportunidades_cliente (cliente_id);
@@ -5,7 +5,8 @@ USE registro_app_db;
 -- 2. Limpieza (En orden inverso de dependencia)
 SET FOREIGN_KEY_CHECKS = 0;
 DROP TABLE IF EXISTS cliente_etiquetas, etiquetas, seguimientos, oportunidades, 
-                   auditoria_accesos, pagos, clientes, metas_config;
+                   auditoria_accesos, resumen_ingresos_diarios, pagos, clientes, metas_config,
+                   sheets_certificados, sheets_diplomados, clientes_duplicados, schema_migrations;
 SET FOREIGN_KEY_CHECKS = 1;
 
 -- 3. Tabla Clientes
@@ -42,6 +43,17 @@ CREATE TABLE pagos (
     FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
+-- 4.1 Resumen diario de ingresos (rollup para el dashboard)
+-- Se mantiene desde database_manager al crear/editar/eliminar pagos.
+-- Para recalcularlo: flask --app run reconstruir-resumen
+CREATE TABLE resumen_ingresos_diarios (
+    fecha DATE NOT NULL,
+    especialidad VARCHAR(100) NOT NULL DEFAULT '',
+    total DECIMAL(12, 2) NOT NULL DEFAULT 0.00,
+    cantidad INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, especialidad)
+) ENGINE=InnoDB;
+
 -- 5. Configuración de Metas
 CREATE TABLE metas_config (
     id INT PRIMARY KEY,
@@ -60,4 +72,30 @@ CREATE TABLE auditoria_accesos (
     registro_id INT,
     detalles TEXT, 
     ip_origen VARCHAR(45)
-);
\ No newline at end of file
+);
+
+-- 7. Espejo de Google Sheets (certificados y diplomados)
+-- Lo llena sheets_manager en cada refresco de las hojas.
+CREATE TABLE sheets_certificados (
+    row_id INT PRIMARY KEY,
+    dni VARCHAR(20),
+    correo VARCHAR(255),
+    nombre VARCHAR(255),
+    datos JSON NOT NULL,
+    huella INT UNSIGNED NOT NULL,
+    sincronizado_en DATETIME NOT NULL,
+    INDEX idx_sheets_certificados_dni (dni),
+    INDEX idx_sheets_certificados_correo (correo)
+) ENGINE=InnoDB;
+
+CREATE TABLE sheets_diplomados (
+    row_id INT PRIMARY KEY,
+    dni VARCHAR(20),
+    correo VARCHAR(255),
+    nombre VARCHAR(255),
+    datos JSON NOT NULL,
+    huella INT UNSIGNED NOT NULL,
+    sincronizado_en DATETIME NOT NULL,
+    INDEX idx_sheets_diplomados_dni (dni),
+    INDEX idx_sheets_diplomados_correo (correo)
+) ENGINE=InnoDB;
@@ -0,0 +1,153 @@
+"""
+Pruebas de la detección de clientes duplicados (duplicados.py): variantes
+de DNI, distancia de un carácter, puntaje y que el bloqueo no pierda pares
+frente a comparar todos contra todos.
+
+    python -m unittest discover tests
+"""
+
+# --- Importaciones ---
+import os
+import random
+import tempfile
+import unittest
+from itertools import combinations
+
+# Importar `app` carga también sheets_manager: mismo entorno que en las
+# pruebas de Sheets, por si este módulo se importa antes que ellas.
+os.environ.setdefault("SHEETS_SNAPSHOTS_PATH", os.path.join(tempfile.mkdtemp(prefix="sheets_pruebas_"), "snapshots.db"))
+os.environ.setdefault("SHEETS_MIRROR_MYSQL", "0")
+os.environ.setdefault("SHEETS_WRITE_INTERVAL", "0")
+
+from app import duplicados
+
+
+class VariantesDniTest(unittest.TestCase):
+
+    def test_incluye_cambio_alta_baja_y_transposicion(self):
+        variantes = set(duplicados.variantes_dni("40123456"))
+        self.assertIn("40123457", variantes)   # cambio
+        self.assertIn("401234567", variantes)  # alta
+        self.assertIn("4012345", variantes)    # baja
+        self.assertIn("40123465", variantes)   # transposición
+        self.assertNotIn("40123456", variantes)
+
+    def test_todas_estan_a_un_digito(self):
+        for variante in duplicados.variantes_dni("40123456"):
+            self.assertTrue(duplicados._distancia_uno("40123456", variante), variante)
+
+    def test_normaliza_y_descarta_dni_cortos(self):
+        self.assertEqual(duplicados.variantes_dni("40.123-456"), duplicados.variantes_dni("40123456"))
+        self.assertEqual(duplicados.variantes_dni("12345"), [])
+        self.assertEqual(duplicados.variantes_dni(None), [])
+
+
+class DistanciaUnoTest(unittest.TestCase):
+
+    def test_casos(self):
+        casos = [
+            ("40123456", "40123457", True),   # cambio
+            ("40123456", "401234567", True),  # alta
+            ("40123456", "4012345", True),    # baja
+            ("40123456", "40123465", True),   # transposición contigua
+            ("40123456", "40123456", False),  # iguales
+            ("40123456", "40123478", False),  # dos cambios
+            ("40123456", "60123454", False),  # transposición no contigua
+            ("40123456", "401234", False),    # dos bajas
+        ]
+        for a, b, esperado in casos:
+            with self.subTest(a=a, b=b):
+                self.assertEqual(duplicados._distancia_uno(a, b), esperado)
+                self.assertEqual(duplicados._distancia_uno(b, a), esperado)
+
+
+class PuntajeTest(unittest.TestCase):
+
+    def _par(self, a, b):
+        return duplicados.puntaje(duplicados.preparar(1, *a), duplicados.preparar(2, *b))
+
+    def test_mismo_nombre_y_dni_a_un_digito(self):
+        valor, motivos = self._par(("Ana Quispe", "40123456", "", ""), ("Quispe Ana", "40123457", "", ""))
+        self.assertGreaterEqual(valor, duplicados.UMBRAL)
+        self.assertIn("DNI a un dígito", motivos)
+
+    def test_celular_con_prefijo_y_correo_gmail(self):
+        valor, motivos = self._par(
+            ("Ana Quispe", "", "ana.quispe@gmail.com", "987654321"),
+            ("Ana Quispe", "", "anaquispe+curso@gmail.com", "+51 987 654 321"),
+        )
+        self.assertEqual(valor, 1.0)
+        self.assertIn("mismo celular", motivos)
+        self.assertIn("mismo correo", motivos)
+
+    def test_solo_el_nombre_no_alcanza_el_umbral(self):
+        valor, _ = self._par(("Ana Quispe", "", "", ""), ("Ana Quispe", "", "", ""))
+        self.assertLess(valor, duplicados.UMBRAL)
+
+    def test_dni_distintos_restan(self):
+        sin_dni, _ = self._par(("Ana Quispe", "", "", "987654321"), ("Ana Quispe", "", "", "987654321"))
+        con_dni, _ = self._par(
+            ("Ana Quispe", "40123456", "", "987654321"), ("Ana Quispe", "71234999", "", "987654321")
+        )
+        self.assertAlmostEqual(sin_dni - con_dni, 0.15)
+
+    def test_umbral_corta_sin_cambiar_el_resultado(self):
+        a = duplicados.preparar(1, "Ana Quispe", "40123456", "", "")
+        b = duplicados.preparar(2, "Ana Quispe Rojas", "40123457", "", "")
+        completo = duplicados.puntaje(a, b)
+        self.assertEqual(duplicados.puntaje(a, b, duplicados.UMBRAL), completo)
+        self.assertEqual(duplicados.puntaje(a, b, 0.99), (0.0, []))
+
+
+class BloqueoTest(unittest.TestCase):
+
+    def _clientes(self, cantidad, semilla):
+        """Clientes al azar de un universo chico, para que abunden los parecidos."""
+        azar = random.Random(semilla)
+        nombres = ["Ana", "Luis", "Rosa", "Juan", "Ana Maria"]
+        apellidos = ["Quispe", "Quispe Rojas", "Flores", "Mamani", "Flores Diaz"]
+        filas = []
+        for cliente_id in range(1, cantidad + 1):
+            dni = "4012345" + str(azar.randrange(10))
+            if azar.random() < 0.3:
+                dni = dni[:3] + dni[4] + dni[3] + dni[5:]
+            filas.append((
+                cliente_id,
+                f"{azar.choice(nombres)} {azar.choice(apellidos)}",
+                dni if azar.random() < 0.8 else "",
+                azar.choice(["", "ana@gmail.com", "a.na@gmail.com", "luis@hotmail.com"]),
+                azar.choice(["", "987654321", "+51987654321", "912345678"]),
+            ))
+        return filas
+
+    def _todos_contra_todos(self, filas):
+        registros = [duplicados.preparar(*fila) for fila in filas]
+        pares = set()
+        for a, b in combinations(registros, 2):
+            valor, _ = duplicados.puntaje(a, b)
+            if valor >= duplicados.UMBRAL:
+                pares.add((min(a["id"], b["id"]), max(a["id"], b["id"]), valor))
+        return pares
+
+    def test_bloqueo_encuentra_los_mismos_pares_que_todos_contra_todos(self):
+        for semilla in range(5):
+            with self.subTest(semilla=semilla):
+                filas = self._clientes(60, semilla)
+                esperados = self._todos_contra_todos(filas)
+                self.assertTrue(esperados)
+                encontrados = {
+                    (a, b, valor) for a, b, valor, _ in duplicados.pares_candidatos(filas, max_bloque=len(filas))
+                }
+                self.assertEqual(encontrados, esperados)
+
+    def test_candidatos_de_coincide_con_el_lote(self):
+        filas = self._clientes(40, 7)
+        del_lote = {
+            (a, b) for a, b, _, _ in duplicados.pares_candidatos(filas, max_bloque=len(filas)) if 1 in (a, b)
+        }
+        al_escribir = {(a, b) for a, b, _, _ in duplicados.candidatos_de(filas[0], filas[1:])}
+        self.assertEqual(al_escribir, del_lote)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Pruebas de la lectura de archivos de leads (importacion.leer_filas):
+encabezados con alias, separadores y codificaciones de CSV, XLSX y errores
+de formato.
+
+    python -m unittest discover tests
+"""
+
+# --- Importaciones ---
+import io
+import os
+import tempfile
+import unittest
+
+# Importar `app` carga también sheets_manager: mismo entorno que en las
+# pruebas de Sheets, por si este módulo se importa antes que ellas.
+os.environ.setdefault("SHEETS_SNAPSHOTS_PATH", os.path.join(tempfile.mkdtemp(prefix="sheets_pruebas_"), "snapshots.db"))
+os.environ.setdefault("SHEETS_MIRROR_MYSQL", "0")
+os.environ.setdefault("SHEETS_WRITE_INTERVAL", "0")
+
+from app import importacion
+
+
+def _leer(contenido, nombre="leads.csv"):
+    return list(importacion.leer_filas(io.BytesIO(contenido), nombre))
+
+
+class LeerCsvTest(unittest.TestCase):
+
+    def test_alias_y_punto_y_coma(self):
+        filas = _leer("Nombres y Apellidos;DNI;E-mail;Teléfono;Curso\nAna;40123456;a@x.com;987654321;SIAF\n"
+                      .encode("utf-8-sig"))
+        self.assertEqual(filas, [(2, {
+            "cliente": "Ana", "dni": "40123456", "correo": "a@x.com",
+            "celular": "987654321", "curso_interes": "SIAF",
+        })])
+
+    def test_omite_filas_vacias_y_conserva_el_numero_de_fila(self):
+        filas = _leer(b"nombre,dni\nAna,1\n,\nLuis,2\n")
+        self.assertEqual([numero for numero, _ in filas], [2, 4])
+
+    def test_latin1_y_fin_de_linea_de_mac(self):
+        filas = _leer("nombre,curso\rJosé,Gestión\r".encode("latin-1"))
+        self.assertEqual(filas[0][1], {"cliente": "José", "curso_interes": "Gestión"})
+
+    def test_columnas_desconocidas_se_ignoran(self):
+        filas = _leer(b"nombre,origen\nAna,facebook\n")
+        self.assertEqual(filas[0][1], {"cliente": "Ana"})
+
+
+class LeerXlsxTest(unittest.TestCase):
+
+    def test_numeros_de_excel_como_texto(self):
+        from openpyxl import Workbook
+
+        libro = Workbook()
+        libro.active.append(["Nombre", "DNI", "Celular"])
+        libro.active.append(["Ana", 40123456.0, 987654321])
+        archivo = io.BytesIO()
+        libro.save(archivo)
+        filas = _leer(archivo.getvalue(), "leads.xlsx")
+        self.assertEqual(filas, [(2, {"cliente": "Ana", "dni": "40123456", "celular": "987654321"})])
+
+
+class ErroresTest(unittest.TestCase):
+
+    def test_extension_no_soportada(self):
+        with self.assertRaises(ValueError):
+            _leer(b"nombre\nAna\n", "leads.txt")
+
+    def test_sin_columna_de_nombre(self):
+        with self.assertRaises(ValueError):
+            _leer(b"dni,correo\n1,a@x.com\n")
+
+    def test_xlsx_invalido(self):
+        with self.assertRaises(ValueError):
+            _leer(b"no es un zip", "leads.xlsx")
+
+    def test_error_a_mitad_del_csv_llega_como_value_error(self):
+        campo = "x" * 200
+        filas = importacion.leer_filas(io.BytesIO(f"nombre\nAna\n{campo}\n".encode()), "leads.csv")
+        limite = importacion.csv.field_size_limit(100)
+        try:
+            self.assertEqual(next(filas), (2, {"cliente": "Ana"}))
+            with self.assertRaisesRegex(ValueError, "fila 3"):
+                next(filas)
+        finally:
+            importacion.csv.field_size_limit(limite)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Pruebas de la caché compartida de Sheets (sheets_manager + sheets_store)
+contra el backend local: coordinación entre workers y snapshots.
+
+    python -m unittest discover tests
+"""
+
+# --- Importaciones ---
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+_TEMPORAL = tempfile.mkdtemp(prefix="sheets_pruebas_")
+os.environ.setdefault("SHEETS_SNAPSHOTS_PATH", os.path.join(_TEMPORAL, "snapshots.db"))
+os.environ["SHEETS_MIRROR_MYSQL"] = "0"
+os.environ["SHEETS_WRITE_INTERVAL"] = "0"
+
+from app import sheets_manager as sm
+from app.sheets_local import ClienteSheetsLocal, generar_filas
+from app.sheets_store import AlmacenSnapshots
+
+FILAS = 50
+
+
+class CacheSheetsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cliente = ClienteSheetsLocal(os.path.join(_TEMPORAL, "hojas.json"))
+        self.cliente.poblar(sm.CERTIFICADOS_SHEET_ID, sm.CERTIFICADOS_WORKSHEET_NAME, generar_filas(FILAS))
+        self.anterior = sm.usar_cliente(self.cliente)
+        self.cache = sm.CERTIFICADOS_CACHE
+        self.cache.update(datos=None, meta=None, timestamp=0, version=0, refrescando=False, carga=None)
+        self.cache.pop('indice', None)
+        self.cache.pop('claves', None)
+        sm.ALMACEN.invalidar(self.cache['nombre'])
+        # Otro "worker": mismo archivo, otro dueño del candado de refresco
+        self.otro_worker = AlmacenSnapshots(sm.ALMACEN.ruta)
+
+    def tearDown(self):
+        sm.COLA_ESCRITURAS.vaciar(timeout=5)
+        self.otro_worker.soltar_refresco(self.cache['nombre'])
+        sm.usar_cliente(self.anterior)
+
+    def test_esperar_a_otro_worker_no_retiene_el_candado(self):
+        self.assertTrue(self.otro_worker.tomar_refresco(self.cache['nombre']))
+        resultados = []
+        with mock.patch.object(sm, "ESPERA_OTRO_WORKER_SECONDS", 1.5):
+            hilos = [threading.Thread(target=lambda: resultados.append(sm.obtener_datos_certificados()))
+                     for _ in range(3)]
+            for hilo in hilos:
+                hilo.start()
+            time.sleep(0.3)
+            # Mientras se espera al otro worker, la caché sigue disponible
+            inicio = time.monotonic()
+            with self.cache['lock']:
+                pass
+            self.assertLess(time.monotonic() - inicio, 0.2)
+            for hilo in hilos:
+                hilo.join(10)
+        # El otro worker nunca publicó: uno de los hilos fue a la API por todos
+        self.assertEqual(len(resultados), 3)
+        self.assertTrue(all(len(r) == FILAS for r in resultados))
+        self.assertEqual(self.cliente.estadisticas()["llamadas"].get("get_all_values"), 1)
+
+    def _pendientes(self, filas):
+        """Ediciones en cola que la hoja todavía no tiene: {row_id: valores}."""
+        encabezados = self.cliente._datos[sm.CERTIFICADOS_SHEET_ID][sm.CERTIFICADOS_WORKSHEET_NAME][0]
+        return {fila: [f"pendiente {fila}"] + [""] * (len(encabezados) - 1) for fila in filas}
+
+    def test_refresco_guarda_el_snapshot_una_vez_con_ediciones_en_cola(self):
+        sm.obtener_datos_certificados()
+        self.cache['timestamp'] = 0
+        pendientes = self._pendientes(range(2, 12))
+        with mock.patch.object(sm.COLA_ESCRITURAS, "filas_pendientes", return_value=pendientes), \
+                mock.patch.object(sm.ALMACEN, "guardar", wraps=sm.ALMACEN.guardar) as guardar:
+            datos = sm.obtener_datos_certificados()
+        self.assertEqual(guardar.call_count, 2)  # el refresco y una vez tras parchear
+        self.assertEqual(datos[0]['Marca temporal'], "pendiente 2")
+        self.assertEqual(sm.ALMACEN.leer('certificados')[2][9]['Marca temporal'], "pendiente 11")
+
+
+    def test_snapshot_de_otro_worker_conserva_las_ediciones_en_cola(self):
+        sm.obtener_datos_certificados()
+        # Otro worker publica un snapshot más nuevo, sin la edición de este
+        snapshot = sm.ALMACEN.leer('certificados')
+        self.otro_worker.guardar('certificados', snapshot[2], time.time(), snapshot[3])
+        with mock.patch.object(sm.COLA_ESCRITURAS, "filas_pendientes", return_value=self._pendientes([5])):
+            datos = sm.obtener_datos_certificados()
+        self.assertEqual(self.cache['version'], sm.ALMACEN.version('certificados')[0])
+        self.assertEqual(datos[sm._buscar_posicion(datos, 5)]['Marca temporal'], "pendiente 5")
+
+
+
+if __name__ == "__main__":
+    unittest.main()
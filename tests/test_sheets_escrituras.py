@@ -0,0 +1,81 @@
+"""
+Pruebas de la cola de escrituras de Sheets contra el backend local
+(sheets_local.py): una edición que la API rechaza no debe quedar en la caché.
+
+    python -m unittest discover tests
+"""
+
+# --- Importaciones ---
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+_TEMPORAL = tempfile.mkdtemp(prefix="sheets_pruebas_")
+os.environ.setdefault("SHEETS_SNAPSHOTS_PATH", os.path.join(_TEMPORAL, "snapshots.db"))
+os.environ["SHEETS_MIRROR_MYSQL"] = "0"
+os.environ["SHEETS_WRITE_INTERVAL"] = "0"
+
+from gspread.exceptions import APIError
+
+from app import sheets_manager as sm
+from app.sheets_local import ClienteSheetsLocal, HojaLocal, _RespuestaSimulada, generar_filas
+
+FILAS = 100
+FILA_EDITADA = 50
+
+
+class EscriturasPerdidasTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cliente = ClienteSheetsLocal(os.path.join(_TEMPORAL, "hojas.json"))
+        self.cliente.poblar(sm.CERTIFICADOS_SHEET_ID, sm.CERTIFICADOS_WORKSHEET_NAME, generar_filas(FILAS))
+        self.anterior = sm.usar_cliente(self.cliente)
+        cache = sm.CERTIFICADOS_CACHE
+        cache.update(datos=None, meta=None, timestamp=0, version=0, refrescando=False)
+        cache.pop('indice', None)
+        cache.pop('claves', None)
+        if sm.ALMACEN: sm.ALMACEN.invalidar(cache['nombre'])
+        # Muestras de una sola fila: la fila editada no cae en ellas
+        parche = mock.patch.object(sm, "_rangos_muestra", lambda filas: [(2, 2), (filas, filas)])
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def tearDown(self):
+        sm.COLA_ESCRITURAS.vaciar(timeout=5)
+        sm.usar_cliente(self.anterior)
+
+    def _celda_hoja(self):
+        return self.cliente._datos[sm.CERTIFICADOS_SHEET_ID][sm.CERTIFICADOS_WORKSHEET_NAME][FILA_EDITADA - 1][6]
+
+    def _registro(self):
+        datos = sm.obtener_datos_certificados()
+        return datos[sm._buscar_posicion(datos, FILA_EDITADA)]
+
+    def _editar(self, estado):
+        registro = dict(self._registro())
+        registro["Estado"] = estado
+        sm.actualizar_certificado(FILA_EDITADA, registro)
+        self.assertTrue(sm.COLA_ESCRITURAS.vaciar(timeout=5))
+
+    def test_escritura_confirmada_queda_en_cache_y_hoja(self):
+        self._editar("Entregado (prueba)")
+        sm.CERTIFICADOS_CACHE['timestamp'] = 0
+        self.assertEqual(self._registro()["Estado"], "Entregado (prueba)")
+        self.assertEqual(self._celda_hoja(), "Entregado (prueba)")
+
+    def test_escritura_rechazada_se_descarta_de_la_cache(self):
+        original = self._celda_hoja()
+        rechazo = APIError(_RespuestaSimulada(400, "Invalid value (simulado)", "INVALID_ARGUMENT"))
+        with mock.patch.object(HojaLocal, "batch_update", side_effect=rechazo):
+            self._editar("Entregado (perdido)")
+        self.assertIsNone(sm.CERTIFICADOS_CACHE['meta'])
+        if sm.ALMACEN:
+            self.assertIsNone(sm.ALMACEN.leer('certificados')[3])
+
+        # La siguiente lectura va a la API y trae la fila tal como está en la hoja
+        self.assertEqual(self._registro()["Estado"], original)
+
+
+if __name__ == "__main__":
+    unittest.main()